@@ -0,0 +1,30 @@
+from django.db.models import (
+    DecimalField,
+    Expression,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+
+
+def item_price(prefix: str = "") -> Expression:
+    # already exact to the cent, CartItem's round() doesn't change it
+    return ExpressionWrapper(
+        F(f"{prefix}quantity") * F(f"{prefix}product__price"),
+        output_field=DecimalField(max_digits=17, decimal_places=2),
+    )
+
+
+def items_total(model, relation: str) -> Expression:
+    # the cart's or order's total in one correlated subquery, NULL without
+    # items; annotated as `items_total`, which the models' `total` reads
+    items = (
+        model.objects.filter(**{relation: OuterRef("pk")})
+        .order_by()
+        .values(relation)
+        .annotate(total=Sum(item_price()))
+        .values("total")
+    )
+    return Subquery(items, output_field=DecimalField(max_digits=17, decimal_places=2))
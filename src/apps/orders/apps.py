@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.orders"
+
+    def ready(self) -> None:
+        from src.apps.orders import signals  # noqa: F401
@@ -0,0 +1,17 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from uuid import UUID
+
+
+@dataclass(frozen=True)
+class AnonymousCartItemEntity:
+    product_id: UUID
+    product_name: str
+    quantity: int
+    total_item_price: Decimal
+
+
+@dataclass
+class AnonymousCartEntity:
+    cart_items: list[AnonymousCartItemEntity] = field(default_factory=list)
+    total: Decimal = 0
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
+from uuid import UUID
 
 
 @dataclass(frozen=True)
@@ -10,3 +11,10 @@ class CartItemEntity:
 @dataclass(frozen=True)
 class CartItemUpdateEntity:
     quantity: Optional[int]
+
+
+@dataclass(frozen=True)
+class CartItemOperationEntity:
+    operation: str
+    product_id: UUID
+    quantity: int
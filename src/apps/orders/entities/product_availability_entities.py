@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from uuid import UUID
+
+
+@dataclass(frozen=True)
+class ProductAvailabilityEntity:
+    id: UUID
+    price: Decimal
+    available_quantity: int
+
+
+@dataclass
+class ProductAvailabilityResultEntity:
+    products: list[ProductAvailabilityEntity] = field(default_factory=list)
+    not_found: list[UUID] = field(default_factory=list)
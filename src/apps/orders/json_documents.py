@@ -0,0 +1,104 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import (
+    Case,
+    Expression,
+    OuterRef,
+    Subquery,
+    Sum,
+    TextField,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from src.apps.orders.annotations import item_price
+from src.apps.orders.models import CartItem, OrderItem
+from src.core.expressions import (
+    json_array,
+    json_datetime,
+    json_decimal,
+    json_document,
+    json_object,
+    json_value,
+)
+
+# The documents CartOutputSerializer and OrderOutputSerializer render, built
+# by PostgreSQL. Keep them in sync with the serializers, the views' tests
+# compare both byte for byte.
+
+
+def _items_subqueries(model, relation: str) -> tuple[Subquery, Subquery]:
+    items = (
+        model.objects.filter(**{relation: OuterRef("pk")}).order_by().values(relation)
+    )
+    item = json_object(
+        {
+            "id": json_value("id"),
+            "product_id": json_value("product_id"),
+            "product_name": json_value("product__name"),
+            "quantity": json_value("quantity"),
+            "total_item_price": json_decimal(item_price()),
+        }
+    )
+    elements = items.annotate(
+        document=StringAgg(item, delimiter=",", ordering=("id",))
+    ).values("document")
+    total = items.annotate(document=json_decimal(Sum(item_price()))).values("document")
+    return Subquery(elements, output_field=TextField()), Subquery(
+        total, output_field=TextField()
+    )
+
+
+def _items_total(total: Subquery) -> Expression:
+    # sum() of no items is the integer 0
+    return Coalesce(total, Value("0"), output_field=TextField())
+
+
+def cart_json_document() -> Expression:
+    elements, total = _items_subqueries(CartItem, "cart")
+    return json_document(
+        json_object(
+            {
+                "id": json_value("id"),
+                "username": json_value("user__username"),
+                "cart_items": json_array(elements),
+                "total": _items_total(total),
+            }
+        )
+    )
+
+
+def order_json_document() -> Expression:
+    # `userprofile` is missing from the serializer's output as well, its
+    # source can't be resolved from the order's profile
+    time_zone = timezone.get_current_timezone_name()
+    elements, total = _items_subqueries(OrderItem, "order")
+    address = json_object(
+        {
+            "id": json_value("address__id"),
+            "primary_address": json_value("address__primary_address"),
+            "secondary_address": json_value("address__secondary_address"),
+            "country": json_value("address__country"),
+            "state": json_value("address__state"),
+            "city": json_value("address__city"),
+            "zip_code": json_value("address__zip_code"),
+        }
+    )
+    return json_document(
+        json_object(
+            {
+                "id": json_value("id"),
+                "address": Case(
+                    When(address__isnull=True, then=Value("null")),
+                    default=address,
+                    output_field=TextField(),
+                ),
+                "total": _items_total(total),
+                "order_accepted": json_value("order_accepted"),
+                "order_items": json_array(elements),
+                "order_place_date": json_datetime("order_place_date", time_zone),
+                "payment_deadline": json_datetime("payment_deadline", time_zone),
+            }
+        )
+    )
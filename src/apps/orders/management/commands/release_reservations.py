@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+)
+
+
+class Command(BaseCommand):
+    help = "Deletes the expired stock reservations of cart items."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep sweeping instead of exiting",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, help="maximum number of rows per statement"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.STOCK_RESERVATION_SWEEP_INTERVAL,
+            help="seconds to wait between sweeps",
+        )
+
+    def handle(self, *args, **options):
+        service = StockReservationService()
+        while True:
+            released = service.release_expired(batch_size=options["batch_size"])
+            if released:
+                self.stdout.write(f"Released {released} expired reservations.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
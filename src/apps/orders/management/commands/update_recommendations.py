@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from src.apps.orders.services.product_recommendation_service import (
+    ProductRecommendationService,
+)
+
+
+class Command(BaseCommand):
+    help = "Adds orders placed since the last run to the product recommendations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k", type=int, help="number of recommendations kept per product"
+        )
+
+    def handle(self, *args, **options):
+        run = ProductRecommendationService(
+            top_k=options["top_k"]
+        ).update_recommendations()
+        self.stdout.write(
+            f"Processed {run.processed_orders} orders placed until {run.orders_until}."
+        )
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0004_alter_order_order_place_date_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["order_place_date", "id"], name="order_place_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["payment_deadline", "id"], name="order_deadline_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0006_order_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="cartitem",
+            options={"ordering": ("id",)},
+        ),
+        migrations.AlterModelOptions(
+            name="orderitem",
+            options={"ordering": ("id",)},
+        ),
+    ]
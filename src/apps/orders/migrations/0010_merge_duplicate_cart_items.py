@@ -0,0 +1,73 @@
+# Generated by Django 4.2.5 on 2026-10-18 20:04
+
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+
+def get_available_quantity(apps, product_id, cart_id):
+    # the ledger stock minus what the other carts hold, as the cart services
+    # compute it
+    Product = apps.get_model("products", "Product")
+    InventoryMovement = apps.get_model("products", "InventoryMovement")
+    StockReservation = apps.get_model("orders", "StockReservation")
+
+    inventory = Product.objects.select_related("inventory").get(id=product_id).inventory
+    pending = InventoryMovement.objects.filter(
+        inventory_id=inventory.id, id__gt=inventory.snapshot_movement_id
+    ).aggregate(total=Sum("quantity"))["total"]
+    reserved = (
+        StockReservation.objects.filter(
+            product_id=product_id, expires_at__gt=timezone.now()
+        )
+        .exclude(cart_id=cart_id)
+        .aggregate(total=Sum("quantity"))["total"]
+    )
+    return inventory.quantity + (pending or 0) - (reserved or 0)
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # the first item of a product keeps the quantities of all of them, up to
+    # the stock that is still available (but at least one, checkout checks the
+    # stock again), and the reservation of any of them
+    CartItem = apps.get_model("orders", "CartItem")
+    StockReservation = apps.get_model("orders", "StockReservation")
+    duplicates = (
+        CartItem.objects.order_by()
+        .values("cart_id", "product_id")
+        .annotate(items=Count("id"), total=Sum("quantity"))
+        .filter(items__gt=1)
+    )
+    for duplicate in duplicates:
+        cart_id, product_id = duplicate["cart_id"], duplicate["product_id"]
+        items = CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+        kept = items.order_by("id").first()
+        expires_at = StockReservation.objects.filter(cart_item__in=items).aggregate(
+            expires_at=Max("expires_at")
+        )["expires_at"]
+        items.exclude(id=kept.id).delete()
+
+        available = get_available_quantity(apps, product_id, cart_id)
+        kept.quantity = max(1, min(duplicate["total"], available))
+        kept.save(update_fields=["quantity"])
+        if expires_at is not None:
+            StockReservation.objects.update_or_create(
+                cart_item=kept,
+                defaults={
+                    "cart_id": cart_id,
+                    "product_id": product_id,
+                    "quantity": kept.quantity,
+                    "expires_at": expires_at,
+                },
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0018_inventory_ledger"),
+        ("orders", "0009_stock_reservations"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+    ]
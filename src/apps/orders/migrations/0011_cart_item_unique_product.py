@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0010_merge_duplicate_cart_items"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "product"), name="cart_item_cart_product_unique"
+            ),
+        ),
+    ]
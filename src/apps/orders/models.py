@@ -23,6 +23,9 @@ class Cart(models.Model):
 
     @property
     def total(self):
+        # annotated by the views, summed from the items otherwise
+        if hasattr(self, "items_total"):
+            return self.items_total if self.items_total is not None else 0
         cartitems = self.cart_items.all()
         return sum(item.total_item_price for item in cartitems)
 
@@ -35,14 +38,52 @@ class CartItem(models.Model):
     quantity = models.IntegerField(default=1)
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="cart_items")
 
+    class Meta:
+        # a stable order, the database built documents list items the same way
+        ordering = ("id",)
+        constraints = [
+            # adding a product again increases its item, see CartItemCreateService
+            models.UniqueConstraint(
+                fields=["cart", "product"], name="cart_item_cart_product_unique"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"Item of cart number {self.cart.pk}. Quantity: {self.quantity}"
 
     @property
     def total_item_price(self) -> float:
+        if hasattr(self, "line_total"):
+            return self.line_total
         return round(self.quantity * self.product.price, 2)
 
 
+class StockReservation(models.Model):
+    # stock held for a cart item until `expires_at`, expired rows don't count
+    # and are deleted by the release_reservations sweep
+    cart_item = models.OneToOneField(
+        CartItem, on_delete=models.CASCADE, related_name="reservation"
+    )
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="+")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # the reserved quantity of a product is an index only scan
+            models.Index(
+                fields=["product", "expires_at"],
+                include=["quantity"],
+                name="reservation_product_expiry_idx",
+            ),
+            models.Index(fields=["expires_at"], name="reservation_expiry_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Reservation of {self.quantity} | product {self.product_id}"
+
+
 class Order(models.Model):
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False, unique=True
@@ -56,9 +97,23 @@ class Order(models.Model):
     order_accepted = models.BooleanField(default=False)
     order_place_date = models.DateTimeField(auto_now_add=True)
     payment_deadline = models.DateTimeField(default=payment_deadline_calc)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["order_place_date", "id"], name="order_place_date_id_idx"
+            ),
+            models.Index(
+                fields=["payment_deadline", "id"], name="order_deadline_id_idx"
+            ),
+        ]
 
     @property
     def total(self):
+        # annotated by the views, summed from the items otherwise
+        if hasattr(self, "items_total"):
+            return self.items_total if self.items_total is not None else 0
         orderitems = self.order_items.all()
         return sum(item.total_item_price for item in orderitems)
 
@@ -73,9 +128,61 @@ class OrderItem(models.Model):
         Order, on_delete=models.CASCADE, related_name="order_items"
     )
 
+    class Meta:
+        ordering = ("id",)
+
     def __str__(self) -> str:
         return f"Order item ({self.product.name}) number {self.order.pk}. Quantity: {self.quantity}"
 
     @property
     def total_item_price(self) -> float:
+        if hasattr(self, "line_total"):
+            return self.line_total
         return self.quantity * self.product.price
+
+
+class ProductPairCount(models.Model):
+    # sparse co-occurrence matrix, in how many orders both products were
+    # bought. Both directions of a pair are stored, so a product's row is
+    # one index range.
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other_product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="+"
+    )
+    order_count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "other_product"], name="product_pair_unique"
+            ),
+        ]
+
+
+class ProductRecommendation(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="recommendations"
+    )
+    recommended_product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="+"
+    )
+    order_count = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ("product", "rank")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "rank"], name="product_recommendation_rank_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Recommendation {self.rank} for product {self.product_id}"
+
+
+class ProductRecommendationRun(models.Model):
+    # orders placed up to `orders_until` are counted in ProductPairCount
+    orders_until = models.DateTimeField()
+    processed_orders = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -1,11 +1,26 @@
+import uuid
+
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from rest_framework import serializers
 
-from src.apps.orders.models import Cart, CartItem, Order, OrderItem
+from src.apps.orders.models import (
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+    ProductRecommendation,
+)
+from src.apps.products.serializers import ProductOutputSerializer
 from src.apps.users.serializers import (
     UserAddressOutputSerializer,
     UserOrderOutputSerializer,
 )
+from src.core.serializers import (
+    DynamicFieldsSerializerMixin,
+    ExpandableField,
+    FieldLookups,
+)
 
 
 class CartItemQuantityInputSerializer(serializers.Serializer):
@@ -27,20 +42,74 @@ class CartItemUpdateSerializer(serializers.Serializer):
     quantity = CartItemQuantityUpdateSerializer()
 
 
-class CartItemOutputSerializer(serializers.ModelSerializer):
+class CartItemOperationInputSerializer(serializers.Serializer):
+    operation = serializers.ChoiceField(choices=("add", "set", "remove"))
+    product_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(default=1, validators=[MinValueValidator(0)])
+
+
+class CartItemBulkInputSerializer(serializers.Serializer):
+    operations = CartItemOperationInputSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations: list) -> list:
+        if len(operations) > settings.CART_BULK_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                f"At most {settings.CART_BULK_MAX_OPERATIONS} operations "
+                "can be applied at once!"
+            )
+        return operations
+
+
+ITEM_PRODUCT_LOOKUPS = {
+    "product_id": FieldLookups(only=("product__id",), select_related=("product",)),
+    "product_name": FieldLookups(only=("product__name",), select_related=("product",)),
+    "total_item_price": FieldLookups(
+        only=("quantity", "product__price"), select_related=("product",)
+    ),
+}
+ITEM_EXPANDABLE_FIELDS = {
+    "product": ExpandableField(
+        ProductOutputSerializer,
+        "product",
+        FieldLookups(only=("product",), select_related=("product",)),
+    ),
+}
+
+
+class CartItemOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     product_id = serializers.CharField(source="product.id", read_only=True)
     product_name = serializers.CharField(source="product.name", read_only=True)
 
+    expandable_fields = ITEM_EXPANDABLE_FIELDS
+    field_lookups = ITEM_PRODUCT_LOOKUPS
+
     class Meta:
         model = CartItem
         fields = ("id", "product_id", "product_name", "quantity", "total_item_price")
         read_only_fields = fields
 
 
-class CartOutputSerializer(serializers.ModelSerializer):
+class CartOutputSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
     cart_items = CartItemOutputSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        "cart_items": ExpandableField(
+            CartItemOutputSerializer,
+            "cart_items",
+            FieldLookups(prefetch_related=("cart_items__product",)),
+            many=True,
+        ),
+    }
+    field_lookups = {
+        "username": FieldLookups(only=("user__username",), select_related=("user",)),
+        "cart_items": FieldLookups(prefetch_related=("cart_items__product",)),
+        # the views annotate it
+        "total": FieldLookups(),
+    }
+
     class Meta:
         model = Cart
         fields = (
@@ -52,6 +121,19 @@ class CartOutputSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class AnonymousCartItemOutputSerializer(serializers.Serializer):
+    product_id = serializers.UUIDField()
+    product_name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    # rendered like the items of CartOutputSerializer
+    total_item_price = serializers.ReadOnlyField()
+
+
+class AnonymousCartOutputSerializer(serializers.Serializer):
+    cart_items = AnonymousCartItemOutputSerializer(many=True, read_only=True)
+    total = serializers.ReadOnlyField()
+
+
 class OrderInputSerializer(serializers.Serializer):
     address_id = serializers.CharField()
 
@@ -60,23 +142,46 @@ class OrderUpdateSerializer(serializers.Serializer):
     address_id = serializers.CharField(required=False)
 
 
-class OrderItemOutputSerializer(serializers.ModelSerializer):
+class OrderItemOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     product_id = serializers.CharField(source="product.id", read_only=True)
     product_name = serializers.CharField(source="product.name", read_only=True)
 
+    expandable_fields = ITEM_EXPANDABLE_FIELDS
+    field_lookups = ITEM_PRODUCT_LOOKUPS
+
     class Meta:
-        model = CartItem
+        model = OrderItem
         fields = ("id", "product_id", "product_name", "quantity", "total_item_price")
         read_only_fields = fields
 
 
-class OrderOutputSerializer(serializers.ModelSerializer):
+class OrderOutputSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     userprofile = UserOrderOutputSerializer(
         source="user.userprofile", many=False, read_only=True
     )
     address = UserAddressOutputSerializer(many=False, read_only=True)
     order_items = OrderItemOutputSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        "order_items": ExpandableField(
+            OrderItemOutputSerializer,
+            "order_items",
+            FieldLookups(prefetch_related=("order_items__product",)),
+            many=True,
+        ),
+    }
+    field_lookups = {
+        # `user.userprofile` isn't there on the order's profile, the field
+        # is skipped after reading the profile
+        "userprofile": FieldLookups(only=("user",), select_related=("user",)),
+        "address": FieldLookups(only=("address",), select_related=("address",)),
+        "order_items": FieldLookups(prefetch_related=("order_items__product",)),
+        # the views annotate it
+        "total": FieldLookups(),
+    }
+
     class Meta:
         model = Order
         fields = (
@@ -98,3 +203,42 @@ class MostOrderedProductsOutputSerializer(serializers.Serializer):
     product_name = serializers.CharField()
     order_count = serializers.IntegerField()
     total_quantity = serializers.IntegerField()
+
+
+class ProductRecommendationOutputSerializer(serializers.ModelSerializer):
+    product = ProductOutputSerializer(source="recommended_product", read_only=True)
+
+    class Meta:
+        model = ProductRecommendation
+        fields = ("rank", "order_count", "product")
+        read_only_fields = fields
+
+
+class ProductAvailabilityInputSerializer(serializers.Serializer):
+    ids = serializers.CharField()
+
+    def validate_ids(self, value: str) -> list[uuid.UUID]:
+        try:
+            # duplicates are dropped, the order is kept
+            ids = list(dict.fromkeys(uuid.UUID(id) for id in value.split(",")))
+        except ValueError:
+            raise serializers.ValidationError(
+                "Ids must be a comma separated list of product ids!"
+            )
+        if len(ids) > settings.PRODUCT_AVAILABILITY_MAX_IDS:
+            raise serializers.ValidationError(
+                f"At most {settings.PRODUCT_AVAILABILITY_MAX_IDS} products "
+                "can be checked at once!"
+            )
+        return ids
+
+
+class ProductAvailabilityOutputSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    price = serializers.DecimalField(max_digits=7, decimal_places=2)
+    available_quantity = serializers.IntegerField()
+
+
+class ProductAvailabilityResultOutputSerializer(serializers.Serializer):
+    products = ProductAvailabilityOutputSerializer(many=True, read_only=True)
+    not_found = serializers.ListField(child=serializers.UUIDField())
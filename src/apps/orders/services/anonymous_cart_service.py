@@ -0,0 +1,164 @@
+import secrets
+from typing import Optional, OrderedDict
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
+
+from src.apps.orders.entities.anonymous_cart_entities import (
+    AnonymousCartEntity,
+    AnonymousCartItemEntity,
+)
+from src.apps.orders.entities.cart_entities import CartItemOperationEntity
+from src.apps.orders.models import Cart, CartItem
+from src.apps.orders.services.cart_service import apply_cart_item_operations
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+)
+from src.apps.orders.validators import (
+    validate_item_quantity,
+    validate_products_found,
+)
+from src.apps.products.models import Product
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+from src.apps.users.models import UserProfile
+
+ANONYMOUS_CART_COOKIE_SALT = "orders.anonymous_cart"
+
+
+class AnonymousCartService:
+    """
+    Carts of shoppers who aren't logged in, kept in the cache instead of the
+    database: a {product id hex: quantity} dict under a random token the
+    shopper gets as a signed cookie. The ANONYMOUS_CART_CACHE alias has to be
+    shared between the web processes, every write renews ANONYMOUS_CART_TTL,
+    abandoned carts are evicted by the cache. Anonymous carts hold no stock,
+    on login merge() bulk inserts them into Cart/CartItem.
+    """
+
+    def __init__(
+        self, timeout: Optional[int] = None, cache: Optional[BaseCache] = None
+    ) -> None:
+        self.timeout = timeout or settings.ANONYMOUS_CART_TTL
+        self.cache = cache or caches[settings.ANONYMOUS_CART_CACHE]
+
+    def _cache_key(self, token: str) -> str:
+        return f"carts:anonymous:{token}"
+
+    def new_token(self) -> str:
+        return secrets.token_urlsafe(16)
+
+    def get_token(self, request: HttpRequest) -> Optional[str]:
+        # a tampered cookie counts as none
+        return request.get_signed_cookie(
+            settings.ANONYMOUS_CART_COOKIE_NAME,
+            default=None,
+            salt=ANONYMOUS_CART_COOKIE_SALT,
+        )
+
+    def set_token(self, response: HttpResponse, token: str) -> None:
+        response.set_signed_cookie(
+            settings.ANONYMOUS_CART_COOKIE_NAME,
+            token,
+            salt=ANONYMOUS_CART_COOKIE_SALT,
+            max_age=self.timeout,
+            httponly=True,
+            samesite="Lax",
+        )
+
+    def _get_quantities(self, token: Optional[str]) -> dict[UUID, int]:
+        if token is None:
+            return {}
+        stored = self.cache.get(self._cache_key(token)) or {}
+        return {UUID(product_id): quantity for product_id, quantity in stored.items()}
+
+    def _set_quantities(self, token: str, quantities: dict[UUID, int]) -> None:
+        self.cache.set(
+            self._cache_key(token),
+            {
+                product_id.hex: quantity
+                for product_id, quantity in quantities.items()
+                if quantity
+            },
+            timeout=self.timeout,
+        )
+
+    def _build_cart(self, quantities: dict[UUID, int]) -> AnonymousCartEntity:
+        products = Product.objects.only("id", "name", "price").in_bulk(quantities)
+        # products deleted meanwhile are left out
+        cart_items = [
+            AnonymousCartItemEntity(
+                product_id=product_id,
+                product_name=products[product_id].name,
+                quantity=quantity,
+                total_item_price=round(quantity * products[product_id].price, 2),
+            )
+            for product_id, quantity in sorted(quantities.items())
+            if quantity and product_id in products
+        ]
+        return AnonymousCartEntity(
+            cart_items=cart_items,
+            total=sum(cart_item.total_item_price for cart_item in cart_items),
+        )
+
+    def get_cart(self, token: Optional[str]) -> AnonymousCartEntity:
+        return self._build_cart(self._get_quantities(token))
+
+    def apply_operations(self, token: str, data: OrderedDict) -> AnonymousCartEntity:
+        # the same operations as CartItemBulkService, validated against the
+        # stock nobody holds
+        dtos = [
+            CartItemOperationEntity(**operation) for operation in data["operations"]
+        ]
+        product_ids = {dto.product_id for dto in dtos}
+        stored = self._get_quantities(token)
+        quantities = apply_cart_item_operations(stored, dtos)
+
+        available_quantities = StockReservationService().get_available_quantities(
+            product_ids
+        )
+        validate_products_found(product_ids, available_quantities)
+        for product_id in sorted(product_ids):
+            if quantities[product_id] > stored.get(product_id, 0):
+                validate_item_quantity(
+                    quantities[product_id], available_quantities[product_id]
+                )
+
+        self._set_quantities(token, quantities)
+        return self._build_cart(quantities)
+
+    @transaction.atomic
+    def merge(self, token: str, profile: UserProfile) -> Optional[Cart]:
+        quantities = self._get_quantities(token)
+        if not quantities:
+            return None
+
+        reservation_service = StockReservationService()
+        InventoryLedgerService().lock_inventories(quantities)
+        available_quantities = reservation_service.get_available_quantities(quantities)
+        # the stock may have run out since the items were added, what's still
+        # there is kept
+        quantities = {
+            product_id: min(quantity, available_quantities[product_id])
+            for product_id, quantity in quantities.items()
+            if product_id in available_quantities
+        }
+        cart = None
+        if any(quantity > 0 for quantity in quantities.values()):
+            cart = Cart.objects.create(user=profile)
+            cart_items = CartItem.objects.bulk_create(
+                [
+                    CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                    for product_id, quantity in sorted(quantities.items())
+                    if quantity > 0
+                ]
+            )
+            reservation_service.reserve_many(cart_items)
+
+        cache_key = self._cache_key(token)
+        transaction.on_commit(lambda: self.cache.delete(cache_key))
+        return cart
@@ -1,4 +1,5 @@
-from typing import Any, OrderedDict
+import uuid
+from typing import Any, Optional, OrderedDict
 from uuid import UUID
 
 from django.db import transaction
@@ -7,7 +8,13 @@ from django.shortcuts import get_object_or_404
 
 from src.apps.users.models import UserAddress, UserProfile
 from src.apps.products.models import Product
-from src.apps.orders.models import Cart, CartItem, Order, OrderItem
+from src.apps.orders.models import (
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+    StockReservation,
+)
 from src.apps.orders.serializers import (
     CartOutputSerializer,
     CartItemOutputSerializer,
@@ -16,14 +23,47 @@ from src.apps.orders.serializers import (
     CartItemUpdateSerializer,
     CartItemQuantityUpdateSerializer,
 )
-from src.apps.orders.entities.cart_entities import CartItemEntity, CartItemUpdateEntity
+from src.apps.orders.entities.cart_entities import (
+    CartItemEntity,
+    CartItemOperationEntity,
+    CartItemUpdateEntity,
+)
 from src.apps.orders.entities.order_entities import (
     OrderEntity,
     OrderUpdateEntity,
     OrderItemEntity,
     OrderItemUpdateEntity,
 )
-from src.apps.orders.validators import validate_item_quantity
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+    available_quantity,
+)
+from src.apps.orders.validators import (
+    validate_item_quantity,
+    validate_products_found,
+)
+from src.apps.products.cache import invalidate_stock_cache
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+from src.core.exceptions import MaxQuantityExceededException
+
+
+def apply_cart_item_operations(
+    quantities: dict[UUID, int], dtos: list[CartItemOperationEntity]
+) -> dict[UUID, int]:
+    # the products' quantities after the operations, 0 for removed ones
+    quantities = dict(quantities)
+    for dto in dtos:
+        if dto.operation == "add":
+            quantities[dto.product_id] = (
+                quantities.get(dto.product_id, 0) + dto.quantity
+            )
+        elif dto.operation == "set":
+            quantities[dto.product_id] = dto.quantity
+        else:
+            quantities[dto.product_id] = 0
+    return quantities
 
 
 class CartCreateService:
@@ -33,12 +73,61 @@ class CartCreateService:
 
 
 class CartItemCreateService:
-    def _cart_item_create(
-        self, dto: CartItemEntity, product: Product, cart: Cart
-    ) -> CartItem:
-        return CartItem.objects.create(
-            product=product, cart=cart, quantity=dto.quantity
+    """
+    Adds a product to a cart with one upsert: a new item is inserted, an
+    existing one increased, and the statement only writes if the resulting
+    quantity fits the available stock. The item's reservation is written by
+    the same statement. The product's inventory is locked first, so adds to
+    other carts can't hold the same units meanwhile.
+    """
+
+    def _cart_item_upsert(
+        self, dto: CartItemEntity, product: Product, cart_id: UUID
+    ) -> Optional[CartItem]:
+        reservation_service = StockReservationService()
+        # holds of the cart itself are replaced by the new quantity
+        available_sql, available_params = (
+            Product.objects.filter(id=product.id)
+            .annotate(available=available_quantity(exclude_cart_id=cart_id))
+            .values("available")
+            .query.sql_with_params()
         )
+        item_table = CartItem._meta.db_table
+        cart_items = CartItem.objects.raw(
+            f"""
+            WITH item AS (
+                INSERT INTO {item_table} (id, cart_id, product_id, quantity)
+                SELECT %s, %s, %s, %s
+                WHERE %s <= ({available_sql})
+                ON CONFLICT (cart_id, product_id) DO UPDATE
+                SET quantity = {item_table}.quantity + EXCLUDED.quantity
+                WHERE {item_table}.quantity + EXCLUDED.quantity <= ({available_sql})
+                RETURNING id, cart_id, product_id, quantity
+            ), reservation AS (
+                INSERT INTO {StockReservation._meta.db_table}
+                    (cart_item_id, cart_id, product_id, quantity, expires_at)
+                SELECT id, cart_id, product_id, quantity, %s
+                FROM item
+                ON CONFLICT (cart_item_id) DO UPDATE
+                SET quantity = EXCLUDED.quantity, expires_at = EXCLUDED.expires_at
+            )
+            SELECT id, cart_id, product_id, quantity FROM item
+            """,
+            (
+                uuid.uuid4(),
+                cart_id,
+                product.id,
+                dto.quantity,
+                dto.quantity,
+                *available_params,
+                *available_params,
+                reservation_service.get_expiry(),
+            ),
+        )
+        cartitem = next(iter(cart_items), None)
+        if cartitem is not None:
+            cartitem.product = product
+        return cartitem
 
     @classmethod
     def _build_cart_item_dto_from_request_data(
@@ -56,23 +145,29 @@ class CartItemCreateService:
         quantity = data.pop("quantity")
 
         product = get_object_or_404(Product, id=product_id)
+        reservation_service = StockReservationService()
+        InventoryLedgerService().lock_inventories([product.id])
 
-        try:
-            cartitem = CartItem.objects.get(product_id=product_id, cart_id=cart_id)
-            max_quantity = product.inventory.quantity - cartitem.quantity
-
-            validate_item_quantity(quantity["quantity"], max_quantity)
-            cartitem.quantity += quantity["quantity"]
-            cartitem.save()
-
-        except CartItem.DoesNotExist:
-            validate_item_quantity(quantity["quantity"], product.inventory.quantity)
-
-            cart = get_object_or_404(Cart, id=cart_id)
-            cart_item_dto = self._build_cart_item_dto_from_request_data(quantity)
-            cartitem = self._cart_item_create(cart_item_dto, product, cart)
-            cartitem.save()
+        cart_item_dto = self._build_cart_item_dto_from_request_data(quantity)
+        cartitem = self._cart_item_upsert(cart_item_dto, product, cart_id)
+        if cartitem is None:
+            # nothing was written, find out why
+            get_object_or_404(Cart, id=cart_id)
+            available = reservation_service.get_available_quantities(
+                [product.id], exclude_cart_id=cart_id
+            )[product.id]
+            in_cart = (
+                CartItem.objects.filter(cart_id=cart_id, product_id=product.id)
+                .values_list("quantity", flat=True)
+                .first()
+                or 0
+            )
+            raise MaxQuantityExceededException(
+                available - in_cart, cart_item_dto.quantity
+            )
 
+        invalidate_stock_cache([product.id])
+        reservation_service.extend_cart_reservations(cart_id)
         return cartitem
 
 
@@ -98,8 +193,91 @@ class CartItemUpdateService:
     @transaction.atomic
     def cart_item_update(self, data: OrderedDict, instance: CartItem) -> CartItem:
         quantity = data.pop("quantity")
-        max_quantity = instance.product.inventory.quantity
-        validate_item_quantity(quantity["quantity"], max_quantity - instance.quantity)
+        reservation_service = StockReservationService()
+        inventories = InventoryLedgerService().lock_inventories([instance.product_id])
+        max_quantity = reservation_service.get_available_quantity(
+            inventories[instance.product_id],
+            instance.product_id,
+            exclude_cart_id=instance.cart_id,
+        )
+        validate_item_quantity(quantity["quantity"], max_quantity)
 
         cart_item_dto = self._build_cart_item_dto_from_request_data(quantity, instance)
-        return self._cart_item_update(cart_item_dto, instance)
+        cartitem = self._cart_item_update(cart_item_dto, instance)
+        reservation_service.reserve(cartitem)
+        reservation_service.extend_cart_reservations(instance.cart_id)
+        return cartitem
+
+
+class CartItemBulkService:
+    """
+    Applies many add/set/remove operations to one cart at once. Operations
+    of the same product are applied in order, an item ending with quantity
+    0 is removed. The products' inventories are locked together, the grown
+    quantities are validated against a single availability query and the
+    items are written with one bulk_create, one bulk_update and one delete.
+    """
+
+    @classmethod
+    def _build_operation_dtos(
+        cls, operations: list[OrderedDict]
+    ) -> list[CartItemOperationEntity]:
+        return [CartItemOperationEntity(**operation) for operation in operations]
+
+    @transaction.atomic
+    def apply_operations(self, cart_id: UUID, data: OrderedDict) -> Cart:
+        cart = get_object_or_404(Cart, id=cart_id)
+        dtos = self._build_operation_dtos(data["operations"])
+        product_ids = {dto.product_id for dto in dtos}
+
+        reservation_service = StockReservationService()
+        inventories = InventoryLedgerService().lock_inventories(product_ids)
+        validate_products_found(product_ids, inventories)
+
+        cart_items = {
+            cart_item.product_id: cart_item
+            for cart_item in CartItem.objects.filter(
+                cart_id=cart_id, product_id__in=product_ids
+            )
+        }
+        quantities = apply_cart_item_operations(
+            {
+                product_id: cart_item.quantity
+                for product_id, cart_item in cart_items.items()
+            },
+            dtos,
+        )
+        available_quantities = reservation_service.get_available_quantities(
+            product_ids, exclude_cart_id=cart_id
+        )
+        for product_id, quantity in sorted(quantities.items()):
+            cart_item = cart_items.get(product_id)
+            # lowering an item is fine even if the stock is lower by now
+            if cart_item is None or quantity > cart_item.quantity:
+                validate_item_quantity(quantity, available_quantities[product_id])
+
+        created, updated, kept, removed = [], [], [], []
+        for product_id, quantity in quantities.items():
+            cart_item = cart_items.get(product_id)
+            if cart_item is None:
+                if quantity:
+                    created.append(
+                        CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                    )
+            elif not quantity:
+                removed.append(cart_item)
+            elif quantity != cart_item.quantity:
+                cart_item.quantity = quantity
+                updated.append(cart_item)
+            else:
+                kept.append(cart_item)
+
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ["quantity"])
+        if removed:
+            # their reservations are deleted with them
+            CartItem.objects.filter(id__in=[item.id for item in removed]).delete()
+            invalidate_stock_cache([item.product_id for item in removed])
+        reservation_service.reserve_many(created + updated + kept)
+        reservation_service.extend_cart_reservations(cart_id)
+        return cart
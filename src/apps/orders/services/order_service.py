@@ -1,3 +1,4 @@
+from collections import defaultdict
 from typing import Any, OrderedDict
 from uuid import UUID
 
@@ -7,7 +8,15 @@ from django.shortcuts import get_object_or_404
 from django.core.mail import send_mail
 
 from src.apps.users.models import UserAddress, UserProfile
-from src.apps.products.models import Product
+from src.apps.products.cache import invalidate_stock_cache
+from src.apps.products.models import (
+    InventoryMovement,
+    InventoryMovementKind,
+    Product,
+)
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
 from src.apps.orders.models import Cart, CartItem, Order, OrderItem
 from src.apps.orders.serializers import (
     OrderOutputSerializer,
@@ -24,6 +33,9 @@ from src.apps.orders.entities.order_entities import (
     OrderItemEntity,
     OrderItemUpdateEntity,
 )
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+)
 from src.apps.orders.validators import validate_item_quantity
 
 
@@ -32,22 +44,50 @@ User = get_user_model()
 
 class OrderCreateService:
     def _create_order_items(self, instance: Order, cart_items: list[CartItem]) -> None:
-        if cart_items:
-            for cart_item in cart_items:
-                product = cart_item.product
-                quantity = cart_item.quantity
-                max_quantity = product.inventory.quantity
+        quantities = defaultdict(int)
+        for cart_item in cart_items:
+            quantities[cart_item.product_id] += cart_item.quantity
+        if not quantities:
+            return
 
-                validate_item_quantity(
-                    typed_quantity=quantity, max_quantity=max_quantity
-                )
+        reservation_service = StockReservationService()
+        ledger_service = InventoryLedgerService()
+        inventories = ledger_service.lock_inventories(quantities)
+        stock = ledger_service.get_stock_quantities(
+            inventory.pk for inventory in inventories.values()
+        )
+        # the cart's own reservations are released with the cart
+        reserved = reservation_service.get_reserved_quantities(
+            quantities, exclude_cart_id=cart_items[0].cart_id
+        )
+        for product_id, quantity in quantities.items():
+            validate_item_quantity(
+                typed_quantity=quantity,
+                max_quantity=stock[inventories[product_id].pk]
+                - reserved.get(product_id, 0),
+            )
 
-                OrderItem.objects.create(
-                    product=product, quantity=quantity, order=instance
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                product_id=cart_item.product_id,
+                quantity=cart_item.quantity,
+                order=instance,
+            )
+            for cart_item in cart_items
+        )
+        # appended to the ledger, the inventory rows are only locked
+        ledger_service.record(
+            [
+                InventoryMovement(
+                    inventory=inventories[product_id],
+                    kind=InventoryMovementKind.SALE,
+                    quantity=-quantity,
+                    reference=str(instance.id),
                 )
-                product_inventory = product.inventory
-                product_inventory.quantity -= quantity
-                product_inventory.save()
+                for product_id, quantity in quantities.items()
+            ]
+        )
+        invalidate_stock_cache(quantities)
 
     @classmethod
     def _send_confirmation_email(cls, order_id: int, email: str):
@@ -65,9 +105,7 @@ class OrderCreateService:
     @transaction.atomic
     def create_order(cls, cart_id: int, user: User, data: OrderedDict) -> Order:
         cart = get_object_or_404(Cart, id=cart_id)
-        cart_items = cart.cart_items.select_related(
-            "product", "product__inventory"
-        ).all()
+        cart_items = list(cart.cart_items.all())
 
         address_id = data["address_id"]
         address = get_object_or_404(UserAddress, id=address_id)
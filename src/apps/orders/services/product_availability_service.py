@@ -0,0 +1,75 @@
+from typing import Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+
+from src.apps.orders.entities.product_availability_entities import (
+    ProductAvailabilityEntity,
+    ProductAvailabilityResultEntity,
+)
+from src.apps.orders.services.stock_reservation_service import available_quantity
+from src.apps.products.cache import get_stock_cache_keys
+from src.apps.products.models import Product
+
+
+class ProductAvailabilityService:
+    """
+    Prices and available quantities of many products at once. Every product
+    is cached on its own for a few seconds, stock writes delete its entry and
+    the rest is read with one query, the stock and the holds of a product
+    are index only scans of the inventory ledger and the reservations.
+    """
+
+    def __init__(self, timeout: Optional[int] = None) -> None:
+        self.timeout = timeout or settings.PRODUCT_AVAILABILITY_CACHE_TIMEOUT
+
+    def _fetch(self, product_ids: list[UUID]) -> dict[UUID, ProductAvailabilityEntity]:
+        rows = (
+            Product.objects.filter(id__in=product_ids)
+            .annotate(available_quantity=available_quantity())
+            .values_list("id", "price", "available_quantity")
+        )
+        # holds can exceed the stock after a seller lowered it
+        return {
+            product_id: ProductAvailabilityEntity(
+                id=product_id, price=price, available_quantity=max(quantity, 0)
+            )
+            for product_id, price, quantity in rows
+        }
+
+    def get_availability(
+        self, product_ids: list[UUID]
+    ) -> ProductAvailabilityResultEntity:
+        cache_keys = get_stock_cache_keys(product_ids)
+        cached = cache.get_many(cache_keys.values())
+        products = {
+            product_id: cached[key]
+            for product_id, key in cache_keys.items()
+            if key in cached
+        }
+
+        missing = [
+            product_id for product_id in product_ids if product_id not in products
+        ]
+        if missing:
+            fetched = self._fetch(missing)
+            cache.set_many(
+                {
+                    cache_keys[product_id]: entity
+                    for product_id, entity in fetched.items()
+                },
+                timeout=self.timeout,
+            )
+            products.update(fetched)
+
+        return ProductAvailabilityResultEntity(
+            products=[
+                products[product_id]
+                for product_id in product_ids
+                if product_id in products
+            ],
+            not_found=[
+                product_id for product_id in product_ids if product_id not in products
+            ],
+        )
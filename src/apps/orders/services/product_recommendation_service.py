@@ -0,0 +1,108 @@
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from src.apps.orders.models import (
+    Order,
+    OrderItem,
+    ProductPairCount,
+    ProductRecommendation,
+    ProductRecommendationRun,
+)
+
+# orders get their timestamp before their transaction commits, the newest
+# ones are left for the next run so none is skipped
+ORDER_SETTLE_TIME = timedelta(minutes=1)
+
+
+class ProductRecommendationService:
+    """
+    Counts how often products are bought together and keeps the top K of
+    every product in ProductRecommendation. Each run only adds the orders
+    placed since the previous one: their item pairs are counted by a self
+    join of OrderItem and added to the matrix in a single upsert, then only
+    the products of those orders are ranked again.
+    """
+
+    def __init__(self, top_k: Optional[int] = None) -> None:
+        self.top_k = top_k or settings.PRODUCT_RECOMMENDATIONS_TOP_K
+
+    def _add_pair_counts(self, order_ids_sql: str, params: tuple) -> None:
+        pair_table = ProductPairCount._meta.db_table
+        item_table = OrderItem._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {pair_table} (product_id, other_product_id, order_count)
+                SELECT item.product_id, other_item.product_id,
+                       COUNT(DISTINCT item.order_id)
+                FROM {item_table} item
+                JOIN {item_table} other_item
+                  ON other_item.order_id = item.order_id
+                 AND other_item.product_id <> item.product_id
+                WHERE item.order_id IN ({order_ids_sql})
+                GROUP BY item.product_id, other_item.product_id
+                ON CONFLICT (product_id, other_product_id) DO UPDATE
+                SET order_count = {pair_table}.order_count + EXCLUDED.order_count
+                """,
+                params,
+            )
+
+    def _rank_products(self, product_ids: QuerySet) -> None:
+        ProductRecommendation.objects.filter(product_id__in=product_ids).delete()
+        product_ids_sql, params = product_ids.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {ProductRecommendation._meta.db_table}
+                    (product_id, recommended_product_id, order_count, rank)
+                SELECT product_id, other_product_id, order_count, rank
+                FROM (
+                    SELECT product_id, other_product_id, order_count,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY product_id
+                               ORDER BY order_count DESC, other_product_id
+                           ) AS rank
+                    FROM {ProductPairCount._meta.db_table}
+                    WHERE product_id IN ({product_ids_sql})
+                ) ranked
+                WHERE rank <= %s
+                """,
+                (*params, self.top_k),
+            )
+
+    @transaction.atomic
+    def update_recommendations(self) -> ProductRecommendationRun:
+        # runs are serialized, an order must not be counted twice
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {ProductRecommendationRun._meta.db_table} "
+                "IN SHARE ROW EXCLUSIVE MODE"
+            )
+        orders_until = timezone.now() - ORDER_SETTLE_TIME
+        orders = Order.objects.filter(order_place_date__lte=orders_until)
+        previous_run = ProductRecommendationRun.objects.order_by(
+            "-orders_until"
+        ).first()
+        if previous_run is not None:
+            orders = orders.filter(order_place_date__gt=previous_run.orders_until)
+
+        processed_orders = orders.count()
+        if processed_orders:
+            order_ids_sql, params = orders.values("id").query.sql_with_params()
+            self._add_pair_counts(order_ids_sql, params)
+            # only pairs within the new orders changed
+            self._rank_products(
+                OrderItem.objects.filter(order__in=orders)
+                .order_by()
+                .values("product_id")
+                .distinct()
+            )
+
+        return ProductRecommendationRun.objects.create(
+            orders_until=orders_until, processed_orders=processed_orders
+        )
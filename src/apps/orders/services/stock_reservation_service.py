@@ -0,0 +1,177 @@
+from datetime import timedelta
+from typing import Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Expression,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from src.apps.orders.models import CartItem, StockReservation
+from src.apps.products.cache import invalidate_stock_cache
+from src.apps.products.models import Product, ProductInventory
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+    stock_quantity,
+)
+
+
+def active_reservations_filter() -> Q:
+    return Q(expires_at__gt=timezone.now())
+
+
+def reserved_quantity(
+    product_ref: str = "pk", exclude_cart_id: Optional[UUID] = None
+) -> Expression:
+    # sum of the active reservations of the outer product
+    reserved = StockReservation.objects.filter(
+        active_reservations_filter(), product=OuterRef(product_ref)
+    )
+    if exclude_cart_id is not None:
+        reserved = reserved.exclude(cart_id=exclude_cart_id)
+    reserved = (
+        reserved.order_by()
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(reserved, output_field=IntegerField()),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def available_quantity(
+    product_ref: str = "pk", exclude_cart_id: Optional[UUID] = None
+) -> Expression:
+    # annotates a Product queryset with the stock nobody holds
+    return stock_quantity("inventory__") - reserved_quantity(
+        product_ref, exclude_cart_id
+    )
+
+
+class StockReservationService:
+    """
+    Holds the stock of cart items for STOCK_RESERVATION_TTL seconds, so a
+    unit in one cart can't be added to another. A reservation is extended
+    whenever its cart changes and only counts until it expires; the sweep
+    just deletes the expired rows.
+    """
+
+    def __init__(self, ttl: Optional[timedelta] = None) -> None:
+        self.ttl = ttl or timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+
+    def get_expiry(self):
+        return timezone.now() + self.ttl
+
+    def get_reserved_quantities(
+        self, product_ids, exclude_cart_id: Optional[UUID] = None
+    ) -> dict[UUID, int]:
+        reservations = StockReservation.objects.filter(
+            active_reservations_filter(), product_id__in=product_ids
+        )
+        if exclude_cart_id is not None:
+            reservations = reservations.exclude(cart_id=exclude_cart_id)
+        return dict(
+            reservations.order_by()
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("product_id", "total")
+        )
+
+    def get_available_quantity(
+        self,
+        inventory: ProductInventory,
+        product_id: UUID,
+        exclude_cart_id: Optional[UUID] = None,
+    ) -> int:
+        reservations = StockReservation.objects.filter(
+            active_reservations_filter(), product_id=product_id
+        )
+        if exclude_cart_id is not None:
+            reservations = reservations.exclude(cart_id=exclude_cart_id)
+        reserved = reservations.aggregate(total=Sum("quantity"))["total"] or 0
+        stock = InventoryLedgerService().get_stock_quantities([inventory.id])
+        return stock[inventory.id] - reserved
+
+    def get_available_quantities(
+        self, product_ids, exclude_cart_id: Optional[UUID] = None
+    ) -> dict[UUID, int]:
+        # one query for any number of products
+        return dict(
+            Product.objects.filter(id__in=product_ids)
+            .annotate(available=available_quantity(exclude_cart_id=exclude_cart_id))
+            .values_list("id", "available")
+        )
+
+    def reserve(self, cart_item: CartItem) -> StockReservation:
+        reservation, _ = StockReservation.objects.update_or_create(
+            cart_item=cart_item,
+            defaults={
+                "cart_id": cart_item.cart_id,
+                "product_id": cart_item.product_id,
+                "quantity": cart_item.quantity,
+                "expires_at": self.get_expiry(),
+            },
+        )
+        invalidate_stock_cache([cart_item.product_id])
+        return reservation
+
+    def reserve_many(self, cart_items: list[CartItem]) -> list[StockReservation]:
+        # one upsert, the items' existing reservations are overwritten
+        expires_at = self.get_expiry()
+        reservations = StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    cart_item=cart_item,
+                    cart_id=cart_item.cart_id,
+                    product_id=cart_item.product_id,
+                    quantity=cart_item.quantity,
+                    expires_at=expires_at,
+                )
+                for cart_item in cart_items
+            ],
+            update_conflicts=True,
+            unique_fields=["cart_item"],
+            update_fields=["quantity", "expires_at"],
+        )
+        invalidate_stock_cache([cart_item.product_id for cart_item in cart_items])
+        return reservations
+
+    def extend_cart_reservations(self, cart_id: UUID) -> int:
+        # lapsed reservations stay lapsed, their stock may be held elsewhere
+        return StockReservation.objects.filter(
+            active_reservations_filter(), cart_id=cart_id
+        ).update(expires_at=self.get_expiry())
+
+    def release_expired(self, batch_size: Optional[int] = None) -> int:
+        batch_size = batch_size or settings.STOCK_RESERVATION_SWEEP_BATCH_SIZE
+        released = 0
+        while True:
+            now = timezone.now()
+            with transaction.atomic():
+                batch = list(
+                    StockReservation.objects.filter(expires_at__lte=now).values_list(
+                        "pk", "product_id"
+                    )[:batch_size]
+                )
+                # rows extended meanwhile stay
+                deleted, _ = StockReservation.objects.filter(
+                    pk__in=[pk for pk, _ in batch], expires_at__lte=now
+                ).delete()
+                if batch:
+                    # the released stock is available again
+                    invalidate_stock_cache({product_id for _, product_id in batch})
+            released += deleted
+            if len(batch) < batch_size:
+                return released
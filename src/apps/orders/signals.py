@@ -0,0 +1,27 @@
+from typing import Optional
+
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from django.http import HttpRequest
+
+from src.apps.orders.services.anonymous_cart_service import AnonymousCartService
+from src.apps.users.enums import UserRole
+from src.apps.users.models import UserProfile
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(
+    sender, request: Optional[HttpRequest], user, **kwargs
+) -> None:
+    # logins without a request, e.g. in scripts, have no cookies
+    if request is None:
+        return
+    service = AnonymousCartService()
+    token = service.get_token(request)
+    if token is None:
+        return
+    profile = UserProfile.objects.filter(
+        user=user, role=UserRole.CUSTOMER.value
+    ).first()
+    if profile is not None:
+        service.merge(token, profile)
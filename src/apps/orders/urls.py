@@ -1,5 +1,7 @@
 from django.urls import path
 from src.apps.orders.views import (
+    AnonymousCartAPIView,
+    CartItemsBulkAPIView,
     CartItemsDetailAPIView,
     CartItemsListCreateAPIView,
     CartListCreateAPIView,
@@ -8,6 +10,8 @@ from src.apps.orders.views import (
     OrderDetailAPIView,
     OrderListAPIView,
     MostOrderedProductsListAPIView,
+    ProductRecommendationListAPIView,
+    ProductAvailabilityAPIView,
 )
 
 app_name = "orders"
@@ -18,6 +22,11 @@ urlpatterns = [
         CartListCreateAPIView.as_view({"get": "list", "post": "create"}),
         name="cart-list",
     ),
+    path(
+        "carts/anonymous/",
+        AnonymousCartAPIView.as_view({"get": "list", "post": "create"}),
+        name="anonymous-cart",
+    ),
     path(
         "carts/<uuid:pk>/",
         CartDetailAPIView.as_view({"delete": "destroy", "get": "retrieve"}),
@@ -28,6 +37,11 @@ urlpatterns = [
         CartItemsListCreateAPIView.as_view({"get": "list", "post": "create"}),
         name="cart-item-list",
     ),
+    path(
+        "carts/<uuid:pk>/items/bulk/",
+        CartItemsBulkAPIView.as_view({"post": "create"}),
+        name="cart-item-bulk",
+    ),
     path(
         "carts/<uuid:pk>/items/<uuid:cart_item_pk>/",
         CartItemsDetailAPIView.as_view(
@@ -51,4 +65,15 @@ urlpatterns = [
         MostOrderedProductsListAPIView.as_view({"get": "list"}),
         name="most-ordered-proudcts-list",
     ),
+    # next to the product detail, the products' urls don't match them
+    path(
+        "products/availability/",
+        ProductAvailabilityAPIView.as_view({"get": "list"}),
+        name="product-availability",
+    ),
+    path(
+        "products/<uuid:pk>/recommendations/",
+        ProductRecommendationListAPIView.as_view({"get": "list"}),
+        name="product-recommendations",
+    ),
 ]
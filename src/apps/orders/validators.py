@@ -1,6 +1,21 @@
+from rest_framework.exceptions import ValidationError
+
 from src.core.exceptions import MaxQuantityExceededException
 
 
 def validate_item_quantity(typed_quantity: int, max_quantity: int):
     if typed_quantity > max_quantity:
         raise MaxQuantityExceededException(max_quantity, typed_quantity)
+
+
+def validate_products_found(product_ids: set, found_ids) -> None:
+    missing = product_ids - set(found_ids)
+    if missing:
+        raise ValidationError(
+            {
+                "operations": [
+                    "Products not found: "
+                    f"{', '.join(sorted(str(product_id) for product_id in missing))}!"
+                ]
+            }
+        )
@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 from rest_framework import permissions, status
@@ -11,38 +13,68 @@ from rest_framework.mixins import (
 )
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filters
-from django.db.models import Sum, Count, F
+from django.db.models import Expression, Sum, Count, F, Max
 from django.utils import timezone
 
-from src.apps.orders.models import Cart, CartItem, Order, OrderItem
+from src.apps.orders.models import (
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+    ProductRecommendation,
+)
+from src.apps.products.models import Product
 from src.apps.orders.serializers import (
+    AnonymousCartOutputSerializer,
     CartOutputSerializer,
     CartItemOutputSerializer,
     CartItemInputSerializer,
+    CartItemBulkInputSerializer,
     CartItemQuantityInputSerializer,
     OrderOutputSerializer,
     OrderInputSerializer,
     CartItemUpdateSerializer,
     OrderUpdateSerializer,
     MostOrderedProductsOutputSerializer,
+    ProductRecommendationOutputSerializer,
+    ProductAvailabilityInputSerializer,
+    ProductAvailabilityResultOutputSerializer,
 )
+from src.apps.orders.services.anonymous_cart_service import AnonymousCartService
 from src.apps.orders.services.order_service import OrderCreateService
 from src.apps.orders.services.cart_service import (
     CartCreateService,
     CartItemCreateService,
     CartItemUpdateService,
+    CartItemBulkService,
+)
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+)
+from src.apps.orders.services.product_availability_service import (
+    ProductAvailabilityService,
 )
+from src.apps.products.cache import invalidate_stock_cache
 from src.apps.orders.filters import OrderFilter, MostOrderedProductsFilter
+from src.apps.orders.annotations import item_price, items_total
+from src.apps.orders.json_documents import cart_json_document, order_json_document
+from src.core.mixins import (
+    ConditionalRetrieveMixin,
+    DatabaseJSONRetrieveMixin,
+    DynamicFieldsMixin,
+    make_etag,
+)
+from src.core.pagination import PageNumberOrCursorPagination
 from src.core.permissions import CartOwnerOrAdmin, CustomerOrAdmin, NonCustomer
 
 
-class CartListCreateAPIView(GenericViewSet, ListModelMixin):
-    queryset = Cart.objects.all()
+class CartListCreateAPIView(DynamicFieldsMixin, GenericViewSet, ListModelMixin):
+    queryset = Cart.objects.annotate(items_total=items_total(CartItem, "cart"))
     serializer_class = CartOutputSerializer
     permission_classes = [CustomerOrAdmin]
 
     def get_queryset(self):
-        qs = self.queryset
+        qs = super().get_queryset()
         user = self.request.user
         if user.is_superuser:
             return qs
@@ -58,18 +90,27 @@ class CartListCreateAPIView(GenericViewSet, ListModelMixin):
         )
 
 
-class CartDetailAPIView(GenericViewSet, RetrieveModelMixin, DestroyModelMixin):
-    queryset = Cart.objects.all()
+class CartDetailAPIView(
+    DatabaseJSONRetrieveMixin,
+    DynamicFieldsMixin,
+    GenericViewSet,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+):
+    queryset = Cart.objects.annotate(items_total=items_total(CartItem, "cart"))
     serializer_class = CartOutputSerializer
     permission_classes = [permissions.IsAuthenticated, CustomerOrAdmin]
 
     def get_queryset(self):
-        qs = self.queryset
+        qs = super().get_queryset()
         user = self.request.user
         if user.is_superuser:
             return qs
         return qs.filter(user__user=user)
 
+    def get_json_document_expression(self) -> Expression:
+        return cart_json_document()
+
 
 class CartItemsListCreateAPIView(GenericViewSet, ListModelMixin):
     queryset = CartItem.objects.all()
@@ -82,7 +123,7 @@ class CartItemsListCreateAPIView(GenericViewSet, ListModelMixin):
 
     def get_queryset(self):
         cart_pk = self.kwargs.get("pk")
-        qs = self.queryset
+        qs = self.queryset.select_related("product").annotate(line_total=item_price())
         user = self.request.user
         if user.is_superuser:
             return qs
@@ -117,6 +158,12 @@ class CartItemsDetailAPIView(GenericViewSet, RetrieveModelMixin, DestroyModelMix
         obj = get_object_or_404(CartItem, id=id, cart_id=cart_id)
         return obj
 
+    def perform_destroy(self, instance: CartItem) -> None:
+        # the item's reservation is deleted with it
+        instance.delete()
+        StockReservationService().extend_cart_reservations(instance.cart_id)
+        invalidate_stock_cache([instance.product_id])
+
     def update(self, request: Request, pk: UUID, cart_item_pk: UUID) -> Response:
         service = CartItemUpdateService()
         instance = self.get_object()
@@ -130,6 +177,50 @@ class CartItemsDetailAPIView(GenericViewSet, RetrieveModelMixin, DestroyModelMix
         )
 
 
+class CartItemsBulkAPIView(GenericViewSet):
+    queryset = Cart.objects.annotate(items_total=items_total(CartItem, "cart"))
+    serializer_class = CartOutputSerializer
+    permission_classes = [
+        permissions.IsAuthenticated,
+        CartOwnerOrAdmin,
+        CustomerOrAdmin,
+    ]
+
+    def create(self, request: Request, pk: UUID) -> Response:
+        serializer = CartItemBulkInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        service = CartItemBulkService()
+        cart = service.apply_operations(cart_id=pk, data=serializer.validated_data)
+        cart = (
+            self.get_queryset()
+            .select_related("user")
+            .prefetch_related("cart_items__product")
+            .get(pk=cart.pk)
+        )
+        return Response(self.get_serializer(cart).data, status=status.HTTP_200_OK)
+
+
+class AnonymousCartAPIView(GenericViewSet):
+    serializer_class = AnonymousCartOutputSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request: Request) -> Response:
+        service = AnonymousCartService()
+        cart = service.get_cart(service.get_token(request))
+        return Response(self.get_serializer(cart).data, status=status.HTTP_200_OK)
+
+    def create(self, request: Request) -> Response:
+        serializer = CartItemBulkInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        service = AnonymousCartService()
+        token = service.get_token(request) or service.new_token()
+        cart = service.apply_operations(token, serializer.validated_data)
+        response = Response(self.get_serializer(cart).data, status=status.HTTP_200_OK)
+        # the cookie lives as long as the cached cart
+        service.set_token(response, token)
+        return response
+
+
 class OrderCreateAPIView(GenericViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderOutputSerializer
@@ -151,33 +242,73 @@ class OrderCreateAPIView(GenericViewSet):
         )
 
 
-class OrderListAPIView(GenericViewSet, ListModelMixin):
-    queryset = Order.objects.all()
+class OrderListAPIView(DynamicFieldsMixin, GenericViewSet, ListModelMixin):
+    queryset = Order.objects.annotate(items_total=items_total(OrderItem, "order"))
     serializer_class = OrderOutputSerializer
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = OrderFilter
+    pagination_class = PageNumberOrCursorPagination
     permission_classes = [permissions.IsAuthenticated, CustomerOrAdmin]
 
     def get_queryset(self):
-        qs = self.queryset
+        qs = super().get_queryset()
         user = self.request.user
         if user.is_superuser:
             return qs
         return qs.filter(user__user=user)
 
 
-class OrderDetailAPIView(GenericViewSet, RetrieveModelMixin, DestroyModelMixin):
-    queryset = Order.objects.all()
+class OrderDetailAPIView(
+    ConditionalRetrieveMixin,
+    DatabaseJSONRetrieveMixin,
+    DynamicFieldsMixin,
+    GenericViewSet,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+):
+    queryset = Order.objects.annotate(items_total=items_total(OrderItem, "order"))
     serializer_class = OrderOutputSerializer
     permission_classes = [permissions.IsAuthenticated, CustomerOrAdmin]
 
     def get_queryset(self):
-        qs = self.queryset
+        qs = super().get_queryset()
         user = self.request.user
         if user.is_superuser:
             return qs
         return qs.filter(user__user=user)
 
+    def get_conditional_validators(self) -> Optional[tuple[str, datetime]]:
+        # order items show current product names and prices and the address is
+        # edited in place, so their updates are part of the order's version;
+        # the profile isn't rendered (see OrderOutputSerializer)
+        order = (
+            self.get_queryset()
+            .prefetch_related(None)
+            .filter(pk=self.kwargs["pk"])
+            .annotate(
+                items_count=Count("order_items"),
+                items_updated_at=Max("order_items__product__updated_at"),
+            )
+            .values(
+                "updated_at",
+                "address_id",
+                "address__updated_at",
+                "items_count",
+                "items_updated_at",
+            )
+            .first()
+        )
+        if order is None:
+            return None
+        return make_etag(*order.values(), self.get_field_selection_key()), max(
+            order["updated_at"],
+            order["address__updated_at"] or order["updated_at"],
+            order["items_updated_at"] or order["updated_at"],
+        )
+
+    def get_json_document_expression(self) -> Expression:
+        return order_json_document()
+
     def update(self, request: Request, pk: UUID) -> Response:
         service = OrderUpdateService()
         instance = self.get_object()
@@ -235,3 +366,26 @@ class MostOrderedProductsListAPIView(GenericViewSet, ListModelMixin):
 
         serializer = self.get_serializer(queryset[: int(max_products)], many=True)
         return Response(serializer.data)
+
+
+class ProductRecommendationListAPIView(GenericViewSet, ListModelMixin):
+    serializer_class = ProductRecommendationOutputSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        product = get_object_or_404(Product.objects.only("pk"), pk=self.kwargs["pk"])
+        return ProductRecommendation.objects.filter(product=product).select_related(
+            "recommended_product__category"
+        )
+
+
+class ProductAvailabilityAPIView(GenericViewSet):
+    serializer_class = ProductAvailabilityResultOutputSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request: Request) -> Response:
+        service = ProductAvailabilityService()
+        serializer = ProductAvailabilityInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        result = service.get_availability(serializer.validated_data["ids"])
+        return Response(self.get_serializer(result).data, status=status.HTTP_200_OK)
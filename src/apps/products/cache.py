@@ -0,0 +1,175 @@
+import time
+from hashlib import md5
+from typing import Callable, Iterable
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import QueryDict
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+CATALOG_VERSION_KEY = "products:catalog-version"
+# bumped by inventory ledger writes, only responses showing stock use it
+STOCK_VERSION_KEY = "products:stock-version"
+CATALOG_CACHE_HITS_KEY = "products:cache-stats:hits"
+CATALOG_CACHE_MISSES_KEY = "products:cache-stats:misses"
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        # a timestamp instead of 1, so an evicted counter never comes back to
+        # a version that older entries were stored under
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_catalog_version() -> int:
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog_cache() -> None:
+    _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_stock_version() -> int:
+    return _get_version(STOCK_VERSION_KEY)
+
+
+def invalidate_stock_responses() -> None:
+    _bump_version(STOCK_VERSION_KEY)
+
+
+def normalize_query_params(query_params: QueryDict, exclude: tuple = ()) -> str:
+    return "&".join(
+        f"{key}={value}"
+        for key in sorted(query_params)
+        if key not in exclude
+        for value in sorted(query_params.getlist(key))
+    )
+
+
+def build_catalog_cache_key(prefix: str, *parts: str) -> str:
+    digest = md5("|".join(parts).encode("utf-8")).hexdigest()
+    return f"products:{prefix}:{get_catalog_version()}:{digest}"
+
+
+def get_stock_cache_keys(product_ids: Iterable[UUID]) -> dict[UUID, str]:
+    # under the catalog version as well, so price changes drop the entries
+    version = get_catalog_version()
+    return {
+        product_id: f"products:stock:{version}:{product_id}"
+        for product_id in product_ids
+    }
+
+
+def _delete_stock_cache(product_ids: list[UUID]) -> None:
+    cache.delete_many(list(get_stock_cache_keys(product_ids).values()))
+
+
+def invalidate_stock_cache(product_ids: Iterable[UUID]) -> None:
+    # again after commit, like the catalog version
+    product_ids = list(product_ids)
+    _delete_stock_cache(product_ids)
+    transaction.on_commit(lambda: _delete_stock_cache(product_ids))
+
+
+def _increment_counter(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_catalog_cache_stats() -> dict[str, int]:
+    return {
+        "hits": cache.get(CATALOG_CACHE_HITS_KEY, 0),
+        "misses": cache.get(CATALOG_CACHE_MISSES_KEY, 0),
+    }
+
+
+class CatalogResponseCacheMixin:
+    """
+    Serves anonymous list/retrieve requests from the cache. Entries are keyed
+    by host, path and normalized query string under the current catalog
+    version, so any catalog write makes them unreachable. Views whose
+    response shows stock are also keyed under the stock version, which
+    sales and other ledger writes bump without touching the rest of the
+    catalog. Validator headers are cached with the data, so conditional
+    requests are answered too.
+    """
+
+    cache_header = "X-Cache"
+    cached_headers = ("ETag", "Last-Modified")
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return self._cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        return self._cached_response(request, super().retrieve, *args, **kwargs)
+
+    def renders_stock(self) -> bool:
+        return False
+
+    def _cached_response(
+        self, request: Request, handler: Callable, *args, **kwargs
+    ) -> Response:
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+
+        cache_key = build_catalog_cache_key(
+            "responses",
+            request.get_host(),
+            request.path,
+            normalize_query_params(request.query_params),
+            str(get_stock_version()) if self.renders_stock() else "",
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _increment_counter(CATALOG_CACHE_HITS_KEY)
+            data, headers = cached
+            response = Response(
+                data,
+                status=status.HTTP_200_OK,
+                headers={**headers, self.cache_header: "HIT"},
+            )
+            return (
+                get_conditional_response(
+                    request,
+                    etag=headers.get("ETag"),
+                    last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+                    response=response,
+                )
+                or response
+            )
+
+        _increment_counter(CATALOG_CACHE_MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {
+                header: response[header]
+                for header in self.cached_headers
+                if response.has_header(header)
+            }
+            cache.set(
+                cache_key,
+                (response.data, headers),
+                settings.CATALOG_RESPONSE_CACHE_TIMEOUT,
+            )
+        response[self.cache_header] = "MISS"
+        return response
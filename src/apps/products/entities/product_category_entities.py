@@ -1,12 +1,15 @@
 from dataclasses import dataclass
 from typing import Optional
+from uuid import UUID
 
 
 @dataclass(frozen=True)
 class ProductCategoryEntity:
     name: str
+    parent_id: Optional[UUID] = None
 
 
 @dataclass(frozen=True)
 class ProductCategoryUpdateEntity:
     name: Optional[str]
+    parent_id: Optional[UUID] = None
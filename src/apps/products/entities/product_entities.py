@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
 from io import BytesIO
 from typing import Optional
+from uuid import UUID
 
 
 @dataclass(frozen=True)
@@ -18,3 +19,46 @@ class ProductUpdateEntity:
     price: Optional[Decimal]
     description: Optional[str]
     product_image: Optional[BytesIO]
+
+
+@dataclass(frozen=True)
+class ProductImportRowEntity:
+    sku: str
+    name: str
+    price: Decimal
+    description: Optional[str]
+    category: str
+    quantity: int
+
+
+@dataclass
+class ProductImportResultEntity:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class ProductBulkUpdateItemEntity:
+    id: UUID
+    price: Optional[Decimal]
+    quantity: Optional[int]
+
+
+@dataclass(frozen=True)
+class ProductBulkOperationEntity:
+    field: str
+    operation: str
+    value: Decimal
+    unit: str
+    category_id: Optional[UUID]
+    product_ids: Optional[list[UUID]]
+
+
+@dataclass
+class ProductBulkUpdateResultEntity:
+    updated_prices: int = 0
+    updated_quantities: int = 0
+    not_found: list[UUID] = field(default_factory=list)
+    operations: list[int] = field(default_factory=list)
@@ -1,17 +1,38 @@
 from django import forms
-from django.db.models import Case, When, F, Avg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db.models import Case, When, F, Avg, FloatField, Q, QuerySet
+from django.db.models.functions import Cast
 from django.db import models
 from django_filters import rest_framework as filters
 from src.apps.products.models import Product, ProductCategory
 
 
+# has to match the text search configuration used by the search vector trigger
+PRODUCT_SEARCH_CONFIG = "english"
+
+
+class CategorySubtreeFilter(filters.ModelMultipleChoiceFilter):
+    # a category matches its whole subtree, one prefix range of the path
+    # index per selected category
+    def filter(self, queryset: QuerySet, value: list[ProductCategory]) -> QuerySet:
+        if not value:
+            return queryset
+        subtrees = Q()
+        for category in value:
+            subtrees |= Q(category__path__startswith=category.path)
+        return queryset.filter(subtrees)
+
+
 class ProductFilter(filters.FilterSet):
     name = filters.LookupChoiceFilter(
         field_class=forms.CharField, lookup_choices=[("exact", "Equals")]
     )
-    category = filters.ModelMultipleChoiceFilter(
+    category = CategorySubtreeFilter(
         queryset=ProductCategory.objects.all(),
-        field_name="category__name",
         to_field_name="name",
     )
     price = filters.LookupChoiceFilter(
@@ -30,6 +51,11 @@ class ProductFilter(filters.FilterSet):
         ],
     )
 
+    name_similar = filters.CharFilter(
+        method="filter_name_similar", label="Name similar to"
+    )
+    q = filters.CharFilter(method="filter_search", label="Search")
+
     o = filters.OrderingFilter(
         fields=(
             ("name", "name"),
@@ -47,3 +73,34 @@ class ProductFilter(filters.FilterSet):
             "category",
             "price",
         ]
+
+    def filter_search(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
+        query = SearchQuery(
+            value, config=PRODUCT_SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=query)
+            # real is widened to double precision, so a cursor's rank reads
+            # back equal to the row's
+            .annotate(
+                search_rank=Cast(
+                    SearchRank(F("search_vector"), query), output_field=FloatField()
+                )
+            ).order_by("-search_rank", "id")
+        )
+
+    def filter_name_similar(
+        self, queryset: QuerySet, name: str, value: str
+    ) -> QuerySet:
+        # `trigram_similar` (the % operator, bound to the connection's
+        # PRODUCT_NAME_SIMILARITY_THRESHOLD) is answered by the gin_trgm_ops
+        # index, so similarity is only computed for the candidate rows
+        return (
+            queryset.filter(name__trigram_similar=value)
+            .annotate(
+                name_similarity=Cast(
+                    TrigramSimilarity("name", value), output_field=FloatField()
+                )
+            )
+            .order_by("-name_similarity", "id")
+        )
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from typing import Optional
+
+from django.conf import settings
+
+
+class ResizedImageDiskCache:
+    """
+    Least recently used files are evicted once the directory grows over
+    max_size bytes. A file's mtime is its last use, since atime is often
+    not updated (noatime mounts).
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, max_size: Optional[int] = None
+    ) -> None:
+        self.directory = directory or settings.PRODUCT_IMAGE_CACHE_DIR
+        self.max_size = max_size or settings.PRODUCT_IMAGE_CACHE_MAX_SIZE
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # never cached or evicted by another process in the meantime
+            return None
+        return content
+
+    def set(self, key: str, content: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # written next to the target and renamed, so readers never see
+        # a partially written file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(content)
+        os.replace(temp_path, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as scanned:
+            for entry in scanned:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
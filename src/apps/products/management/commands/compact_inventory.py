@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+
+
+class Command(BaseCommand):
+    help = "Folds the recorded inventory movements into the stock snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep compacting instead of exiting",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.INVENTORY_COMPACTION_INTERVAL,
+            help="seconds to wait between compactions",
+        )
+
+    def handle(self, *args, **options):
+        service = InventoryLedgerService()
+        while True:
+            compacted = service.compact()
+            if compacted:
+                self.stdout.write(
+                    f"Compacted the movements of {compacted} inventories."
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
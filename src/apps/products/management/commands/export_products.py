@@ -0,0 +1,57 @@
+from functools import partial
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from src.apps.products.serializers import PRODUCT_IMPORT_FORMATS
+from src.apps.products.services.product_export_service import ProductExportService
+
+
+class Command(BaseCommand):
+    help = "Exports the catalog to CSV or NDJSON without loading it into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=PRODUCT_IMPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--updated-since",
+            help="only export products changed since this ISO 8601 datetime",
+        )
+        parser.add_argument(
+            "--output", help="path of the file to write, stdout when omitted"
+        )
+        parser.add_argument(
+            "--base-url",
+            help="site URL the image columns are resolved against, "
+            "e.g. https://shop.example.com",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="number of rows fetched per database round trip",
+        )
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options["updated_since"]:
+            updated_since = parse_datetime(options["updated_since"])
+            if updated_since is None:
+                raise CommandError(
+                    f"Invalid --updated-since value: {options['updated_since']}"
+                )
+
+        build_absolute_uri = None
+        if options["base_url"]:
+            build_absolute_uri = partial(urljoin, options["base_url"])
+
+        service = ProductExportService(
+            chunk_size=options["chunk_size"], build_absolute_uri=build_absolute_uri
+        )
+        lines = service.export_products(options["format"], updated_since)
+        if options["output"] is None:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(options["output"], "w", newline="", encoding="utf-8") as file:
+            file.writelines(lines)
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.apps.products.serializers import PRODUCT_IMPORT_FORMATS
+from src.apps.products.services.product_import_service import ProductImportService
+
+
+class Command(BaseCommand):
+    help = "Imports products from a CSV or NDJSON file, skipping unchanged rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="path of the file to import")
+        parser.add_argument(
+            "--format",
+            choices=PRODUCT_IMPORT_FORMATS,
+            help="file format, guessed from the file extension when omitted",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="number of rows written per bulk statement",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        service = ProductImportService(chunk_size=options["chunk_size"])
+        format = options["format"] or service.detect_format(path)
+
+        try:
+            with open(path, "rb") as file:
+                result = service.import_products(service.parse_rows(file, format))
+        except OSError as exc:
+            raise CommandError(f"Can't read {path}: {exc}")
+
+        for error in result.errors:
+            self.stderr.write(
+                f"Row {error['row']} (sku {error['sku']}): {json.dumps(error['errors'])}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result.created}, updated {result.updated}, "
+                f"skipped {result.skipped}, failed {len(result.errors)} products."
+            )
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from src.apps.products.services.product_thumbnail_service import (
+    ProductThumbnailService,
+)
+
+
+class Command(BaseCommand):
+    help = "Generates the thumbnails of products with a new image."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep polling for new images instead of exiting",
+        )
+        parser.add_argument(
+            "--limit", type=int, help="maximum number of products per run"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.PRODUCT_THUMBNAIL_POLL_INTERVAL,
+            help="seconds to wait when there are no pending images",
+        )
+
+    def handle(self, *args, **options):
+        service = ProductThumbnailService()
+        while True:
+            processed = service.process_pending(limit=options["limit"])
+            if processed:
+                self.stdout.write(f"Generated thumbnails of {processed} products.")
+            if not options["loop"]:
+                break
+            if not processed:
+                time.sleep(options["interval"])
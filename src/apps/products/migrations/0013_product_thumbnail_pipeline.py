@@ -0,0 +1,55 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    Product.objects.exclude(product_image="").exclude(product_image=None).update(
+        thumbnail_status="pending"
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0012_product_sku_import_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="image_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="thumbnail_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                editable=False,
+                max_length=10,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("thumbnail_status", "pending")),
+                fields=["updated_at"],
+                name="product_thumbnail_pending_idx",
+            ),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
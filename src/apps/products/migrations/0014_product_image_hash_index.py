@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0013_product_thumbnail_pipeline"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="image_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:30
+
+from collections import Counter
+
+from django.db import migrations, models
+import src.apps.products.storage
+
+
+def count_existing_references(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    StoredFile = apps.get_model("products", "StoredFile")
+
+    references = Counter()
+    for image, thumbnail, thumbnails in Product.objects.values_list(
+        "product_image", "product_thumbnail", "thumbnails"
+    ).iterator():
+        references.update(
+            name for name in {image, thumbnail, *thumbnails.values()} if name
+        )
+    StoredFile.objects.bulk_create(
+        StoredFile(name=name, reference_count=count)
+        for name, count in references.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0014_product_image_hash_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredFile",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("reference_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="product_image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=src.apps.products.storage.get_product_file_storage,
+                upload_to="products",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="product_thumbnail",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=src.apps.products.storage.get_product_file_storage,
+                upload_to="thumbnails",
+            ),
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
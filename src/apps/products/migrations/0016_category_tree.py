@@ -0,0 +1,48 @@
+# Generated by Django 4.2.5 on 2026-10-18 20:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_root_paths(apps, schema_editor):
+    # existing categories become roots
+    ProductCategory = apps.get_model("products", "ProductCategory")
+    categories = list(ProductCategory.objects.only("id"))
+    for category in categories:
+        category.path = f"{category.id.hex}/"
+    ProductCategory.objects.bulk_update(categories, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0015_content_addressed_product_files"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productcategory",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="children",
+                to="products.productcategory",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productcategory",
+            name="path",
+            field=models.TextField(default="", editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(build_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="productcategory",
+            index=models.Index(
+                fields=["path"],
+                name="category_path_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+    ]
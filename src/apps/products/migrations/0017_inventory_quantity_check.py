@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+def clamp_oversold_inventories(apps, schema_editor):
+    # stock oversold before the constraint existed
+    ProductInventory = apps.get_model("products", "ProductInventory")
+    ProductInventory.objects.filter(quantity__lt=0).update(quantity=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0016_category_tree"),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_oversold_inventories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="productinventory",
+            constraint=models.CheckConstraint(
+                check=models.Q(("quantity__gte", 0)), name="inventory_quantity_gte_0"
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0017_inventory_quantity_check"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productinventory",
+            name="snapshot_movement_id",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="InventoryMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("restock", "Restock"),
+                            ("sale", "Sale"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("reference", models.CharField(blank=True, max_length=100)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "inventory",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="products.productinventory",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["inventory", "id"],
+                        include=("quantity",),
+                        name="movement_inventory_id_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
 import uuid
+from typing import Optional
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
-from src.apps.products.utils import make_thumbnail
+from src.apps.products.storage import get_product_file_storage
+from src.apps.products.utils import get_file_hash
 
 
 class ProductCategory(models.Model):
@@ -10,27 +14,138 @@ class ProductCategory(models.Model):
         primary_key=True, default=uuid.uuid4, editable=False, unique=True
     )
     name = models.CharField(max_length=50, unique=True)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="children",
+    )
+    # materialized path, the hex ids from the root down to the category
+    # itself, each followed by PATH_SEPARATOR. A subtree is a prefix match
+    # answered by the pattern ops index, moves go through
+    # ProductCategoryMoveService, which rewrites it for the whole subtree.
+    path = models.TextField(editable=False)
+
+    PATH_SEPARATOR = "/"
 
     class Meta:
         verbose_name = "Category"
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(
+                fields=["path"],
+                name="category_path_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def build_path(self, parent: Optional["ProductCategory"]) -> str:
+        prefix = parent.path if parent else ""
+        return f"{prefix}{self.id.hex}{self.PATH_SEPARATOR}"
+
+    def get_ancestor_ids(self) -> list[uuid.UUID]:
+        return [
+            uuid.UUID(category_id)
+            for category_id in self.path.split(self.PATH_SEPARATOR)[:-2]
+        ]
+
+    def get_ancestors(self) -> models.QuerySet:
+        # paths of ancestors are prefixes of each other, so they sort root first
+        return ProductCategory.objects.filter(id__in=self.get_ancestor_ids()).order_by(
+            "path"
+        )
+
+    def get_descendants(self) -> models.QuerySet:
+        return (
+            ProductCategory.objects.filter(path__startswith=self.path)
+            .exclude(pk=self.pk)
+            .order_by("path")
+        )
+
+    def save(self, *args, **kwargs):
+        if not self.path:
+            self.path = self.build_path(self.parent)
+        super().save(*args, **kwargs)
+
 
 class ProductInventory(models.Model):
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False, unique=True
     )
+    # stock after the movements up to `snapshot_movement_id`, the current
+    # stock adds the newer ones, see InventoryLedgerService
     quantity = models.IntegerField()
+    snapshot_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Inventory"
         verbose_name_plural = "Inventories"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(quantity__gte=0), name="inventory_quantity_gte_0"
+            ),
+        ]
 
     def __str__(self) -> str:
-        return f"Available : {self.quantity} | {self.product.name}"
+        return f"Available : {self.current_quantity} | {self.product.name}"
+
+    @property
+    def current_quantity(self) -> int:
+        # the product views annotate their products with `inventory_stock`,
+        # an inventory loaded with its product reads it from there
+        if ProductInventory.product.is_cached(self) and hasattr(
+            self.product, "inventory_stock"
+        ):
+            return self.product.inventory_stock
+        pending = self.movements.filter(id__gt=self.snapshot_movement_id).aggregate(
+            total=models.Sum("quantity")
+        )["total"]
+        return self.quantity + (pending or 0)
+
+
+class InventoryMovementKind(models.TextChoices):
+    RESTOCK = "restock"
+    SALE = "sale"
+    ADJUSTMENT = "adjustment"
+
+
+class InventoryMovement(models.Model):
+    # append-only ledger of stock changes, rows are never updated
+    inventory = models.ForeignKey(
+        ProductInventory,
+        on_delete=models.CASCADE,
+        related_name="movements",
+        db_index=False,
+    )
+    kind = models.CharField(max_length=20, choices=InventoryMovementKind.choices)
+    quantity = models.IntegerField()
+    # what caused the movement, e.g. the order of a sale
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # the pending movements of an inventory are an index only scan
+            models.Index(
+                fields=["inventory", "id"],
+                include=["quantity"],
+                name="movement_inventory_id_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} of {self.quantity} | inventory {self.inventory_id}"
+
+
+class ThumbnailStatus(models.TextChoices):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
 
 
 class Product(models.Model):
@@ -48,10 +163,85 @@ class Product(models.Model):
     inventory = models.OneToOneField(
         ProductInventory, on_delete=models.CASCADE, related_name="product"
     )
-    product_image = models.ImageField(blank=True, null=True)
-    product_thumbnail = models.ImageField(blank=True, null=True)
+    product_image = models.ImageField(
+        upload_to="products",
+        storage=get_product_file_storage,
+        blank=True,
+        null=True,
+    )
+    product_thumbnail = models.ImageField(
+        upload_to="thumbnails",
+        storage=get_product_file_storage,
+        blank=True,
+        null=True,
+    )
+    # generated by the process_thumbnails worker, see ProductThumbnailService
+    image_hash = models.CharField(
+        max_length=64, blank=True, null=True, editable=False, db_index=True
+    )
+    thumbnail_status = models.CharField(
+        max_length=10,
+        choices=ThumbnailStatus.choices,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
+    # identifies the product across bulk imports, see ProductImportService
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    import_hash = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    # kept up to date by the products_product_search_vector_update trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(
+                fields=["name"],
+                name="product_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                fields=["updated_at"],
+                name="product_thumbnail_pending_idx",
+                condition=models.Q(thumbnail_status=ThumbnailStatus.PENDING),
+            ),
+        ]
+
+    def get_stored_file_names(self) -> set[str]:
+        names = {
+            self.product_image.name,
+            self.product_thumbnail.name,
+            *self.thumbnails.values(),
+        }
+        return {name for name in names if name}
 
     def save(self, *args, **kwargs):
-        make_thumbnail(self)
+        if not self.product_image:
+            self.image_hash = None
+            self.thumbnail_status = None
+            self.thumbnails = {}
+            self.product_thumbnail = None
+        elif not self.product_image._committed:
+            # a newly assigned file, only a different content needs thumbnails
+            image_hash = get_file_hash(self.product_image)
+            if image_hash != self.image_hash:
+                self.image_hash = image_hash
+                self.thumbnail_status = ThumbnailStatus.PENDING
 
         super(Product, self).save(*args, **kwargs)
+
+
+class StoredFile(models.Model):
+    # counts the products referencing a content addressed file, the file is
+    # deleted when the last reference goes away
+    name = models.CharField(max_length=255, primary_key=True)
+    reference_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name} | references: {self.reference_count}"
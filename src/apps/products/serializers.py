@@ -1,24 +1,46 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 
 from src.apps.products.models import Product, ProductCategory, ProductInventory
+from src.apps.products.storage import get_product_file_storage
+from src.core.serializers import (
+    DynamicFieldsSerializerMixin,
+    ExpandableField,
+    FieldLookups,
+)
 
 
 class ProductCategoryInputSerializer(serializers.Serializer):
     name = serializers.CharField()
+    parent_id = serializers.UUIDField(required=False, allow_null=True)
 
 
-class ProductCategoryOutputSerializer(serializers.ModelSerializer):
+class ProductCategoryOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = ProductCategory
-        fields = ("id", "name")
+        fields = ("id", "name", "parent")
         read_only_fields = fields
 
 
 class ProductInventoryInputSerializer(serializers.Serializer):
-    quantity = serializers.IntegerField(initial=0, allow_null=True)
+    quantity = serializers.IntegerField(initial=0, min_value=0)
+
+
+class ProductInventoryOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
+    # the snapshot column lags behind the inventory ledger
+    quantity = serializers.IntegerField(source="current_quantity", read_only=True)
 
+    field_lookups = {
+        "quantity": FieldLookups(only=("quantity", "snapshot_movement_id")),
+    }
 
-class ProductInventoryOutputSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductInventory
         fields = ("id", "quantity")
@@ -49,7 +71,7 @@ class ProductUpdateDataInputSerializer(serializers.Serializer):
 
 
 class ProductInventoryUpdateInputSerializer(serializers.Serializer):
-    quantity = serializers.IntegerField(initial=0, required=False)
+    quantity = serializers.IntegerField(initial=0, min_value=0, required=False)
 
 
 class ProductUpdateInputSerializer(serializers.Serializer):
@@ -58,8 +80,42 @@ class ProductUpdateInputSerializer(serializers.Serializer):
     inventory = ProductInventoryUpdateInputSerializer()
 
 
-class ProductOutputSerializer(serializers.ModelSerializer):
-    category_name = serializers.CharField(source="category", read_only=True)
+PRODUCT_CATEGORY_LOOKUPS = FieldLookups(
+    only=("category__id", "category__name", "category__parent"),
+    select_related=("category",),
+)
+PRODUCT_INVENTORY_LOOKUPS = FieldLookups(
+    only=(
+        "inventory__id",
+        "inventory__quantity",
+        "inventory__snapshot_movement_id",
+    ),
+    select_related=("inventory",),
+)
+PRODUCT_EXPANDABLE_FIELDS = {
+    "category": ExpandableField(
+        ProductCategoryOutputSerializer, "category", PRODUCT_CATEGORY_LOOKUPS
+    ),
+    "inventory": ExpandableField(
+        ProductInventoryOutputSerializer, "inventory", PRODUCT_INVENTORY_LOOKUPS
+    ),
+}
+
+
+class ProductOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
+    # uncategorized products get a null instead of a missing key
+    category_name = serializers.CharField(
+        source="category.name", read_only=True, allow_null=True, default=None
+    )
+
+    expandable_fields = PRODUCT_EXPANDABLE_FIELDS
+    field_lookups = {
+        "category_name": FieldLookups(
+            only=("category__name",), select_related=("category",)
+        ),
+    }
 
     class Meta:
         model = Product
@@ -72,13 +128,27 @@ class ProductOutputSerializer(serializers.ModelSerializer):
             "category_name",
             "product_image",
             "product_thumbnail",
+            "thumbnail_status",
         )
         read_only_fields = fields
 
 
-class ProductDetailOutputSerializer(serializers.ModelSerializer):
+class ProductDetailOutputSerializer(
+    DynamicFieldsSerializerMixin, serializers.ModelSerializer
+):
     inventory = ProductInventoryOutputSerializer(many=False, read_only=True)
     category = ProductCategoryOutputSerializer(many=False, read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+    resized_images = serializers.SerializerMethodField()
+
+    # both relations are always nested here, expanding them changes nothing
+    expandable_fields = PRODUCT_EXPANDABLE_FIELDS
+    field_lookups = {
+        "inventory": PRODUCT_INVENTORY_LOOKUPS,
+        "category": PRODUCT_CATEGORY_LOOKUPS,
+        "thumbnails": FieldLookups(only=("thumbnails",)),
+        "resized_images": FieldLookups(only=("image_hash",)),
+    }
 
     class Meta:
         model = Product
@@ -89,7 +159,188 @@ class ProductDetailOutputSerializer(serializers.ModelSerializer):
             "price",
             "product_image",
             "product_thumbnail",
+            "thumbnail_status",
+            "thumbnails",
+            "resized_images",
             "inventory",
             "category",
         )
         read_only_fields = fields
+
+    def get_thumbnails(self, obj: Product) -> dict[str, str]:
+        request = self.context.get("request")
+        urls = {
+            width: get_product_file_storage().url(name)
+            for width, name in obj.thumbnails.items()
+        }
+        if request is None:
+            return urls
+        return {width: request.build_absolute_uri(url) for width, url in urls.items()}
+
+    def get_resized_images(self, obj: Product) -> dict[str, str]:
+        if not obj.image_hash:
+            return {}
+        request = self.context.get("request")
+        url = reverse("products:product-image", kwargs={"image_hash": obj.image_hash})
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return {
+            str(width): f"{url}?width={width}"
+            for width in settings.PRODUCT_IMAGE_WIDTHS
+        }
+
+
+class ProductFacetsInputSerializer(serializers.Serializer):
+    price_buckets = serializers.CharField(required=False)
+
+    def validate_price_buckets(self, value: str) -> list[Decimal]:
+        try:
+            bounds = [Decimal(bound) for bound in value.split(",")]
+        except InvalidOperation:
+            bounds = []
+        if not bounds or not all(bound.is_finite() for bound in bounds):
+            raise serializers.ValidationError(
+                "Price buckets must be a comma separated list of numbers!"
+            )
+        if len(bounds) > settings.PRODUCT_FACET_MAX_PRICE_BUCKETS:
+            raise serializers.ValidationError(
+                f"At most {settings.PRODUCT_FACET_MAX_PRICE_BUCKETS} price buckets "
+                "can be requested!"
+            )
+        bounds = sorted(set(bounds))
+        if bounds[0] < 0:
+            raise serializers.ValidationError("Price buckets can't be negative!")
+        return bounds
+
+
+class ProductCategoryFacetOutputSerializer(serializers.Serializer):
+    id = serializers.UUIDField(source="category__id", allow_null=True)
+    name = serializers.CharField(source="category__name", allow_null=True)
+    count = serializers.IntegerField()
+
+
+class ProductPriceBucketOutputSerializer(serializers.Serializer):
+    min = serializers.DecimalField(max_digits=None, decimal_places=2)
+    max = serializers.DecimalField(max_digits=None, decimal_places=2, allow_null=True)
+    count = serializers.IntegerField()
+
+
+class ProductFacetsOutputSerializer(serializers.Serializer):
+    categories = ProductCategoryFacetOutputSerializer(many=True, read_only=True)
+    price_buckets = ProductPriceBucketOutputSerializer(many=True, read_only=True)
+
+
+class CatalogCacheStatsOutputSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+
+
+PRODUCT_IMPORT_FORMATS = ("csv", "ndjson")
+
+
+class ProductImportInputSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(
+        choices=PRODUCT_IMPORT_FORMATS, required=False, allow_null=True
+    )
+
+
+class ProductImportRowInputSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=64)
+    name = serializers.CharField(max_length=100)
+    price = serializers.DecimalField(max_digits=7, decimal_places=2, min_value=0)
+    description = serializers.CharField(
+        max_length=1000, required=False, allow_blank=True, allow_null=True
+    )
+    category = serializers.CharField(max_length=50)
+    quantity = serializers.IntegerField(min_value=0)
+
+    def validate_description(self, value: str) -> str:
+        return value or None
+
+
+class ProductImportRowErrorOutputSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    sku = serializers.CharField(allow_null=True)
+    errors = serializers.JSONField()
+
+
+class ProductImportOutputSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    skipped = serializers.IntegerField()
+    errors = ProductImportRowErrorOutputSerializer(many=True, read_only=True)
+
+
+class ProductBulkUpdateItemInputSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    price = serializers.DecimalField(
+        max_digits=7, decimal_places=2, min_value=0, required=False
+    )
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data: dict) -> dict:
+        if "price" not in data and "quantity" not in data:
+            raise serializers.ValidationError("Provide price or quantity to update!")
+        return data
+
+
+class ProductBulkOperationInputSerializer(serializers.Serializer):
+    field = serializers.ChoiceField(choices=("price", "quantity"))
+    operation = serializers.ChoiceField(choices=("increase", "decrease", "set"))
+    value = serializers.DecimalField(max_digits=9, decimal_places=2, min_value=0)
+    unit = serializers.ChoiceField(choices=("absolute", "percent"), default="absolute")
+    category_id = serializers.UUIDField(required=False, allow_null=True)
+    product_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_null=True
+    )
+
+    def validate(self, data: dict) -> dict:
+        # an operation never applies to the whole catalog by accident
+        if data.get("category_id") is None and data.get("product_ids") is None:
+            raise serializers.ValidationError(
+                "Provide category_id or product_ids to scope the operation!"
+            )
+        if data["unit"] == "percent":
+            if data["operation"] == "set":
+                raise serializers.ValidationError("Value can't be set to a percentage!")
+            if data["operation"] == "decrease" and data["value"] > 100:
+                raise serializers.ValidationError(
+                    "Value can't be decreased by more than 100%!"
+                )
+        elif data["field"] == "quantity" and data["value"] % 1:
+            raise serializers.ValidationError("Quantity must be a whole number!")
+        return data
+
+
+class ProductBulkUpdateInputSerializer(serializers.Serializer):
+    items = ProductBulkUpdateItemInputSerializer(many=True, required=False)
+    operations = ProductBulkOperationInputSerializer(many=True, required=False)
+
+    def validate_items(self, value: list) -> list:
+        ids = [item["id"] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Product ids must be unique!")
+        return value
+
+    def validate(self, data: dict) -> dict:
+        if not data.get("items") and not data.get("operations"):
+            raise serializers.ValidationError("Provide items or operations to apply!")
+        return data
+
+
+class ProductBulkUpdateOutputSerializer(serializers.Serializer):
+    updated_prices = serializers.IntegerField()
+    updated_quantities = serializers.IntegerField()
+    not_found = serializers.ListField(child=serializers.UUIDField())
+    operations = serializers.ListField(child=serializers.IntegerField())
+
+
+class ProductExportInputSerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=PRODUCT_IMPORT_FORMATS, default="csv")
+    updated_since = serializers.DateTimeField(required=False)
+
+
+class ProductImageInputSerializer(serializers.Serializer):
+    image_hash = serializers.RegexField(r"^[0-9a-f]{64}$")
+    width = serializers.ChoiceField(choices=settings.PRODUCT_IMAGE_WIDTHS)
@@ -0,0 +1,139 @@
+from typing import Iterable, Optional
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import (
+    Exists,
+    Expression,
+    F,
+    IntegerField,
+    Max,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from src.apps.products.cache import invalidate_stock_cache, invalidate_stock_responses
+from src.apps.products.models import (
+    InventoryMovement,
+    InventoryMovementKind,
+    ProductInventory,
+)
+
+
+def _pending_movements(prefix: str):
+    return (
+        InventoryMovement.objects.filter(
+            inventory=OuterRef(f"{prefix}pk"),
+            id__gt=OuterRef(f"{prefix}snapshot_movement_id"),
+        )
+        .order_by()
+        .values("inventory")
+    )
+
+
+def stock_quantity(prefix: str = "") -> Expression:
+    # snapshot plus the movements after it, `prefix` is the path to the
+    # inventory, e.g. "inventory__" for products
+    pending = _pending_movements(prefix).annotate(total=Sum("quantity"))
+    return F(f"{prefix}quantity") + Coalesce(
+        Subquery(pending.values("total"), output_field=IntegerField()),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+class InventoryLedgerService:
+    """
+    Every stock change is appended to InventoryMovement instead of
+    overwriting ProductInventory.quantity, which is a snapshot the
+    movements are folded into by compact(). Reads add the newer movements
+    with stock_quantity(), so writes never update the inventory rows.
+    Movements are only written while their inventories are locked, so a
+    movement the compaction doesn't see always gets a bigger id than the
+    ones it folds.
+    """
+
+    def lock_inventories(
+        self, product_ids: Iterable[UUID]
+    ) -> dict[UUID, ProductInventory]:
+        # every stock write locks through here: by product id and in product
+        # id order, so checkouts, cart changes and seller edits of the same
+        # products wait for each other instead of deadlocking
+        inventories = (
+            ProductInventory.objects.select_for_update(of=("self",))
+            .filter(product__id__in=product_ids)
+            .annotate(product_pk=F("product__id"))
+            .order_by("product_pk")
+        )
+        return {inventory.product_pk: inventory for inventory in inventories}
+
+    def get_stock_quantities(self, inventory_ids: Iterable[UUID]) -> dict[UUID, int]:
+        return dict(
+            ProductInventory.objects.filter(id__in=inventory_ids)
+            .annotate(stock=stock_quantity())
+            .values_list("id", "stock")
+        )
+
+    def record(self, movements: list[InventoryMovement]) -> list[InventoryMovement]:
+        # the caller holds the locks of the movements' inventories
+        movements = InventoryMovement.objects.bulk_create(movements)
+        if movements:
+            # only the responses showing stock, the rest of the catalog and
+            # the availability of other products stay cached; callers drop
+            # the availability of the changed products
+            invalidate_stock_responses()
+            transaction.on_commit(invalidate_stock_responses)
+        return movements
+
+    def set_quantities(
+        self,
+        quantities: dict[UUID, int],
+        kind: str = InventoryMovementKind.ADJUSTMENT,
+        reference: str = "",
+    ) -> None:
+        # seller changes, the difference to the current stock is recorded
+        # like a sale and folded by the compaction job. Runs in the caller's
+        # transaction, like the other writes.
+        if not quantities:
+            return
+        # an inventory without a product is still being created, nobody
+        # else sees it
+        inventories = self.lock_inventories(
+            ProductInventory.objects.filter(id__in=quantities).values("product__id")
+        )
+        stock = self.get_stock_quantities(quantities)
+        self.record(
+            [
+                InventoryMovement(
+                    inventory_id=inventory_id,
+                    kind=kind,
+                    quantity=quantity - stock[inventory_id],
+                    reference=reference,
+                )
+                for inventory_id, quantity in quantities.items()
+                if quantity != stock[inventory_id]
+            ]
+        )
+        invalidate_stock_cache(inventories)
+
+    def compact(self, inventory_ids: Optional[Iterable[UUID]] = None) -> int:
+        pending = _pending_movements("")
+        inventories = ProductInventory.objects.filter(Exists(pending))
+        if inventory_ids is not None:
+            inventories = inventories.filter(id__in=inventory_ids)
+        # the stock doesn't change, so nothing cached is invalidated
+        return inventories.update(
+            quantity=F("quantity")
+            + Subquery(
+                pending.annotate(total=Sum("quantity")).values("total"),
+                output_field=IntegerField(),
+            ),
+            snapshot_movement_id=Subquery(
+                pending.annotate(last_id=Max("id")).values("last_id")
+            ),
+            updated_at=timezone.now(),
+        )
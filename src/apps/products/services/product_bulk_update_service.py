@@ -0,0 +1,164 @@
+from decimal import Decimal
+from typing import OrderedDict
+
+from django.db import DataError, transaction
+from django.db.models import F, IntegerField, QuerySet, Value
+from django.db.models.expressions import Combinable
+from django.db.models.functions import Cast, Greatest, Round
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from src.apps.products.cache import invalidate_catalog_cache
+from src.apps.products.models import Product, ProductCategory, ProductInventory
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+    stock_quantity,
+)
+from src.apps.products.entities.product_entities import (
+    ProductBulkUpdateItemEntity,
+    ProductBulkOperationEntity,
+    ProductBulkUpdateResultEntity,
+)
+
+
+class ProductBulkUpdateService:
+    @classmethod
+    def _build_item_dtos_from_request_data(
+        cls, request_data: OrderedDict
+    ) -> list[ProductBulkUpdateItemEntity]:
+        return [
+            ProductBulkUpdateItemEntity(
+                id=item["id"],
+                price=item.get("price"),
+                quantity=item.get("quantity"),
+            )
+            for item in request_data.get("items", [])
+        ]
+
+    @classmethod
+    def _build_operation_dtos_from_request_data(
+        cls, request_data: OrderedDict
+    ) -> list[ProductBulkOperationEntity]:
+        return [
+            ProductBulkOperationEntity(
+                field=operation["field"],
+                operation=operation["operation"],
+                value=operation["value"],
+                unit=operation["unit"],
+                category_id=operation.get("category_id"),
+                product_ids=operation.get("product_ids"),
+            )
+            for operation in request_data.get("operations", [])
+        ]
+
+    @classmethod
+    def _build_expression(
+        cls, dto: ProductBulkOperationEntity, source: str
+    ) -> Combinable:
+        if dto.operation == "set":
+            expression = Value(dto.value)
+        elif dto.unit == "percent":
+            sign = 1 if dto.operation == "increase" else -1
+            expression = F(source) * Value(1 + sign * dto.value / Decimal(100))
+        elif dto.operation == "increase":
+            expression = F(source) + Value(dto.value)
+        else:
+            expression = F(source) - Value(dto.value)
+
+        if dto.field == "quantity":
+            return Greatest(Cast(Round(expression), IntegerField()), Value(0))
+        return Greatest(Round(expression, 2), Value(Decimal("0.00")))
+
+    def _update_items(
+        self,
+        dtos: list[ProductBulkUpdateItemEntity],
+        result: ProductBulkUpdateResultEntity,
+    ) -> None:
+        inventory_ids = dict(
+            Product.objects.filter(id__in=[dto.id for dto in dtos]).values_list(
+                "id", "inventory_id"
+            )
+        )
+        result.not_found = [dto.id for dto in dtos if dto.id not in inventory_ids]
+
+        # bulk_update() doesn't run auto_now, so the timestamps are set here;
+        # the next bulk import has to overwrite the changes, like a manual edit
+        now = timezone.now()
+        products = [
+            Product(id=dto.id, price=dto.price, import_hash=None, updated_at=now)
+            for dto in dtos
+            if dto.id in inventory_ids and dto.price is not None
+        ]
+        quantities = {
+            inventory_ids[dto.id]: dto.quantity
+            for dto in dtos
+            if dto.id in inventory_ids and dto.quantity is not None
+        }
+        Product.objects.bulk_update(products, ("price", "import_hash", "updated_at"))
+        if quantities:
+            Product.objects.filter(inventory_id__in=quantities).update(import_hash=None)
+        InventoryLedgerService().set_quantities(quantities, reference="bulk update")
+
+        result.updated_prices = len(products)
+        result.updated_quantities = len(quantities)
+
+    @classmethod
+    def _get_scope(cls, dto: ProductBulkOperationEntity) -> QuerySet:
+        # the input serializer requires at least one of the two; a category
+        # matches its whole subtree, like CategorySubtreeFilter
+        products = Product.objects.all()
+        if dto.category_id is not None:
+            category_path = (
+                ProductCategory.objects.filter(id=dto.category_id)
+                .values_list("path", flat=True)
+                .first()
+            )
+            if category_path is None:
+                return products.none()
+            products = products.filter(category__path__startswith=category_path)
+        if dto.product_ids is not None:
+            products = products.filter(id__in=dto.product_ids)
+        return products
+
+    def _apply_operation(self, dto: ProductBulkOperationEntity) -> int:
+        products = self._get_scope(dto)
+
+        if dto.field == "quantity":
+            # computed from the current stock, recorded in the ledger
+            ledger_service = InventoryLedgerService()
+            ledger_service.lock_inventories(products.values("id"))
+            inventories = ProductInventory.objects.filter(product__in=products)
+            quantities = dict(
+                inventories.annotate(stock=stock_quantity())
+                .annotate(new_quantity=self._build_expression(dto, "stock"))
+                .values_list("id", "new_quantity")
+            )
+            ledger_service.set_quantities(quantities, reference="bulk update")
+            products.update(import_hash=None)
+            return len(quantities)
+        return products.update(
+            price=self._build_expression(dto, dto.field),
+            import_hash=None,
+            updated_at=timezone.now(),
+        )
+
+    def bulk_update(self, request_data: OrderedDict) -> ProductBulkUpdateResultEntity:
+        result = ProductBulkUpdateResultEntity()
+        item_dtos = self._build_item_dtos_from_request_data(request_data)
+        operation_dtos = self._build_operation_dtos_from_request_data(request_data)
+
+        try:
+            with transaction.atomic():
+                if item_dtos:
+                    self._update_items(item_dtos, result)
+                result.operations = [
+                    self._apply_operation(dto) for dto in operation_dtos
+                ]
+        except DataError:
+            raise ValidationError(
+                {"operations": ["Updated prices exceed the allowed range!"]}
+            )
+
+        # set-based updates don't send the signals that invalidate the catalog
+        invalidate_catalog_cache()
+        return result
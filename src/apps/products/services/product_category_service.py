@@ -1,6 +1,10 @@
-from typing import OrderedDict
+from typing import Optional, OrderedDict
+from uuid import UUID
 
 from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from rest_framework.exceptions import ValidationError
 
 from src.apps.products.models import ProductCategory
 from src.apps.products.serializers import (
@@ -14,9 +18,50 @@ from src.apps.products.entities.product_category_entities import (
 from src.core.exceptions import ValueNotUniqueException
 
 
+def get_parent_category(parent_id: Optional[UUID]) -> Optional[ProductCategory]:
+    if parent_id is None:
+        return None
+    parent = ProductCategory.objects.filter(id=parent_id).first()
+    if parent is None:
+        raise ValidationError(
+            {"parent_id": [f"Category with id {parent_id} does not exist!"]}
+        )
+    return parent
+
+
+def lock_categories(categories: list[ProductCategory]) -> dict[UUID, ProductCategory]:
+    # the categories and their ancestors are locked in path order, so a move
+    # of any of them either waits for the caller or has committed before the
+    # rows are read again. A category whose path changed meanwhile is locked
+    # once more under its new ancestors.
+    while True:
+        ids = {category.pk for category in categories}.union(
+            *(category.get_ancestor_ids() for category in categories)
+        )
+        locked = {
+            locked_category.pk: locked_category
+            for locked_category in ProductCategory.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("path")
+        }
+        moved = [
+            locked[category.pk]
+            for category in categories
+            if category.pk in locked and locked[category.pk].path != category.path
+        ]
+        if not moved:
+            return locked
+        categories = moved
+
+
 class ProductCategoryCreateService:
     def product_category_create(self, dto: ProductCategoryEntity) -> ProductCategory:
-        return ProductCategory.objects.create(name=dto.name)
+        parent = get_parent_category(dto.parent_id)
+        if parent is not None:
+            parent = lock_categories([parent]).get(parent.pk)
+            if parent is None:
+                raise ValidationError({"parent_id": ["Category does not exist!"]})
+        return ProductCategory.objects.create(name=dto.name, parent=parent)
 
     @classmethod
     def _build_product_category_dto_from_request_data(
@@ -26,7 +71,7 @@ class ProductCategoryCreateService:
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        return ProductCategoryEntity(*data.values())
+        return ProductCategoryEntity(**data)
 
     @transaction.atomic
     def create_category(self, request_data: OrderedDict) -> ProductCategory:
@@ -43,6 +88,10 @@ class ProductCategoryUpdateService:
     def product_category_update(
         self, instance: ProductCategory, dto: ProductCategoryEntity
     ) -> ProductCategory:
+        if dto.parent_id != instance.parent_id:
+            instance = ProductCategoryMoveService().move_category(
+                instance, get_parent_category(dto.parent_id)
+            )
         instance.name = dto.name
         instance.save()
         return instance
@@ -57,13 +106,18 @@ class ProductCategoryUpdateService:
         serializer.is_valid(raise_exception=True)
         data = dict(serializer.validated_data)
 
-        return ProductCategoryUpdateEntity(name=data.get("name", instance.name))
+        return ProductCategoryUpdateEntity(
+            name=data.get("name", instance.name),
+            parent_id=data.get("parent_id", instance.parent_id),
+        )
 
     @transaction.atomic
     def update_category(
         self, request_data: OrderedDict, instance: ProductCategory
     ) -> ProductCategory:
-        category_name_check = ProductCategory.objects.filter(name=request_data["name"])
+        category_name_check = ProductCategory.objects.filter(
+            name=request_data["name"]
+        ).exclude(pk=instance.pk)
 
         if category_name_check:
             raise ValueNotUniqueException(ProductCategory, "name", request_data["name"])
@@ -72,3 +126,36 @@ class ProductCategoryUpdateService:
             instance, request_data
         )
         return self.product_category_update(instance, category_dto)
+
+
+class ProductCategoryMoveService:
+    @transaction.atomic
+    def move_category(
+        self, category: ProductCategory, parent: Optional[ProductCategory]
+    ) -> ProductCategory:
+        # both ends are locked with their ancestors and read again, so
+        # concurrent moves and creates wait for each other, see the committed
+        # paths and can't build a cycle. Rows of the subtree moved meanwhile
+        # no longer match the prefix when the update gets to them.
+        locked = lock_categories([category] + ([parent] if parent else []))
+        category = locked[category.pk]
+        if parent is not None:
+            parent = locked.get(parent.pk)
+            if parent is None:
+                raise ValidationError({"parent_id": ["Category does not exist!"]})
+            if parent.path.startswith(category.path):
+                raise ValidationError(
+                    {
+                        "parent_id": [
+                            "Category can't be moved under itself or its subcategory!"
+                        ]
+                    }
+                )
+
+        previous_path, path = category.path, category.build_path(parent)
+        ProductCategory.objects.filter(path__startswith=previous_path).update(
+            path=Concat(Value(path), Substr("path", len(previous_path) + 1))
+        )
+        category.parent, category.path = parent, path
+        category.save(update_fields=["parent"])
+        return category
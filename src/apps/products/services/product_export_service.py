@@ -0,0 +1,92 @@
+import csv
+import json
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from src.apps.products.models import Product
+from src.apps.products.services.inventory_ledger_service import stock_quantity
+from src.apps.products.storage import get_product_file_storage
+
+
+class _EchoBuffer:
+    # csv.writer only needs write(), handing the line back lets it be yielded
+    def write(self, value: str) -> str:
+        return value
+
+
+class ProductExportService:
+    # exported column -> lookup, the import reads the same column names
+    EXPORT_COLUMNS = {
+        "id": "id",
+        "sku": "sku",
+        "name": "name",
+        "price": "price",
+        "description": "description",
+        "category": "category__name",
+        "quantity": "stock",
+        "updated_at": "updated_at",
+        "product_image": "product_image",
+        "product_thumbnail": "product_thumbnail",
+    }
+    # stored file names, exported as URLs
+    FILE_COLUMNS = ("product_image", "product_thumbnail")
+    CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        build_absolute_uri: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self.chunk_size = chunk_size or settings.PRODUCT_EXPORT_CHUNK_SIZE
+        self.build_absolute_uri = build_absolute_uri
+
+    def get_file_url(self, name: Optional[str]) -> Optional[str]:
+        if not name:
+            return None
+        url = get_product_file_storage().url(name)
+        if self.build_absolute_uri is None:
+            return url
+        return self.build_absolute_uri(url)
+
+    def _build_row(self, values: tuple) -> dict:
+        row = dict(zip(self.EXPORT_COLUMNS, values))
+        for column in self.FILE_COLUMNS:
+            row[column] = self.get_file_url(row[column])
+        return row
+
+    def get_rows(self, updated_since: Optional[datetime] = None) -> Iterator[dict]:
+        products = Product.objects.annotate(stock=stock_quantity("inventory__"))
+        if updated_since is not None:
+            # a stock change is a change of the exported row too
+            products = products.filter(
+                Q(updated_at__gte=updated_since)
+                | Q(inventory__updated_at__gte=updated_since)
+            )
+        rows = (
+            products.order_by("updated_at", "id")
+            .values_list(*self.EXPORT_COLUMNS.values())
+            .iterator(chunk_size=self.chunk_size)
+        )
+        return (self._build_row(row) for row in rows)
+
+    def export_csv(self, rows: Iterator[dict]) -> Iterator[str]:
+        writer = csv.DictWriter(_EchoBuffer(), fieldnames=self.EXPORT_COLUMNS)
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+
+    def export_ndjson(self, rows: Iterator[dict]) -> Iterator[str]:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+    def export_products(
+        self, format: str, updated_since: Optional[datetime] = None
+    ) -> Iterator[str]:
+        rows = self.get_rows(updated_since)
+        if format == "ndjson":
+            return self.export_ndjson(rows)
+        return self.export_csv(rows)
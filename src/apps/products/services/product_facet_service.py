@@ -0,0 +1,56 @@
+from decimal import Decimal
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, QuerySet
+
+from src.apps.products.cache import build_catalog_cache_key
+
+
+class ProductFacetService:
+    def _category_facets(self, queryset: QuerySet) -> list[dict[str, Any]]:
+        return list(
+            queryset.order_by()
+            .values("category__id", "category__name")
+            .annotate(count=Count("pk"))
+            .order_by("category__name")
+        )
+
+    def _price_bucket_facets(
+        self, queryset: QuerySet, bounds: list[Decimal]
+    ) -> list[dict[str, Any]]:
+        buckets = list(zip(bounds, bounds[1:] + [None]))
+        counts = queryset.order_by().aggregate(
+            **{
+                f"bucket_{index}": Count(
+                    "pk",
+                    filter=Q(price__gte=lower)
+                    & (Q(price__lt=upper) if upper is not None else Q()),
+                )
+                for index, (lower, upper) in enumerate(buckets)
+            }
+        )
+        return [
+            {"min": lower, "max": upper, "count": counts[f"bucket_{index}"]}
+            for index, (lower, upper) in enumerate(buckets)
+        ]
+
+    def get_facets(
+        self,
+        queryset: QuerySet,
+        query_string: str,
+        price_buckets: Optional[list[Decimal]] = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        bounds = price_buckets or [
+            Decimal(bound) for bound in settings.PRODUCT_FACET_PRICE_BUCKETS
+        ]
+        cache_key = build_catalog_cache_key("facets", query_string)
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = {
+                "categories": self._category_facets(queryset),
+                "price_buckets": self._price_bucket_facets(queryset, bounds),
+            }
+            cache.set(cache_key, facets, settings.PRODUCT_FACETS_CACHE_TIMEOUT)
+        return facets
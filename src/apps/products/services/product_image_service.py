@@ -0,0 +1,87 @@
+from typing import Optional
+
+from PIL import Image
+
+
+from src.apps.products.image_cache import ResizedImageDiskCache
+from src.apps.products.models import Product
+from src.apps.products.storage import get_product_file_storage
+from src.apps.products.utils import IMAGE_DECODE_ERRORS, resize_image
+
+
+# media type -> Pillow format, in the order they are preferred
+IMAGE_MEDIA_TYPES = {
+    "image/avif": "AVIF",
+    "image/webp": "WEBP",
+    "image/jpeg": "JPEG",
+}
+DEFAULT_IMAGE_MEDIA_TYPE = "image/jpeg"
+
+
+class ProductImageResizeService:
+    def __init__(self, cache: Optional[ResizedImageDiskCache] = None) -> None:
+        self.cache = cache or ResizedImageDiskCache()
+
+    @classmethod
+    def get_supported_media_types(cls) -> list[str]:
+        # AVIF is only offered when the installed Pillow can encode it
+        Image.init()
+        return [
+            media_type
+            for media_type, image_format in IMAGE_MEDIA_TYPES.items()
+            if image_format in Image.SAVE
+        ]
+
+    @classmethod
+    def negotiate_media_type(cls, accept: str) -> str:
+        qualities = {}
+        for media_range in accept.split(","):
+            media_type, *params = [part.strip() for part in media_range.split(";")]
+            quality = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0
+            qualities[media_type.lower()] = quality
+
+        # only explicitly accepted types count, `*/*` doesn't mean a client
+        # can decode AVIF
+        candidates = [
+            (qualities[media_type], -preference, media_type)
+            for preference, media_type in enumerate(cls.get_supported_media_types())
+            if qualities.get(media_type, 0) > 0
+        ]
+        if not candidates:
+            return DEFAULT_IMAGE_MEDIA_TYPE
+        return max(candidates)[2]
+
+    @classmethod
+    def get_cache_key(cls, image_hash: str, width: int, media_type: str) -> str:
+        return f"{image_hash}_{width}.{IMAGE_MEDIA_TYPES[media_type].lower()}"
+
+    def get_image(
+        self, image_hash: str, width: int, media_type: str
+    ) -> Optional[bytes]:
+        key = self.get_cache_key(image_hash, width, media_type)
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+
+        image_name = (
+            Product.objects.filter(image_hash=image_hash)
+            .exclude(product_image="")
+            .values_list("product_image", flat=True)
+            .first()
+        )
+        if image_name is None:
+            return None
+        try:
+            with get_product_file_storage().open(image_name) as image_file:
+                content = resize_image(image_file, width, IMAGE_MEDIA_TYPES[media_type])
+        except IMAGE_DECODE_ERRORS:
+            return None
+
+        self.cache.set(key, content)
+        return content
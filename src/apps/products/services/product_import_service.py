@@ -0,0 +1,247 @@
+import codecs
+import csv
+import json
+from hashlib import sha256
+from itertools import islice
+from typing import IO, Any, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from src.apps.products.cache import invalidate_catalog_cache
+from src.apps.products.models import (
+    InventoryMovementKind,
+    Product,
+    ProductInventory,
+    ProductCategory,
+)
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+from src.apps.products.serializers import ProductImportRowInputSerializer
+from src.apps.products.entities.product_entities import (
+    ProductImportRowEntity,
+    ProductImportResultEntity,
+)
+
+
+class ProductImportService:
+    PRODUCT_UPDATE_FIELDS = (
+        "name",
+        "price",
+        "description",
+        "category",
+        "import_hash",
+        "updated_at",
+    )
+
+    def __init__(self, chunk_size: Optional[int] = None) -> None:
+        self.chunk_size = chunk_size or settings.PRODUCT_IMPORT_CHUNK_SIZE
+        self._categories: dict[str, Optional[ProductCategory]] = {}
+        self._seen_skus: dict[str, int] = {}
+
+    @classmethod
+    def parse_csv(cls, stream: IO[bytes]) -> Iterator[dict]:
+        yield from csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+
+    @classmethod
+    def parse_ndjson(cls, stream: IO[bytes]) -> Iterator[Any]:
+        for line in codecs.iterdecode(stream, "utf-8-sig"):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                # reported as the row's error, the rest of the file is still read
+                yield ValidationError({"non_field_errors": [f"Invalid JSON: {exc}"]})
+
+    @classmethod
+    def detect_format(cls, file_name: str) -> str:
+        return "ndjson" if file_name.endswith((".ndjson", ".jsonl")) else "csv"
+
+    @classmethod
+    def parse_rows(cls, stream: IO[bytes], format: str) -> Iterator[Any]:
+        if format == "ndjson":
+            return cls.parse_ndjson(stream)
+        return cls.parse_csv(stream)
+
+    @classmethod
+    def _build_row_dto_from_row_data(cls, row_data: Any) -> ProductImportRowEntity:
+        if isinstance(row_data, ValidationError):
+            raise row_data
+        if not isinstance(row_data, dict):
+            raise ValidationError({"non_field_errors": ["Row must be an object!"]})
+
+        serializer = ProductImportRowInputSerializer(data=row_data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        return ProductImportRowEntity(
+            sku=data["sku"],
+            name=data["name"],
+            price=data["price"],
+            description=data.get("description"),
+            category=data["category"],
+            quantity=data["quantity"],
+        )
+
+    @classmethod
+    def _content_hash(cls, dto: ProductImportRowEntity) -> str:
+        content = json.dumps(
+            [
+                dto.sku,
+                dto.name,
+                str(dto.price),
+                dto.description,
+                dto.category,
+                dto.quantity,
+            ]
+        )
+        return sha256(content.encode("utf-8")).hexdigest()
+
+    def _resolve_categories(self, names: set[str]) -> None:
+        missing = names - self._categories.keys()
+        if not missing:
+            return
+        self._categories.update(dict.fromkeys(missing))
+        self._categories.update(
+            (category.name, category)
+            for category in ProductCategory.objects.filter(name__in=missing)
+        )
+
+    def _validate_chunk(
+        self, chunk: list[tuple[int, Any]], result: ProductImportResultEntity
+    ) -> list[tuple[int, ProductImportRowEntity]]:
+        valid_rows = []
+        for row_number, row_data in chunk:
+            sku = row_data.get("sku") if isinstance(row_data, dict) else None
+            try:
+                dto = self._build_row_dto_from_row_data(row_data)
+                if dto.sku in self._seen_skus:
+                    raise ValidationError(
+                        {
+                            "sku": [
+                                f"SKU already used in row {self._seen_skus[dto.sku]}!"
+                            ]
+                        }
+                    )
+            except ValidationError as exc:
+                result.errors.append(
+                    {"row": row_number, "sku": sku, "errors": exc.detail}
+                )
+                continue
+            self._seen_skus[dto.sku] = row_number
+            valid_rows.append((row_number, dto))
+
+        self._resolve_categories({dto.category for _, dto in valid_rows})
+        for row_number, dto in valid_rows:
+            if self._categories[dto.category] is None:
+                result.errors.append(
+                    {
+                        "row": row_number,
+                        "sku": dto.sku,
+                        "errors": {
+                            "category": [f"Category {dto.category} does not exist!"]
+                        },
+                    }
+                )
+        return [
+            (row_number, dto)
+            for row_number, dto in valid_rows
+            if self._categories[dto.category] is not None
+        ]
+
+    @transaction.atomic
+    def _import_chunk(
+        self, chunk: list[tuple[int, Any]], result: ProductImportResultEntity
+    ) -> None:
+        valid_rows = self._validate_chunk(chunk, result)
+        existing_products = {
+            product.sku: product
+            for product in Product.objects.filter(
+                sku__in=[dto.sku for _, dto in valid_rows]
+            )
+        }
+
+        new_inventories, new_products = [], []
+        new_quantities, updated_quantities, updated_products = {}, {}, []
+        # bulk_update() doesn't run auto_now, so the timestamps are set here
+        now = timezone.now()
+        for _, dto in valid_rows:
+            content_hash = self._content_hash(dto)
+            category = self._categories[dto.category]
+            product = existing_products.get(dto.sku)
+
+            if product is None:
+                inventory = ProductInventory(quantity=0)
+                new_inventories.append(inventory)
+                new_quantities[inventory.id] = dto.quantity
+                new_products.append(
+                    Product(
+                        sku=dto.sku,
+                        name=dto.name,
+                        price=dto.price,
+                        description=dto.description,
+                        category=category,
+                        inventory=inventory,
+                        import_hash=content_hash,
+                    )
+                )
+            elif product.import_hash == content_hash:
+                result.skipped += 1
+            else:
+                product.name = dto.name
+                product.price = dto.price
+                product.description = dto.description
+                product.category = category
+                product.import_hash = content_hash
+                product.updated_at = now
+                updated_products.append(product)
+                updated_quantities[product.inventory_id] = dto.quantity
+
+        ProductInventory.objects.bulk_create(new_inventories)
+        Product.objects.bulk_create(new_products)
+        Product.objects.bulk_update(updated_products, self.PRODUCT_UPDATE_FIELDS)
+        ledger_service = InventoryLedgerService()
+        ledger_service.set_quantities(
+            new_quantities, kind=InventoryMovementKind.RESTOCK, reference="import"
+        )
+        ledger_service.set_quantities(updated_quantities, reference="import")
+
+        result.created += len(new_products)
+        result.updated += len(updated_products)
+
+    @classmethod
+    def _number_rows(
+        cls, rows: Iterable[Any], result: ProductImportResultEntity
+    ) -> Iterator[tuple[int, Any]]:
+        row_number = 0
+        try:
+            for row_number, row_data in enumerate(rows, start=1):
+                yield row_number, row_data
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # nothing after an unreadable row can be trusted, so the import
+            # stops there and keeps what was already read
+            result.errors.append(
+                {
+                    "row": row_number + 1,
+                    "sku": None,
+                    "errors": {"non_field_errors": [f"Can't read the row: {exc}"]},
+                }
+            )
+
+    def import_products(self, rows: Iterable[Any]) -> ProductImportResultEntity:
+        result = ProductImportResultEntity()
+        numbered_rows = self._number_rows(rows, result)
+        # every chunk is committed separately, so a huge file never holds
+        # one long transaction and is never loaded into memory as a whole
+        while chunk := list(islice(numbered_rows, self.chunk_size)):
+            self._import_chunk(chunk, result)
+        result.errors.sort(key=lambda error: error["row"])
+
+        # bulk operations don't send the signals that invalidate the catalog
+        if result.created or result.updated:
+            invalidate_catalog_cache()
+        return result
@@ -3,7 +3,12 @@ from uuid import UUID
 
 from django.db import transaction
 
-from src.apps.products.models import Product, ProductInventory, ProductCategory
+from src.apps.products.models import (
+    InventoryMovementKind,
+    Product,
+    ProductInventory,
+    ProductCategory,
+)
 from src.apps.products.serializers import (
     ProductInputSerializer,
     ProductOutputSerializer,
@@ -14,6 +19,9 @@ from src.apps.products.serializers import (
     ProductUpdateInputSerializer,
     ProductInventoryUpdateInputSerializer,
 )
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
 from src.apps.products.entities.product_inventory_entities import (
     ProductInventoryEntity,
     ProductInventoryUpdateEntity,
@@ -26,7 +34,12 @@ from src.apps.products.entities.product_entities import (
 
 class ProductCreateService:
     def product_inventory_create(self, dto: ProductInventoryEntity) -> ProductInventory:
-        return ProductInventory.objects.create(quantity=dto.quantity)
+        inventory = ProductInventory.objects.create(quantity=0)
+        InventoryLedgerService().set_quantities(
+            {inventory.id: dto.quantity}, kind=InventoryMovementKind.RESTOCK
+        )
+        inventory.refresh_from_db()
+        return inventory
 
     @classmethod
     def _build_product_inventory_dto_from_request_data(
@@ -81,8 +94,10 @@ class ProductUpdateService:
     def product_inventory_update(
         self, instance: ProductInventory, dto: ProductInventoryUpdateEntity
     ) -> ProductInventory:
-        instance.quantity = dto.quantity
-        instance.save()
+        # a missing quantity keeps the stock, sales pending in the ledger too
+        if dto.quantity is not None:
+            InventoryLedgerService().set_quantities({instance.id: dto.quantity})
+            instance.refresh_from_db()
         return instance
 
     @classmethod
@@ -94,9 +109,7 @@ class ProductUpdateService:
         )
         serializer.is_valid(raise_exception=True)
         data = dict(serializer.validated_data)
-        return ProductInventoryUpdateEntity(
-            quantity=data.get("quantity", instance.quantity)
-        )
+        return ProductInventoryUpdateEntity(quantity=data.get("quantity"))
 
     def _product_update(
         self, dto: ProductUpdateEntity, category: ProductCategory, instance: Product
@@ -105,6 +118,8 @@ class ProductUpdateService:
         instance.price = dto.price
         instance.description = dto.description
         instance.product_image = dto.product_image
+        # the next bulk import has to overwrite the manual changes
+        instance.import_hash = None
 
         if instance.category.id != category.id:
             instance.category = category
@@ -0,0 +1,103 @@
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from src.apps.products.cache import invalidate_catalog_cache
+from src.apps.products.models import Product, ThumbnailStatus
+from src.apps.products.services.stored_file_service import StoredFileService
+from src.apps.products.storage import get_product_file_storage
+from src.apps.products.utils import get_file_hash, make_thumbnails
+from src.core.exceptions import UnsupportedImageFormatException
+
+logger = logging.getLogger(__name__)
+
+
+class ProductThumbnailService:
+    def __init__(self, widths: Optional[list[int]] = None) -> None:
+        self.widths = sorted(
+            set(widths or settings.PRODUCT_THUMBNAIL_WIDTHS)
+            | {settings.MAX_THUMBNAIL_WIDTH}
+        )
+
+    def _find_reusable_thumbnails(self, product: Product) -> Optional[dict]:
+        # products sharing an image share its thumbnails as well
+        widths = {str(width) for width in self.widths}
+        for thumbnails in (
+            Product.objects.filter(
+                image_hash=product.image_hash, thumbnail_status=ThumbnailStatus.READY
+            )
+            .exclude(pk=product.pk)
+            .values_list("thumbnails", flat=True)[:1]
+        ):
+            if widths <= thumbnails.keys():
+                return thumbnails
+        return None
+
+    def _save_thumbnails(self, product: Product) -> dict[str, str]:
+        thumbnails, extension = make_thumbnails(product.product_image, self.widths)
+        storage = get_product_file_storage()
+        return {
+            str(width): storage.save(f"thumbnails/thumbnail{extension}", content)
+            for width, content in thumbnails.items()
+        }
+
+    def generate_thumbnails(self, product: Product) -> Product:
+        previous_file_names = product.get_stored_file_names()
+        # any error fails the product, otherwise it would stay first in the
+        # queue and stop the worker on every run
+        try:
+            if product.image_hash is None:
+                # products imported before the pipeline existed have no hash yet
+                product.image_hash = get_file_hash(product.product_image)
+            thumbnails = self._find_reusable_thumbnails(product)
+            if thumbnails is None:
+                thumbnails = self._save_thumbnails(product)
+        except UnsupportedImageFormatException:
+            product.thumbnail_status = ThumbnailStatus.FAILED
+            thumbnails = {}
+        except Exception:
+            logger.exception("Thumbnails of product %s failed", product.pk)
+            product.thumbnail_status = ThumbnailStatus.FAILED
+            thumbnails = {}
+        else:
+            product.thumbnail_status = ThumbnailStatus.READY
+
+        product.thumbnails = thumbnails
+        product.product_thumbnail = thumbnails.get(str(settings.MAX_THUMBNAIL_WIDTH))
+        product.updated_at = timezone.now()
+        # update() instead of save(), which would queue the image again
+        Product.objects.filter(pk=product.pk).update(
+            image_hash=product.image_hash,
+            thumbnail_status=product.thumbnail_status,
+            thumbnails=product.thumbnails,
+            product_thumbnail=product.product_thumbnail,
+            updated_at=product.updated_at,
+        )
+        StoredFileService().update_references(
+            previous_file_names, product.get_stored_file_names()
+        )
+        return product
+
+    def process_pending(self, limit: Optional[int] = None) -> int:
+        processed = 0
+        while limit is None or processed < limit:
+            # every product is locked on its own, so several workers can
+            # share the queue and image changes wait for the running job
+            with transaction.atomic():
+                product = (
+                    Product.objects.select_for_update(skip_locked=True)
+                    .filter(thumbnail_status=ThumbnailStatus.PENDING)
+                    .order_by("updated_at")
+                    .first()
+                )
+                if product is None:
+                    break
+                self.generate_thumbnails(product)
+            processed += 1
+
+        if processed:
+            invalidate_catalog_cache()
+        return processed
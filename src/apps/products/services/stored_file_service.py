@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import F
+
+from src.apps.products.models import StoredFile
+from src.apps.products.storage import get_product_file_storage
+
+
+class StoredFileService:
+    def _delete_orphaned_files(self, names: list[str]) -> None:
+        # a file can get referenced again between the decrement and the
+        # commit, only the ones that still have no row are removed
+        referenced = set(
+            StoredFile.objects.filter(name__in=names).values_list("name", flat=True)
+        )
+        storage = get_product_file_storage()
+        for name in set(names) - referenced:
+            storage.delete(name)
+
+    def add_references(self, names: set[str]) -> None:
+        if not names:
+            return
+        StoredFile.objects.bulk_create(
+            [StoredFile(name=name) for name in names], ignore_conflicts=True
+        )
+        StoredFile.objects.filter(name__in=names).update(
+            reference_count=F("reference_count") + 1
+        )
+
+    def remove_references(self, names: set[str]) -> None:
+        if not names:
+            return
+        StoredFile.objects.filter(name__in=names, reference_count__gt=0).update(
+            reference_count=F("reference_count") - 1
+        )
+        orphaned = list(
+            StoredFile.objects.filter(name__in=names, reference_count=0).values_list(
+                "name", flat=True
+            )
+        )
+        if not orphaned:
+            return
+        StoredFile.objects.filter(name__in=orphaned, reference_count=0).delete()
+        transaction.on_commit(lambda: self._delete_orphaned_files(orphaned))
+
+    def update_references(self, previous: set[str], current: set[str]) -> None:
+        self.add_references(current - previous)
+        self.remove_references(previous - current)
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from src.apps.products.cache import invalidate_catalog_cache
+from src.apps.products.models import Product, ProductCategory, ProductInventory
+from src.apps.products.services.stored_file_service import StoredFileService
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductInventory)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductInventory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_catalog_cache_on_change(sender, **kwargs) -> None:
+    # bump again after commit, so nothing cached from a concurrent read of
+    # the not yet committed state survives
+    invalidate_catalog_cache()
+    transaction.on_commit(invalidate_catalog_cache)
+
+
+@receiver(pre_save, sender=Product)
+def remember_stored_files(sender, instance: Product, **kwargs) -> None:
+    previous = None
+    if not instance._state.adding:
+        previous = (
+            Product.objects.filter(pk=instance.pk)
+            .values("product_image", "product_thumbnail", "thumbnails")
+            .first()
+        )
+    instance._previous_stored_file_names = (
+        Product(**previous).get_stored_file_names() if previous else set()
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_stored_file_references(sender, instance: Product, **kwargs) -> None:
+    StoredFileService().update_references(
+        instance._previous_stored_file_names, instance.get_stored_file_names()
+    )
+
+
+@receiver(post_delete, sender=Product)
+def release_stored_files(sender, instance: Product, **kwargs) -> None:
+    StoredFileService().remove_references(instance.get_stored_file_names())
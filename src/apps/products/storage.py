@@ -0,0 +1,44 @@
+import os
+from hashlib import sha256
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Files are named after the sha256 of their content, inside the directory
+    of the requested name, so saving the same content twice stores it once.
+    Shared files are only deleted once nothing references them anymore, see
+    StoredFileService.
+    """
+
+    def get_content_name(self, name: str, content: File) -> str:
+        content.seek(0)
+        content_hash = sha256()
+        for chunk in content.chunks():
+            content_hash.update(chunk)
+        content.seek(0)
+
+        directory = os.path.dirname(name)
+        digest = content_hash.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f"{digest}{extension}")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+product_file_storage = ContentAddressedStorage()
+
+
+def get_product_file_storage() -> ContentAddressedStorage:
+    return product_file_storage
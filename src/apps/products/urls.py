@@ -2,9 +2,17 @@ from django.urls import path
 
 from src.apps.products.views import (
     ProductListCreateAPIView,
+    ProductFacetsAPIView,
+    ProductImportAPIView,
+    ProductBulkUpdateAPIView,
+    ProductExportAPIView,
+    ProductImageAPIView,
+    CatalogCacheStatsAPIView,
     ProductDetailAPIView,
     ProductCategoryDetailAPIView,
     ProductCategoryListCreateAPIView,
+    ProductCategoryAncestorsAPIView,
+    ProductCategoryDescendantsAPIView,
 )
 
 app_name = "products"
@@ -15,6 +23,36 @@ urlpatterns = [
         ProductListCreateAPIView.as_view({"get": "list", "post": "create"}),
         name="product-list",
     ),
+    path(
+        "facets/",
+        ProductFacetsAPIView.as_view({"get": "list"}),
+        name="product-facets",
+    ),
+    path(
+        "import/",
+        ProductImportAPIView.as_view({"post": "create"}),
+        name="product-import",
+    ),
+    path(
+        "bulk-update/",
+        ProductBulkUpdateAPIView.as_view({"patch": "update"}),
+        name="product-bulk-update",
+    ),
+    path(
+        "export/",
+        ProductExportAPIView.as_view({"get": "list"}),
+        name="product-export",
+    ),
+    path(
+        "images/<str:image_hash>/",
+        ProductImageAPIView.as_view({"get": "retrieve"}),
+        name="product-image",
+    ),
+    path(
+        "cache-stats/",
+        CatalogCacheStatsAPIView.as_view({"get": "list"}),
+        name="catalog-cache-stats",
+    ),
     path(
         "<uuid:pk>/",
         ProductDetailAPIView.as_view(
@@ -34,4 +72,14 @@ urlpatterns = [
         ),
         name="category-detail",
     ),
+    path(
+        "categories/<uuid:pk>/ancestors/",
+        ProductCategoryAncestorsAPIView.as_view({"get": "list"}),
+        name="category-ancestors",
+    ),
+    path(
+        "categories/<uuid:pk>/descendants/",
+        ProductCategoryDescendantsAPIView.as_view({"get": "list"}),
+        name="category-descendants",
+    ),
 ]
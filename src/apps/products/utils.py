@@ -1,43 +1,77 @@
+import struct
+from hashlib import sha256
 from io import BytesIO
-from PIL import Image
-import os
+from PIL import Image, ImageOps
 
+from django.core.files import File
 from django.core.files.base import ContentFile
 
-from src.settings import MAX_THUMBNAIL_WIDTH
+from src.core.exceptions import UnsupportedImageFormatException
 
 
-def make_thumbnail(model):
-    image = Image.open(model.product_image)
-    size = model.product_image.height, MAX_THUMBNAIL_WIDTH
-    image.thumbnail(size)
+THUMBNAIL_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+IMAGE_QUALITY = 80
+# besides OSError, Pillow reports truncated, corrupted or oversized images
+# with these while decoding them
+IMAGE_DECODE_ERRORS = (
+    OSError,
+    ValueError,
+    SyntaxError,
+    EOFError,
+    struct.error,
+    Image.DecompressionBombError,
+)
 
-    thumb_name, thumb_extension = os.path.splitext(model.product_image.name)
-    thumb_extension = thumb_extension.lower()
 
-    thumb_filename = thumb_name + "_thumb" + thumb_extension
+def get_file_hash(file: File) -> str:
+    file.seek(0)
+    file_hash = sha256()
+    for chunk in file.chunks():
+        file_hash.update(chunk)
+    file.seek(0)
+    return file_hash.hexdigest()
+
+
+def _open_for_width(image: Image.Image, width: int) -> Image.Image:
+    # lets the JPEG decoder scale the image down while decoding it,
+    # so the full resolution bitmap is never built
+    width = min(width, image.width)
+    image.draft(image.mode, (width, max(1, image.height * width // image.width)))
+    return ImageOps.exif_transpose(image)
+
+
+def _save_image(image: Image.Image, image_format: str, **options) -> bytes:
+    # drops EXIF, ICC profiles and comments from the output
+    image.info = {}
+    output = BytesIO()
+    image.save(output, image_format, optimize=True, **options)
+    return output.getvalue()
+
+
+def make_thumbnails(image_file: File, widths: list[int]) -> tuple[dict, str]:
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        image_format = image.format
+        if image_format not in THUMBNAIL_EXTENSIONS:
+            raise UnsupportedImageFormatException(image_format)
 
-    if thumb_extension in [".jpg", ".jpeg"]:
-        FTYPE = "JPEG"
-    elif thumb_extension == ".gif":
-        FTYPE = "GIF"
-    elif thumb_extension == ".png":
-        FTYPE = "PNG"
-    else:
-        return False  # Unrecognized file type
+        image = _open_for_width(image, max(widths))
+        thumbnails = {}
+        for width in sorted(widths, reverse=True):
+            image.thumbnail((width, image.height))
+            thumbnails[width] = ContentFile(_save_image(image, image_format))
 
-    # Save thumbnail to in-memory file as StringIO
-    temp_thumb = BytesIO()
-    image.save(temp_thumb, FTYPE)
-    temp_thumb.seek(0)
+    return thumbnails, THUMBNAIL_EXTENSIONS[image_format]
 
-    # set save=False, otherwise it will run in an infinite loop
-    model.product_thumbnail.save(
-        thumb_filename, ContentFile(temp_thumb.read()), save=False
-    )
-    temp_thumb.close()
 
-    return True
+def resize_image(image_file: File, width: int, image_format: str) -> bytes:
+    image_file.seek(0)
+    with Image.open(image_file) as image:
+        image = _open_for_width(image, width)
+        image.thumbnail((width, image.height))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return _save_image(image, image_format, quality=IMAGE_QUALITY)
 
 
 def generate_image_file() -> BytesIO:
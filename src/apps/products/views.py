@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 from rest_framework import permissions, status
@@ -9,9 +11,19 @@ from rest_framework.mixins import (
     DestroyModelMixin,
     RetrieveModelMixin,
 )
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from rest_framework.exceptions import NotFound
 from django_filters import rest_framework as filters
 
-from src.apps.products.models import ProductCategory, Product
+from src.apps.products.models import InventoryMovement, ProductCategory, Product
 from src.apps.products.serializers import (
     ProductCategoryInputSerializer,
     ProductCategoryOutputSerializer,
@@ -20,6 +32,15 @@ from src.apps.products.serializers import (
     ProductDetailOutputSerializer,
     ProductUpdateInputSerializer,
     ProductUpdateDataInputSerializer,
+    ProductFacetsInputSerializer,
+    ProductFacetsOutputSerializer,
+    CatalogCacheStatsOutputSerializer,
+    ProductImportInputSerializer,
+    ProductImportOutputSerializer,
+    ProductBulkUpdateInputSerializer,
+    ProductBulkUpdateOutputSerializer,
+    ProductExportInputSerializer,
+    ProductImageInputSerializer,
 )
 from src.apps.products.services.product_category_service import (
     ProductCategoryCreateService,
@@ -29,11 +50,34 @@ from src.apps.products.services.product_service import (
     ProductCreateService,
     ProductUpdateService,
 )
+from src.apps.products.services.product_facet_service import ProductFacetService
+from src.apps.products.services.product_import_service import ProductImportService
+from src.apps.products.services.product_bulk_update_service import (
+    ProductBulkUpdateService,
+)
+from src.apps.products.services.product_export_service import ProductExportService
+from src.apps.products.services.inventory_ledger_service import stock_quantity
+from src.apps.products.services.product_image_service import (
+    ProductImageResizeService,
+)
+from src.apps.products.cache import (
+    CatalogResponseCacheMixin,
+    get_catalog_cache_stats,
+    normalize_query_params,
+)
 from src.apps.products.filters import ProductFilter
-from src.core.permissions import StaffOrReadOnly, SellerOrAdmin
+from src.core.mixins import (
+    ConditionalRetrieveMixin,
+    DynamicFieldsMixin,
+    make_etag,
+)
+from src.core.pagination import PageNumberOrCursorPagination
+from src.core.permissions import StaffOrReadOnly, SellerOrAdmin, NonCustomer
 
 
-class ProductCategoryListCreateAPIView(GenericViewSet, ListModelMixin):
+class ProductCategoryListCreateAPIView(
+    CatalogResponseCacheMixin, GenericViewSet, ListModelMixin
+):
     queryset = ProductCategory.objects.all()
     serializer_class = ProductCategoryOutputSerializer
     permission_classes = [StaffOrReadOnly]
@@ -67,18 +111,65 @@ class ProductCategoryDetailAPIView(
             self.get_serializer(updated_category).data, status=status.HTTP_200_OK
         )
 
+    def destroy(self, request: Request, *args, **kwargs) -> Response:
+        if self.get_object().children.exists():
+            return Response(
+                {"children": "Category with subcategories can't be deleted!"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return super().destroy(request, *args, **kwargs)
+
     def delete(self, request: Request, pk: UUID) -> Response:
         self.destroy(request, pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ProductListCreateAPIView(GenericViewSet, ListModelMixin):
-    queryset = Product.objects.all()
+class ProductCategoryAncestorsAPIView(
+    CatalogResponseCacheMixin, GenericViewSet, ListModelMixin
+):
+    serializer_class = ProductCategoryOutputSerializer
+    permission_classes = [StaffOrReadOnly]
+
+    def get_queryset(self):
+        category = get_object_or_404(ProductCategory, pk=self.kwargs["pk"])
+        return category.get_ancestors()
+
+
+class ProductCategoryDescendantsAPIView(
+    CatalogResponseCacheMixin, GenericViewSet, ListModelMixin
+):
+    serializer_class = ProductCategoryOutputSerializer
+    permission_classes = [StaffOrReadOnly]
+
+    def get_queryset(self):
+        category = get_object_or_404(ProductCategory, pk=self.kwargs["pk"])
+        return category.get_descendants()
+
+
+class ProductListCreateAPIView(
+    CatalogResponseCacheMixin, DynamicFieldsMixin, GenericViewSet, ListModelMixin
+):
+    queryset = Product.objects.select_related("category")
     serializer_class = ProductOutputSerializer
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = ProductFilter
+    pagination_class = PageNumberOrCursorPagination
     permission_classes = [SellerOrAdmin]
 
+    def renders_stock(self) -> bool:
+        _, expand = self.get_field_selection()
+        return "inventory" in expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            _, expand = self.get_field_selection()
+            if "inventory" in expand:
+                queryset = queryset.annotate(
+                    inventory_stock=stock_quantity("inventory__")
+                )
+        return queryset
+
     def create(self, request: Request) -> Response:
         service = ProductCreateService()
         serializer = ProductInputSerializer(data=request.data)
@@ -89,11 +180,173 @@ class ProductListCreateAPIView(GenericViewSet, ListModelMixin):
         )
 
 
-class ProductDetailAPIView(GenericViewSet, RetrieveModelMixin, DestroyModelMixin):
+class ProductFacetsAPIView(GenericViewSet):
     queryset = Product.objects.all()
+    serializer_class = ProductFacetsOutputSerializer
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_class = ProductFilter
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request: Request) -> Response:
+        service = ProductFacetService()
+        serializer = ProductFacetsInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        facets = service.get_facets(
+            queryset=self.filter_queryset(self.get_queryset()),
+            query_string=normalize_query_params(request.query_params),
+            price_buckets=serializer.validated_data.get("price_buckets"),
+        )
+        return Response(self.get_serializer(facets).data, status=status.HTTP_200_OK)
+
+
+class ProductImportAPIView(GenericViewSet):
+    serializer_class = ProductImportOutputSerializer
+    permission_classes = [permissions.IsAuthenticated, NonCustomer]
+
+    def create(self, request: Request) -> Response:
+        service = ProductImportService()
+        serializer = ProductImportInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data["file"]
+        format = serializer.validated_data.get("format") or service.detect_format(
+            file.name
+        )
+        result = service.import_products(service.parse_rows(file, format))
+        return Response(self.get_serializer(result).data, status=status.HTTP_200_OK)
+
+
+class ProductBulkUpdateAPIView(GenericViewSet):
+    serializer_class = ProductBulkUpdateOutputSerializer
+    permission_classes = [permissions.IsAuthenticated, NonCustomer]
+
+    def update(self, request: Request) -> Response:
+        service = ProductBulkUpdateService()
+        serializer = ProductBulkUpdateInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = service.bulk_update(request_data=serializer.validated_data)
+        return Response(self.get_serializer(result).data, status=status.HTTP_200_OK)
+
+
+class ProductExportAPIView(GenericViewSet):
+    permission_classes = [permissions.IsAuthenticated, NonCustomer]
+
+    def list(self, request: Request) -> StreamingHttpResponse:
+        service = ProductExportService(build_absolute_uri=request.build_absolute_uri)
+        serializer = ProductExportInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data["file_format"]
+        response = StreamingHttpResponse(
+            service.export_products(
+                file_format, serializer.validated_data.get("updated_since")
+            ),
+            content_type=service.CONTENT_TYPES[file_format],
+        )
+        filename = f"products.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ProductImageAPIView(GenericViewSet):
+    permission_classes = [permissions.AllowAny]
+
+    def perform_content_negotiation(self, request: Request, force: bool = False):
+        # the Accept header picks the image format, errors are still JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def retrieve(self, request: Request, image_hash: str) -> HttpResponse:
+        service = ProductImageResizeService()
+        serializer = ProductImageInputSerializer(
+            data={"image_hash": image_hash, "width": request.query_params.get("width")}
+        )
+        serializer.is_valid(raise_exception=True)
+        width = serializer.validated_data["width"]
+        media_type = service.negotiate_media_type(request.headers.get("Accept", ""))
+
+        etag = f'"{service.get_cache_key(image_hash, width, media_type)}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content = service.get_image(image_hash, width, media_type)
+            if content is None:
+                raise NotFound("Image not found!")
+            response = HttpResponse(content, content_type=media_type)
+            response["ETag"] = etag
+
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.PRODUCT_IMAGE_MAX_AGE,
+            immutable=True,
+        )
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+
+class CatalogCacheStatsAPIView(GenericViewSet):
+    serializer_class = CatalogCacheStatsOutputSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def list(self, request: Request) -> Response:
+        return Response(
+            self.get_serializer(get_catalog_cache_stats()).data,
+            status=status.HTTP_200_OK,
+        )
+
+
+class ProductDetailAPIView(
+    CatalogResponseCacheMixin,
+    ConditionalRetrieveMixin,
+    DynamicFieldsMixin,
+    GenericViewSet,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+):
+    queryset = Product.objects.select_related("category", "inventory")
     serializer_class = ProductDetailOutputSerializer
     permission_classes = [SellerOrAdmin]
 
+    def renders_stock(self) -> bool:
+        fields, _ = self.get_field_selection()
+        return fields is None or "inventory" in fields
+
+    def get_queryset(self):
+        # writes return the product they changed, its stock is read again
+        queryset = super().get_queryset()
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.annotate(inventory_stock=stock_quantity("inventory__"))
+        return queryset
+
+    def get_conditional_validators(self) -> Optional[tuple[str, datetime]]:
+        # sales only append to the inventory ledger, the stock and its last
+        # movement are part of the product's version
+        last_movement_at = (
+            InventoryMovement.objects.filter(inventory=OuterRef("inventory"))
+            .order_by("-id")
+            .values("created_at")[:1]
+        )
+        product = (
+            Product.objects.filter(pk=self.kwargs["pk"])
+            .annotate(
+                stock=stock_quantity("inventory__"),
+                last_movement_at=Subquery(last_movement_at),
+            )
+            .values(
+                "updated_at",
+                "inventory__updated_at",
+                "category__id",
+                "category__name",
+                "stock",
+                "last_movement_at",
+            )
+            .first()
+        )
+        if product is None:
+            return None
+        return make_etag(*product.values(), self.get_field_selection_key()), max(
+            product["updated_at"],
+            product["inventory__updated_at"],
+            product["last_movement_at"] or product["updated_at"],
+        )
+
     def update(self, request: Request, pk: UUID) -> Response:
         service = ProductUpdateService()
         instance = self.get_object()
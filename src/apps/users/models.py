@@ -18,6 +18,7 @@ class UserAddress(models.Model):
     state = models.CharField(max_length=70, blank=True, null=True)
     city = models.CharField(max_length=120)
     zip_code = models.CharField(max_length=30)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Address"
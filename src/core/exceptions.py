@@ -29,3 +29,11 @@ class MaxQuantityExceededException(ServiceException):
             f"exceeds the biggest possible amount you can add to your cart - {inventory_quantity}! "
             "Please change the quantity value and check if the product is not out of stock!"
         )
+
+
+class UnsupportedImageFormatException(ServiceException):
+    def __init__(self, image_format: str) -> None:
+        super().__init__(
+            f"Image format {image_format} is not supported! "
+            "Please upload a JPEG, PNG, GIF or WEBP image!"
+        )
@@ -0,0 +1,139 @@
+import json
+from datetime import timedelta
+
+from django.db.models import (
+    Case,
+    DurationField,
+    Expression,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Func,
+    BigIntegerField,
+    DateTimeField,
+    TextField,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Replace, Round
+from django.db.models.lookups import Exact, IsNull, LessThan
+
+# Builders of JSON text in the database, formatted the way DRF's JSONRenderer
+# formats the same values: compact separators, unescaped unicode, decimals
+# rendered as floats and datetimes in the current time zone.
+
+
+def _to_char(expression: Expression, format: str) -> Func:
+    return Func(expression, Value(format), function="to_char", output_field=TextField())
+
+
+def _timezone(name: str, expression: Expression) -> Func:
+    return Func(
+        Value(name), expression, function="timezone", output_field=DateTimeField()
+    )
+
+
+def json_value(expression) -> Expression:
+    # strings, numbers, booleans and uuids are escaped by to_json()
+    if isinstance(expression, str):
+        expression = F(expression)
+    return Coalesce(
+        Cast(Func(expression, function="to_json"), TextField()),
+        Value("null"),
+        output_field=TextField(),
+    )
+
+
+def json_decimal(expression) -> Expression:
+    # DRF renders Decimal as float(), so integral values get a ".0" and the
+    # rest the shortest repr, which float8 output produces as well
+    if isinstance(expression, str):
+        expression = F(expression)
+    return Case(
+        When(IsNull(expression, True), then=Value("null")),
+        When(
+            Exact(expression, Round(expression)),
+            then=Concat(
+                Cast(Cast(expression, BigIntegerField()), TextField()),
+                Value(".0"),
+                output_field=TextField(),
+            ),
+        ),
+        default=Cast(Cast(expression, FloatField()), TextField()),
+        output_field=TextField(),
+    )
+
+
+def json_datetime(expression, time_zone: str) -> Expression:
+    # datetime.isoformat() in `time_zone`, with DRF's "Z" for UTC
+    if isinstance(expression, str):
+        expression = F(expression)
+    local = _timezone(time_zone, expression)
+    offset = ExpressionWrapper(
+        local - _timezone("UTC", expression), output_field=DurationField()
+    )
+    microseconds = _to_char(local, "US")
+    return Case(
+        When(IsNull(expression, True), then=Value("null")),
+        default=Concat(
+            Value('"'),
+            _to_char(local, 'YYYY-MM-DD"T"HH24:MI:SS'),
+            Case(
+                When(Exact(microseconds, "000000"), then=Value("")),
+                default=Concat(Value("."), microseconds, output_field=TextField()),
+                output_field=TextField(),
+            ),
+            Case(
+                When(Exact(offset, timedelta(0)), then=Value("Z")),
+                When(
+                    LessThan(offset, timedelta(0)),
+                    then=Concat(
+                        Value("-"),
+                        _to_char(
+                            ExpressionWrapper(
+                                Value(timedelta(0)) - offset,
+                                output_field=DurationField(),
+                            ),
+                            "HH24:MI",
+                        ),
+                        output_field=TextField(),
+                    ),
+                ),
+                default=Concat(
+                    Value("+"), _to_char(offset, "HH24:MI"), output_field=TextField()
+                ),
+                output_field=TextField(),
+            ),
+            Value('"'),
+            output_field=TextField(),
+        ),
+        output_field=TextField(),
+    )
+
+
+def json_object(fields: dict[str, Expression]) -> Expression:
+    parts = []
+    for index, (key, value) in enumerate(fields.items()):
+        separator = "{" if index == 0 else ","
+        parts += [Value(f"{separator}{json.dumps(key, ensure_ascii=False)}:"), value]
+    return Concat(*parts, Value("}"), output_field=TextField())
+
+
+def json_array(elements: Expression) -> Expression:
+    # `elements` are the comma separated items, NULL when there are none
+    return Concat(
+        Value("["),
+        Coalesce(elements, Value(""), output_field=TextField()),
+        Value("]"),
+        output_field=TextField(),
+    )
+
+
+def json_document(expression: Expression) -> Expression:
+    # the renderer escapes these two, they end JavaScript lines
+    return Replace(
+        Replace(expression, Value("\u2028"), Value("\\u2028")),
+        Value("\u2029"),
+        Value("\\u2029"),
+        output_field=TextField(),
+    )
@@ -0,0 +1,144 @@
+from datetime import datetime
+from hashlib import md5
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Expression, QuerySet
+from django.http import HttpResponse, HttpResponseBase
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import BaseSerializer
+
+
+def make_etag(*parts: Any) -> str:
+    return md5("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answers `If-None-Match`/`If-Modified-Since` on retrieve with 304 before
+    the object is loaded. Views provide the validators from a lightweight
+    query in `get_conditional_validators`.
+    """
+
+    def get_conditional_validators(self) -> Optional[tuple[str, datetime]]:
+        raise NotImplementedError(
+            "Views using ConditionalRetrieveMixin have to implement "
+            "`get_conditional_validators()`"
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        validators = self.get_conditional_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = quote_etag(validators[0]), int(validators[1].timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class DynamicFieldsMixin:
+    """
+    Reads comma separated `?fields=` and `?expand=` for serializers using
+    DynamicFieldsSerializerMixin. Reads get a queryset trimmed to the lookups
+    of the rendered fields, writes load whole objects for the services.
+    """
+
+    def get_field_selection(self) -> tuple[Optional[set[str]], set[str]]:
+        if not hasattr(self, "_field_selection"):
+            fields = self._get_query_list("fields")
+            expand = self._get_query_list("expand") or set()
+            self.get_serializer_class().validate_field_selection(fields, expand)
+            self._field_selection = fields, expand
+        return self._field_selection
+
+    def get_field_selection_key(self) -> str:
+        # part of ETags, every selection is a separate representation
+        fields, expand = self.get_field_selection()
+        return f"{','.join(sorted(fields or ['*']))};{','.join(sorted(expand))}"
+
+    def _get_query_list(self, name: str) -> Optional[set[str]]:
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(",") if item.strip()}
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        fields, expand = self.get_field_selection()
+        return self.get_serializer_class().optimize_queryset(queryset, fields, expand)
+
+    def get_serializer(self, *args, **kwargs) -> BaseSerializer:
+        fields, expand = self.get_field_selection()
+        kwargs.setdefault("fields", fields)
+        kwargs.setdefault("expand", expand)
+        return super().get_serializer(*args, **kwargs)
+
+
+class DatabaseJSONRetrieveMixin:
+    """
+    Optional fast path for retrieve: the default representation is built by
+    PostgreSQL as JSON text, formatted like JSONRenderer formats the
+    serializer's output, and sent as is. Anything the database version
+    doesn't cover (other databases and renderers, indented output, a
+    `?fields=`/`?expand=` selection) goes through the serializer.
+    """
+
+    json_document_name = "json_document"
+
+    def get_json_document_expression(self) -> Expression:
+        raise NotImplementedError(
+            "Views using DatabaseJSONRetrieveMixin have to implement "
+            "`get_json_document_expression()`"
+        )
+
+    def can_retrieve_json_document(self, request: Request) -> bool:
+        renderer = request.accepted_renderer
+        if not (
+            settings.DATABASE_JSON_RESPONSES
+            and connection.vendor == "postgresql"
+            and isinstance(renderer, JSONRenderer)
+            and renderer.compact
+            and not renderer.ensure_ascii
+            and renderer.get_indent(request.accepted_media_type, {}) is None
+        ):
+            return False
+        if hasattr(self, "get_field_selection"):
+            return self.get_field_selection() == (None, set())
+        return True
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        if not self.can_retrieve_json_document(request):
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .select_related(None)
+            .prefetch_related(None)
+            .only("pk")
+            .annotate(**{self.json_document_name: self.get_json_document_expression()})
+        )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, instance)
+        return HttpResponse(
+            getattr(instance, self.json_document_name),
+            content_type=request.accepted_renderer.media_type,
+        )
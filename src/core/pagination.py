@@ -0,0 +1,240 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+from uuid import UUID
+
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    ValidationError as DjangoValidationError,
+)
+from django.db.models import Model, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Seek-method pagination over whatever ordering the filterset applied.
+    The primary key is appended as a tie-breaker, so the cursor (the sort key
+    of the boundary row) always identifies a unique position and pages never
+    need an OFFSET or a COUNT(*).
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    page_size = api_settings.PAGE_SIZE
+    tie_breaker = "id"
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view=None
+    ) -> Optional[list[Model]]:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self._get_ordering(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self._reverse_ordering() if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            # values of the wrong type for their field are rejected while
+            # the lookups are built
+            try:
+                queryset = queryset.filter(
+                    self._build_seek_filter(queryset, ordering, position)
+                )
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[: self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data: list) -> Response:
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._get_position(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request: Request) -> tuple[Optional[list], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            position, reverse = cursor["p"], bool(cursor["r"])
+            valid = (
+                cursor["o"] == list(self.ordering)
+                and isinstance(position, list)
+                and len(position) == len(self.ordering)
+            )
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            valid = False
+
+        if not valid:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position: list, reverse: bool) -> str:
+        cursor = {"p": position, "r": int(reverse), "o": list(self.ordering)}
+        encoded = b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_ordering(self, queryset: QuerySet) -> tuple[str, ...]:
+        ordering = [
+            field
+            for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        if not any(field.lstrip("-") in (self.tie_breaker, "pk") for field in ordering):
+            ordering.append(self.tie_breaker)
+        return tuple(ordering)
+
+    def _reverse_ordering(self) -> tuple[str, ...]:
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        )
+
+    def _get_position(self, instance: Model) -> list:
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, attr, None) if value is not None else None
+            position.append(self._serialize_value(value))
+        return position
+
+    @classmethod
+    def _serialize_value(cls, value: Any) -> Any:
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (Decimal, UUID)):
+            return str(value)
+        return value
+
+    @classmethod
+    def _is_nullable(cls, queryset: QuerySet, path: str) -> bool:
+        # annotations the filters order by (search rank, name similarity)
+        # are never null
+        if path in queryset.query.annotations:
+            return False
+        model = queryset.model
+        for attr in path.split("__"):
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return False
+            if field.null:
+                return True
+            model = field.related_model
+        return False
+
+    @classmethod
+    def _build_seek_filter(
+        cls, queryset: QuerySet, ordering: tuple[str, ...], position: list
+    ) -> Q:
+        """
+        Expands the row comparison `(f1, f2, ...) > (v1, v2, ...)` into
+        `f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...`, honouring each field's
+        direction and PostgreSQL's default NULL placement (NULLS LAST for
+        ascending, NULLS FIRST for descending).
+        """
+        seek_filter, equal_prefix = Q(), Q()
+        for field, value in zip(ordering, position):
+            descending, path = field.startswith("-"), field.lstrip("-")
+
+            if value is None:
+                after = None if not descending else Q(**{f"{path}__isnull": False})
+                equal = Q(**{f"{path}__isnull": True})
+            else:
+                after = Q(**{f"{path}__{'lt' if descending else 'gt'}": value})
+                if not descending and cls._is_nullable(queryset, path):
+                    after |= Q(**{f"{path}__isnull": True})
+                equal = Q(**{path: value})
+
+            if after is not None:
+                seek_filter |= equal_prefix & after
+            equal_prefix &= equal
+        return seek_filter
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    """
+    Keeps page-number pagination as the default and switches to keyset
+    pagination when the client asks for it with `?pagination=cursor` or
+    follows a `cursor` link.
+    """
+
+    mode_query_param = "pagination"
+    cursor_mode = "cursor"
+    page_number_pagination_class = PageNumberPagination
+    cursor_pagination_class = KeysetCursorPagination
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view=None
+    ) -> Optional[list[Model]]:
+        self.paginator = self._get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data: list) -> Response:
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return self.page_number_pagination_class().get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self) -> bool:
+        return getattr(self, "paginator", None) is not None and getattr(
+            self.paginator, "display_page_controls", False
+        )
+
+    def to_html(self) -> str:
+        return self.paginator.to_html()
+
+    def _get_paginator(self, request: Request) -> BasePagination:
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or cursor_param in request.query_params
+        ):
+            return self.cursor_pagination_class()
+        return self.page_number_pagination_class()
@@ -83,18 +83,16 @@ class OwnerOrAdmin(permissions.BasePermission):
 
 class SellerOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        user_profile = UserProfile.objects.get(user=request.user)
-        if request.user.is_superuser or user_profile.role == "seller":
+        if request.method in permissions.SAFE_METHODS:
             return True
 
-        return bool(request.method in permissions.SAFE_METHODS)
+        user_profile = UserProfile.objects.filter(user_id=request.user.id).first()
+        return bool(
+            request.user.is_superuser or user_profile and user_profile.role == "seller"
+        )
 
     def has_object_permission(self, request, view, obj):
-        user_profile = UserProfile.objects.get(user=request.user)
-        if request.user.is_superuser or user_profile.role == "seller":
-            return True
-
-        return bool(request.method in permissions.SAFE_METHODS)
+        return self.has_permission(request, view)
 
 
 class NonCustomer(permissions.BasePermission):
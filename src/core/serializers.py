@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+
+@dataclass(frozen=True)
+class FieldLookups:
+    only: tuple[str, ...] = ()
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class ExpandableField:
+    serializer_class: type
+    # relation the nested serializer renders, its own lookups are prefixed with it
+    path: str
+    lookups: FieldLookups
+    many: bool = False
+
+
+def split_expand(expand: set[str]) -> dict[str, set[str]]:
+    # {"order_items.product", "address"} -> {"order_items": {"product"}, "address": set()}
+    tree = {}
+    for name in expand:
+        field_name, _, nested = name.partition(".")
+        tree.setdefault(field_name, set())
+        if nested:
+            tree[field_name].add(nested)
+    return tree
+
+
+class DynamicFieldsSerializerMixin:
+    """
+    Lets a client pick the rendered fields with `?fields=` and render related
+    objects nested with `?expand=` (dotted for nested serializers), see
+    DynamicFieldsMixin. The lookups each field reads are declared next to it,
+    so the view's queryset only loads and joins what gets rendered.
+    """
+
+    expandable_fields: dict[str, ExpandableField] = {}
+    # lookups of fields that aren't plain model fields
+    field_lookups: dict[str, FieldLookups] = {}
+
+    def __init__(
+        self,
+        *args,
+        fields: Optional[set[str]] = None,
+        expand: Optional[set[str]] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self._requested_fields = fields
+        self._expand = expand or set()
+
+    def get_fields(self) -> dict:
+        fields = super().get_fields()
+        for name, nested_expand in split_expand(self._expand).items():
+            expandable = self.expandable_fields[name]
+            fields[name] = expandable.serializer_class(
+                many=expandable.many, read_only=True, expand=nested_expand
+            )
+        if self._requested_fields is not None:
+            fields = {
+                name: field
+                for name, field in fields.items()
+                if name in self._requested_fields
+            }
+        return fields
+
+    @classmethod
+    def validate_field_selection(
+        cls, fields: Optional[set[str]], expand: set[str]
+    ) -> None:
+        available = set(cls.Meta.fields) | cls.expandable_fields.keys()
+        unknown = (fields or set()) - available
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(sorted(unknown))}!"]}
+            )
+        for name, nested_expand in split_expand(expand).items():
+            if name not in cls.expandable_fields:
+                raise serializers.ValidationError(
+                    {"expand": [f"Field {name} can't be expanded!"]}
+                )
+            cls.expandable_fields[name].serializer_class.validate_field_selection(
+                None, nested_expand
+            )
+
+    @classmethod
+    def get_queryset_lookups(
+        cls, fields: Optional[set[str]], expand: set[str]
+    ) -> Optional[FieldLookups]:
+        expand_tree = split_expand(expand)
+        selected = set(cls.Meta.fields) | expand_tree.keys()
+        if fields is not None:
+            selected &= fields
+
+        only, select_related, prefetch_related = {"pk"}, set(), set()
+        for name in selected:
+            if name in expand_tree:
+                expandable = cls.expandable_fields[name]
+                lookups = expandable.lookups
+                nested = expandable.serializer_class.get_queryset_lookups(
+                    None, expand_tree[name]
+                )
+                if nested is None:
+                    return None
+                # the nested model is loaded separately, with all its columns
+                prefetch_related.update(
+                    f"{expandable.path}__{lookup}"
+                    for lookup in nested.select_related + nested.prefetch_related
+                )
+            else:
+                lookups = cls.field_lookups.get(name) or cls._get_model_field_lookups(
+                    name
+                )
+            if lookups is None:
+                return None
+            only.update(lookups.only)
+            select_related.update(lookups.select_related)
+            prefetch_related.update(lookups.prefetch_related)
+
+        return FieldLookups(
+            only=tuple(sorted(only)),
+            select_related=tuple(sorted(select_related)),
+            prefetch_related=tuple(sorted(prefetch_related)),
+        )
+
+    @classmethod
+    def _get_model_field_lookups(cls, name: str) -> Optional[FieldLookups]:
+        try:
+            field = cls.Meta.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        return FieldLookups(only=(name,))
+
+    @classmethod
+    def optimize_queryset(
+        cls, queryset: QuerySet, fields: Optional[set[str]], expand: set[str]
+    ) -> QuerySet:
+        lookups = cls.get_queryset_lookups(fields, expand)
+        if lookups is None:
+            # a field without declared lookups, everything stays loaded
+            return queryset
+        # the view's own relations are replaced, a deferred field can't be
+        # traversed with select_related
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if lookups.select_related:
+            queryset = queryset.select_related(*lookups.select_related)
+        if lookups.prefetch_related:
+            queryset = queryset.prefetch_related(*lookups.prefetch_related)
+        return queryset.only(*lookups.only)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # 3rd party
     "rest_framework",
     "rest_framework_simplejwt",
@@ -90,6 +91,9 @@ WSGI_APPLICATION = "src.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# minimal pg_trgm similarity for the fuzzy product name search (`%` operator)
+PRODUCT_NAME_SIMILARITY_THRESHOLD = 0.3
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql_psycopg2",
@@ -98,6 +102,10 @@ DATABASES = {
         "PASSWORD": env_config("POSTGRES_PASSWORD"),
         "HOST": env_config("POSTGRES_HOST"),
         "PORT": env_config("POSTGRES_PORT"),
+        "OPTIONS": {
+            "options": "-c pg_trgm.similarity_threshold="
+            f"{PRODUCT_NAME_SIMILARITY_THRESHOLD}",
+        },
     }
 }
 
@@ -168,4 +176,87 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
 
+# width of product_thumbnail, always generated next to PRODUCT_THUMBNAIL_WIDTHS
 MAX_THUMBNAIL_WIDTH = 200
+PRODUCT_THUMBNAIL_WIDTHS = [100, 200, 400]
+# seconds the process_thumbnails worker sleeps when the queue is empty
+PRODUCT_THUMBNAIL_POLL_INTERVAL = 5
+
+# the catalog version, stock entries and anonymous carts are shared between
+# the web process and the compose workers, so they need the Redis cache
+# REDIS_URL points at; without it (e.g. in tests) every process keeps a local
+# one. Anonymous carts get a database of their own, so flushing the catalog
+# entries doesn't empty them
+REDIS_URL = env_config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "carts": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env_config("REDIS_CARTS_URL", default="redis://redis:6379/1"),
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "carts": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "carts",
+        },
+    }
+
+# lower bounds of the price buckets returned by the catalog facets endpoint
+PRODUCT_FACET_PRICE_BUCKETS = [0, 10, 25, 50, 100, 250, 500]
+# most price buckets a client can ask the facets endpoint for
+PRODUCT_FACET_MAX_PRICE_BUCKETS = 50
+PRODUCT_FACETS_CACHE_TIMEOUT = 60 * 5
+CATALOG_RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+# number of rows inserted/updated per statement by the bulk product import
+PRODUCT_IMPORT_CHUNK_SIZE = 500
+
+# number of rows fetched per database round trip by the catalog export
+PRODUCT_EXPORT_CHUNK_SIZE = 2000
+
+# widths served by the on-demand product image endpoint
+PRODUCT_IMAGE_WIDTHS = [100, 200, 400, 800, 1200]
+PRODUCT_IMAGE_CACHE_DIR = os.path.join(MEDIA_ROOT, "resized")
+PRODUCT_IMAGE_CACHE_MAX_SIZE = 256 * 1024 * 1024
+# resized images are addressed by their content hash, so they never change
+PRODUCT_IMAGE_MAX_AGE = 60 * 60 * 24 * 365
+
+# cart and order detail JSON built by PostgreSQL, see DatabaseJSONRetrieveMixin
+DATABASE_JSON_RESPONSES = True
+
+# number of "frequently bought together" products stored per product
+PRODUCT_RECOMMENDATIONS_TOP_K = 10
+
+# seconds cart items hold their stock, extended on every change of the cart
+STOCK_RESERVATION_TTL = 60 * 15
+# rows deleted per statement and seconds between runs of release_reservations
+STOCK_RESERVATION_SWEEP_BATCH_SIZE = 1000
+STOCK_RESERVATION_SWEEP_INTERVAL = 60
+
+# seconds between foldings of inventory movements into the stock snapshots,
+# the catalog shows the snapshots
+INVENTORY_COMPACTION_INTERVAL = 60
+
+# products per request and seconds every product is cached by the batch
+# availability endpoint, released holds show up after at most this
+PRODUCT_AVAILABILITY_MAX_IDS = 200
+PRODUCT_AVAILABILITY_CACHE_TIMEOUT = 10
+
+# operations per request of the bulk cart items endpoint
+CART_BULK_MAX_OPERATIONS = 100
+
+# cookie and seconds of inactivity after which the cache evicts the carts of
+# shoppers who are not logged in
+ANONYMOUS_CART_CACHE = "carts"
+ANONYMOUS_CART_COOKIE_NAME = "anonymous_cart"
+ANONYMOUS_CART_TTL = 60 * 60 * 24 * 7
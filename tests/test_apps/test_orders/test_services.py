@@ -1,18 +1,53 @@
+import threading
+from datetime import timedelta
+
 from django.http.response import Http404
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.core import mail
+from django.core.cache import cache, caches
 from django.core.files.base import ContentFile
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from src.apps.users.models import UserAddress, UserProfile
-from src.apps.products.models import Product, ProductInventory, ProductCategory
-from src.apps.orders.models import Order, OrderItem, Cart, CartItem
+from src.apps.products.models import (
+    InventoryMovement,
+    InventoryMovementKind,
+    Product,
+    ProductInventory,
+    ProductCategory,
+)
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+    stock_quantity,
+)
+from src.apps.orders.models import (
+    Order,
+    OrderItem,
+    Cart,
+    CartItem,
+    ProductPairCount,
+    ProductRecommendation,
+    ProductRecommendationRun,
+    StockReservation,
+)
 from src.apps.orders.services.cart_service import (
+    CartItemBulkService,
     CartItemCreateService,
     CartItemUpdateService,
 )
+from src.apps.orders.services.anonymous_cart_service import AnonymousCartService
 from src.apps.orders.services.order_service import OrderCreateService
+from src.apps.orders.services.product_recommendation_service import (
+    ProductRecommendationService,
+)
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+    available_quantity,
+)
 from src.apps.products.utils import generate_image_file
 from src.core.exceptions import MaxQuantityExceededException
 
@@ -27,6 +62,7 @@ class TestCartService(TestCase):
 
         cls.create_service = CartItemCreateService()
         cls.update_service = CartItemUpdateService()
+        cls.bulk_service = CartItemBulkService()
         cls.address = UserAddress.objects.create(
             primary_address="address 1/1",
             country="PL",
@@ -135,6 +171,74 @@ class TestCartService(TestCase):
         self.assertEqual(CartItem.objects.all().count(), 1)
         self.assertEqual(cart_item.quantity, quantity)
 
+    def _create_products(self, count: int) -> list[Product]:
+        return [
+            Product.objects.create(
+                name=f"Product {number}",
+                price="2.00",
+                description="product",
+                category=self.product_category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=self.image,
+            )
+            for number in range(count)
+        ]
+
+    def test_bulk_service_applies_operations_in_order(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=4)
+        other_product, removed_product = self._create_products(2)
+        CartItem.objects.create(cart=self.cart, product=removed_product, quantity=1)
+        operations = [
+            {"operation": "add", "product_id": self.product.id, "quantity": 2},
+            {"operation": "add", "product_id": other_product.id, "quantity": 1},
+            {"operation": "set", "product_id": other_product.id, "quantity": 5},
+            {"operation": "remove", "product_id": removed_product.id, "quantity": 1},
+        ]
+        self.bulk_service.apply_operations(
+            cart_id=self.cart.id, data={"operations": operations}
+        )
+
+        self.assertEqual(
+            dict(self.cart.cart_items.values_list("product_id", "quantity")),
+            {self.product.id: 6, other_product.id: 5},
+        )
+        self.assertEqual(
+            dict(
+                StockReservation.objects.filter(cart=self.cart).values_list(
+                    "product_id", "quantity"
+                )
+            ),
+            {self.product.id: 6, other_product.id: 5},
+        )
+
+    def test_bulk_service_validates_every_grown_quantity(self):
+        (other_product,) = self._create_products(1)
+        operations = [
+            {"operation": "add", "product_id": self.product.id, "quantity": 1},
+            {"operation": "add", "product_id": other_product.id, "quantity": 11},
+        ]
+        with self.assertRaises(MaxQuantityExceededException):
+            self.bulk_service.apply_operations(
+                cart_id=self.cart.id, data={"operations": operations}
+            )
+        self.assertEqual(CartItem.objects.count(), 0)
+
+    def test_bulk_service_query_count_does_not_depend_on_operation_count(self):
+        products = self._create_products(6)
+
+        def apply(products):
+            operations = [
+                {"operation": "add", "product_id": product.id, "quantity": 1}
+                for product in products
+            ]
+            with CaptureQueriesContext(connection) as context:
+                self.bulk_service.apply_operations(
+                    cart_id=self.cart.id, data={"operations": operations}
+                )
+            return len(context.captured_queries)
+
+        self.assertEqual(apply(products[:1]), apply(products[1:]))
+
 
 class TestOrderService(TestCase):
     @classmethod
@@ -210,7 +314,7 @@ class TestOrderService(TestCase):
         self.assertEqual(mail.outbox[0].to, ["{}".format(order.user.email)])
 
     def test_order_service_correctly_updates_inventory_of_products(self):
-        product_inventory_quantity = self.product.inventory.quantity
+        product_inventory_quantity = self.product.inventory.current_quantity
         order = self.create_service.create_order(
             self.cart.id, user=self.customer, data=self.order_data
         )
@@ -218,6 +322,491 @@ class TestOrderService(TestCase):
 
         self.assertEqual(Order.objects.all().count(), 1)
         self.assertEqual(
-            order_item.product.inventory.quantity,
+            order_item.product.inventory.current_quantity,
             product_inventory_quantity - order_item.quantity,
         )
+        # the sale is a movement in the inventory ledger
+        movement = InventoryMovement.objects.get(inventory=self.product_inventory)
+        self.assertEqual(movement.kind, InventoryMovementKind.SALE)
+        self.assertEqual(movement.reference, str(order.id))
+
+
+class TestConcurrentCheckout(TransactionTestCase):
+    CHECKOUTS = 8
+    STOCK = 5
+
+    def setUp(self):
+        self.address = UserAddress.objects.create(
+            primary_address="address 1/1",
+            country="PL",
+            city="Warsaw",
+            zip_code="00-001",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        self.products = [
+            Product.objects.create(
+                name=name,
+                price="1.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=self.STOCK),
+                product_image=image,
+            )
+            for name in ("Water", "Tea", "Coffee")
+        ]
+        self.carts = []
+        for index in range(self.CHECKOUTS):
+            user = User.objects.create(username=f"customer{index}")
+            profile = UserProfile.objects.create(
+                user=user,
+                username=user.username,
+                role="customer",
+                email=f"customer{index}@mail.com",
+                phone_number=f"+4812312310{index}",
+            )
+            cart = Cart.objects.create(user=profile)
+            # items without reservations, e.g. expired ones, in the opposite
+            # order in every other cart
+            products = self.products if index % 2 else self.products[::-1]
+            for product in products:
+                CartItem.objects.create(cart=cart, product=product, quantity=1)
+            self.carts.append((cart, user))
+
+    def _checkout(self, barrier, cart, user, results):
+        try:
+            barrier.wait()
+            OrderCreateService().create_order(
+                cart.id, user=user, data={"address_id": self.address.id}
+            )
+            results.append("ordered")
+        except MaxQuantityExceededException:
+            results.append("out of stock")
+        except Exception as exception:
+            results.append(exception)
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_dont_oversell_or_deadlock(self):
+        barrier = threading.Barrier(self.CHECKOUTS)
+        results = []
+        threads = [
+            threading.Thread(target=self._checkout, args=(barrier, cart, user, results))
+            for cart, user in self.carts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count("ordered"), self.STOCK, results)
+        self.assertEqual(results.count("out of stock"), self.CHECKOUTS - self.STOCK)
+        for product in self.products:
+            self.assertEqual(
+                Product.objects.annotate(stock=stock_quantity("inventory__"))
+                .get(pk=product.pk)
+                .stock,
+                0,
+            )
+            self.assertEqual(
+                OrderItem.objects.filter(product=product).count(), self.STOCK
+            )
+
+    def test_database_rejects_negative_stock(self):
+        with self.assertRaises(IntegrityError):
+            ProductInventory.objects.filter(product=self.products[0]).update(
+                quantity=-1
+            )
+
+
+class TestConcurrentCartItemCreate(TransactionTestCase):
+    ADDS = 8
+    STOCK = 5
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        self.product = Product.objects.create(
+            name="Water",
+            price="1.99",
+            description="waterr",
+            category=category,
+            inventory=ProductInventory.objects.create(quantity=self.STOCK),
+            product_image=ContentFile(image_file.getvalue(), name=image_file.name),
+        )
+        user = User.objects.create(username="customer")
+        profile = UserProfile.objects.create(
+            user=user,
+            username=user.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        self.cart = Cart.objects.create(user=profile)
+
+    def _add(self, barrier, results):
+        try:
+            barrier.wait()
+            CartItemCreateService().cart_item_create(
+                cart_id=self.cart.id,
+                data={"product_id": self.product.id, "quantity": {"quantity": 1}},
+            )
+            results.append("added")
+        except MaxQuantityExceededException:
+            results.append("out of stock")
+        except Exception as exception:
+            results.append(exception)
+        finally:
+            connection.close()
+
+    def test_parallel_adds_increase_one_item_up_to_the_stock(self):
+        barrier = threading.Barrier(self.ADDS)
+        results = []
+        threads = [
+            threading.Thread(target=self._add, args=(barrier, results))
+            for _ in range(self.ADDS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count("added"), self.STOCK, results)
+        self.assertEqual(results.count("out of stock"), self.ADDS - self.STOCK)
+        cart_item = CartItem.objects.get(cart=self.cart, product=self.product)
+        self.assertEqual(cart_item.quantity, self.STOCK)
+        self.assertEqual(cart_item.reservation.quantity, self.STOCK)
+
+    def test_database_rejects_duplicate_cart_items(self):
+        CartItem.objects.create(cart=self.cart, product=self.product)
+        with self.assertRaises(IntegrityError):
+            CartItem.objects.create(cart=self.cart, product=self.product)
+
+
+class TestStockReservationService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = [
+            UserProfile.objects.create(
+                user=User.objects.create(username=username),
+                username=username,
+                role="customer",
+                email=f"{username}@mail.com",
+                phone_number=phone_number,
+            )
+            for username, phone_number in (
+                ("customer1", "+48123123123"),
+                ("customer2", "+48123123678"),
+            )
+        ]
+        cls.address = UserAddress.objects.create(
+            primary_address="address 1/1",
+            country="PL",
+            city="Warsaw",
+            zip_code="00-001",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea = [
+            Product.objects.create(
+                name=name,
+                price="1.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=image,
+            )
+            for name in ("Water", "Tea")
+        ]
+
+    def setUp(self):
+        self.cart1, self.cart2 = [
+            Cart.objects.create(user=profile) for profile in self.profiles
+        ]
+
+    def _add(self, cart, product, quantity):
+        return CartItemCreateService().cart_item_create(
+            cart_id=cart.id,
+            data={"product_id": product.id, "quantity": {"quantity": quantity}},
+        )
+
+    def _expire(self, cart_item):
+        StockReservation.objects.filter(cart_item=cart_item).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_adding_to_cart_reserves_stock(self):
+        cart_item = self._add(self.cart1, self.water, 4)
+        self._add(self.cart1, self.water, 2)
+
+        reservation = StockReservation.objects.get()
+        self.assertEqual(reservation.cart_item, cart_item)
+        self.assertEqual(reservation.quantity, 6)
+        self.assertGreater(reservation.expires_at, timezone.now())
+
+    def test_reserved_stock_cant_be_added_to_another_cart(self):
+        self._add(self.cart1, self.water, 8)
+
+        with self.assertRaises(MaxQuantityExceededException):
+            self._add(self.cart2, self.water, 3)
+        self._add(self.cart2, self.water, 2)
+
+        self.assertEqual(
+            Product.objects.annotate(available=available_quantity())
+            .get(pk=self.water.pk)
+            .available,
+            0,
+        )
+
+    def test_expired_reservation_doesnt_hold_stock(self):
+        cart_item = self._add(self.cart1, self.water, 8)
+        self._expire(cart_item)
+
+        self._add(self.cart2, self.water, 10)
+
+        self.assertEqual(
+            Product.objects.annotate(available=available_quantity())
+            .get(pk=self.water.pk)
+            .available,
+            0,
+        )
+
+    def test_cart_activity_extends_active_reservations(self):
+        water_item = self._add(self.cart1, self.water, 1)
+        soon = timezone.now() + timedelta(seconds=5)
+        StockReservation.objects.filter(cart_item=water_item).update(expires_at=soon)
+
+        tea_item = self._add(self.cart1, self.tea, 1)
+
+        water_reservation = StockReservation.objects.get(cart_item=water_item)
+        self.assertGreater(water_reservation.expires_at, soon)
+        self.assertEqual(
+            water_reservation.expires_at,
+            StockReservation.objects.get(cart_item=tea_item).expires_at,
+        )
+
+    def test_service_releases_expired_reservations_in_batches(self):
+        expired = [
+            self._add(self.cart1, self.water, 1),
+            self._add(self.cart1, self.tea, 1),
+            self._add(self.cart2, self.water, 1),
+        ]
+        for cart_item in expired:
+            self._expire(cart_item)
+        active = self._add(self.cart2, self.tea, 1)
+
+        released = StockReservationService().release_expired(batch_size=2)
+
+        self.assertEqual(released, 3)
+        self.assertEqual(StockReservation.objects.get().cart_item, active)
+
+    def _checkout(self, cart, profile):
+        return OrderCreateService().create_order(
+            cart.id, user=profile.user, data={"address_id": self.address.id}
+        )
+
+    def test_checkout_ignores_own_reservations(self):
+        self._add(self.cart1, self.water, 6)
+        self._add(self.cart2, self.water, 4)
+
+        self._checkout(self.cart1, self.profiles[0])
+        self._checkout(self.cart2, self.profiles[1])
+
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(
+            Product.objects.annotate(stock=stock_quantity("inventory__"))
+            .get(pk=self.water.pk)
+            .stock,
+            0,
+        )
+
+    def test_checkout_respects_reservations_of_other_carts(self):
+        self._add(self.cart1, self.water, 6)
+        self._add(self.cart2, self.water, 4)
+        # a unit sold elsewhere, the other cart's reservation still holds
+        ProductInventory.objects.filter(pk=self.water.inventory_id).update(quantity=9)
+
+        with self.assertRaises(MaxQuantityExceededException):
+            self._checkout(self.cart1, self.profiles[0])
+
+
+class TestAnonymousCartService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(
+            user=User.objects.create(username="customer"),
+            username="customer",
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea = [
+            Product.objects.create(
+                name=name,
+                price="1.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=5),
+                product_image=image,
+            )
+            for name in ("Water", "Tea")
+        ]
+
+    def setUp(self):
+        caches["carts"].clear()
+        self.service = AnonymousCartService()
+        self.token = self.service.new_token()
+
+    def _add(self, product, quantity):
+        self.service.apply_operations(
+            self.token,
+            {
+                "operations": [
+                    {"operation": "add", "product_id": product.id, "quantity": quantity}
+                ]
+            },
+        )
+
+    def test_merge_bulk_inserts_cart_and_reserves_stock(self):
+        self._add(self.water, 2)
+        self._add(self.tea, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cart = self.service.merge(self.token, self.profile)
+
+        self.assertEqual(
+            dict(cart.cart_items.values_list("product_id", "quantity")),
+            {self.water.id: 2, self.tea.id: 3},
+        )
+        self.assertEqual(StockReservation.objects.filter(cart=cart).count(), 2)
+        self.assertEqual(self.service.get_cart(self.token).cart_items, [])
+
+    def test_merge_keeps_only_the_available_stock(self):
+        self._add(self.water, 4)
+        self._add(self.tea, 1)
+        InventoryLedgerService().set_quantities({self.water.inventory_id: 3})
+        self.tea.delete()
+
+        cart = self.service.merge(self.token, self.profile)
+
+        self.assertEqual(
+            dict(cart.cart_items.values_list("product_id", "quantity")),
+            {self.water.id: 3},
+        )
+
+    def test_carts_are_kept_in_their_own_cache(self):
+        self._add(self.water, 2)
+        cache.clear()
+
+        self.assertEqual(
+            [
+                (item.product_id, item.quantity)
+                for item in self.service.get_cart(self.token).cart_items
+            ],
+            [(self.water.id, 2)],
+        )
+
+    def test_merge_of_empty_cart_creates_nothing(self):
+        self.assertIsNone(self.service.merge(self.token, self.profile))
+        self.assertFalse(Cart.objects.exists())
+
+
+class TestProductRecommendationService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=customer,
+            username=customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea, cls.coffee, cls.milk = [
+            Product.objects.create(
+                name=name,
+                price="1.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=100),
+                product_image=image,
+            )
+            for name in ("Water", "Tea", "Coffee", "Milk")
+        ]
+
+    def _place_order(self, *products, minutes_ago=10):
+        order = Order.objects.create(user=self.customer_profile)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, quantity=1) for product in products
+        )
+        Order.objects.filter(pk=order.pk).update(
+            order_place_date=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return order
+
+    def _recommended(self, product):
+        return list(
+            ProductRecommendation.objects.filter(product=product).values_list(
+                "recommended_product", "order_count", "rank"
+            )
+        )
+
+    def test_service_ranks_products_bought_together(self):
+        self._place_order(self.water, self.tea, self.coffee)
+        self._place_order(self.water, self.coffee)
+        self._place_order(self.coffee, self.milk)
+
+        run = ProductRecommendationService().update_recommendations()
+
+        self.assertEqual(run.processed_orders, 3)
+        # ties are ranked by the recommended product's id
+        tea_rank, milk_rank = (2, 3) if self.tea.id < self.milk.id else (3, 2)
+        self.assertCountEqual(
+            self._recommended(self.coffee),
+            [
+                (self.water.id, 2, 1),
+                (self.tea.id, 1, tea_rank),
+                (self.milk.id, 1, milk_rank),
+            ],
+        )
+        self.assertEqual(self._recommended(self.milk), [(self.coffee.id, 1, 1)])
+
+    def test_service_keeps_top_k_products(self):
+        self._place_order(self.water, self.tea, self.coffee)
+        self._place_order(self.water, self.coffee)
+
+        ProductRecommendationService(top_k=1).update_recommendations()
+
+        self.assertEqual(self._recommended(self.water), [(self.coffee.id, 2, 1)])
+
+    def test_service_adds_only_new_orders(self):
+        self._place_order(self.water, self.tea, minutes_ago=20)
+        first_run = ProductRecommendationService().update_recommendations()
+        # placed after the first run's watermark
+        ProductRecommendationRun.objects.filter(pk=first_run.pk).update(
+            orders_until=timezone.now() - timedelta(minutes=15)
+        )
+        self._place_order(self.water, self.tea, minutes_ago=5)
+
+        run = ProductRecommendationService().update_recommendations()
+
+        self.assertEqual(run.processed_orders, 1)
+        self.assertEqual(
+            ProductPairCount.objects.get(
+                product=self.water, other_product=self.tea
+            ).order_count,
+            2,
+        )
+        self.assertEqual(self._recommended(self.tea), [(self.water.id, 2, 1)])
+
+    def test_service_leaves_recent_orders_for_next_run(self):
+        self._place_order(self.water, self.tea, minutes_ago=0)
+
+        run = ProductRecommendationService().update_recommendations()
+
+        self.assertEqual(run.processed_orders, 0)
+        self.assertFalse(ProductRecommendation.objects.exists())
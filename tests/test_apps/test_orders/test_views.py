@@ -1,14 +1,32 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import uuid
 
 from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.test import APITestCase
 from django.core.files.base import ContentFile
 
 from src.apps.products.models import Product, ProductInventory, ProductCategory
-from src.apps.orders.models import Cart, CartItem, Order, OrderItem
+from src.apps.orders.models import Cart, CartItem, Order, OrderItem, StockReservation
+from src.apps.orders.services.cart_service import CartItemCreateService
+from src.apps.orders.services.order_service import OrderCreateService
+from src.apps.orders.services.product_recommendation_service import (
+    ProductRecommendationService,
+)
+from src.apps.orders.services.stock_reservation_service import (
+    StockReservationService,
+)
 from src.apps.users.models import UserAddress, UserProfile
+from src.core.exceptions import MaxQuantityExceededException
 from src.apps.products.utils import generate_image_file
 
 User = get_user_model()
@@ -91,6 +109,49 @@ class TestCartViews(APITestCase):
         response = self.client.get(self.cart_detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_user_can_select_cart_fields(self):
+        response = self.client.get(self.cart_detail_url, {"fields": "id,total"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id", "total"})
+        self.assertEqual(response.data["total"], Decimal("19.90"))
+
+    def test_cart_list_totals_query_count_does_not_depend_on_cart_count(self):
+        params = {"fields": "id,total"}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.cart_list_url, params)
+        single_cart_queries = len(context.captured_queries)
+        self.assertEqual(response.data["results"][0]["total"], Decimal("19.90"))
+
+        for quantity in range(1, 6):
+            cart = Cart.objects.create(user=self.customer1_profile)
+            CartItem.objects.create(cart=cart, product=self.product, quantity=quantity)
+        Cart.objects.create(user=self.customer1_profile)
+
+        with self.assertNumQueries(single_cart_queries):
+            response = self.client.get(self.cart_list_url, params)
+        totals = sorted(cart["total"] for cart in response.data["results"])
+        self.assertEqual(
+            totals,
+            [0, Decimal("1.99"), Decimal("3.98"), Decimal("5.97")]
+            + [Decimal("7.96"), Decimal("9.95"), Decimal("19.90")],
+        )
+
+    def test_annotated_cart_total_matches_property(self):
+        response = self.client.get(self.cart_detail_url, {"fields": "total"})
+        self.assertEqual(response.data["total"], self.cart.total)
+
+    def test_user_can_expand_cart_item_products(self):
+        response = self.client.get(self.cart_list_url, {"expand": "cart_items.product"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        product_data = response.data["results"][0]["cart_items"][0]["product"]
+        self.assertEqual(product_data["name"], self.product.name)
+        self.assertEqual(product_data["category_name"], self.product_category.name)
+
+    def test_user_cannot_expand_unknown_cart_field(self):
+        response = self.client.get(self.cart_detail_url, {"expand": "cart_items.id"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_customer_cannot_delete_cart(self):
         response = self.client.delete(self.cart_detail_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -189,6 +250,10 @@ class TestCartItemViews(APITestCase):
             kwargs={"pk": cls.cart.id, "cart_item_pk": cls.cart_item.id},
         )
 
+        cls.cart_item_bulk_url = reverse(
+            "orders:cart-item-bulk", kwargs={"pk": cls.cart.id}
+        )
+
         cls.other_cart = Cart.objects.create(user=cls.customer2_profile)
         cls.other_cart_item = CartItem.objects.create(
             cart=cls.other_cart, product=cls.product, quantity=10
@@ -214,6 +279,64 @@ class TestCartItemViews(APITestCase):
             uuid.UUID(response.data["results"][0]["id"]), self.cart_item.id
         )
 
+    def test_cart_item_list_computes_line_totals(self):
+        response = self.client.get(self.cart_item_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["total_item_price"], Decimal("19.90")
+        )
+
+    def test_user_can_apply_bulk_cart_item_operations(self):
+        other_product = Product.objects.create(
+            name="Juice",
+            price="4.50",
+            description="juice",
+            category=self.product_category,
+            inventory=ProductInventory.objects.create(quantity=10),
+            product_image=self.image,
+        )
+        operations = [
+            {"operation": "set", "product_id": self.product.id, "quantity": 2},
+            {"operation": "add", "product_id": other_product.id, "quantity": 3},
+        ]
+        response = self.client.post(
+            self.cart_item_bulk_url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {
+                item["product_name"]: item["quantity"]
+                for item in response.data["cart_items"]
+            },
+            {"Water": 2, "Juice": 3},
+        )
+        self.assertEqual(response.data["total"], Decimal("17.48"))
+
+    def test_bulk_remove_operation_deletes_cart_item(self):
+        operations = [{"operation": "remove", "product_id": self.product.id}]
+        response = self.client.post(
+            self.cart_item_bulk_url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cart_items"], [])
+        self.assertFalse(CartItem.objects.filter(id=self.cart_item.id).exists())
+
+    def test_bulk_operations_with_unknown_product_return_400(self):
+        operations = [{"operation": "add", "product_id": uuid.uuid4()}]
+        response = self.client.post(
+            self.cart_item_bulk_url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CartItem.objects.get(id=self.cart_item.id).quantity, 10)
+
+    def test_other_user_cannot_apply_bulk_operations_to_other_users_cart(self):
+        self.client.force_login(user=self.customer2)
+        operations = [{"operation": "remove", "product_id": self.product.id}]
+        response = self.client.post(
+            self.cart_item_bulk_url, {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_user_can_retrieve_cart_item_by_id(self):
         response = self.client.get(self.cart_item_detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -376,3 +499,484 @@ class TestOrderViews(APITestCase):
         self.client.logout()
         response = self.client.delete(self.order_detail_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_user_can_retrieve_orders_with_cursor_pagination(self):
+        Order.objects.bulk_create(
+            [Order(user=self.customer1_profile) for _ in range(12)]
+        )
+        response = self.client.get(
+            f"{self.order_list_url}?pagination=cursor&o=-order_place_date"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertEqual(len(response.data["results"]), 10)
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNone(response.data["next"])
+
+    def test_user_can_select_order_fields(self):
+        response = self.client.get(
+            self.order_detail_url, {"fields": "id,total,order_items"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id", "total", "order_items"})
+        self.assertEqual(response.data["total"], Decimal("19.90"))
+
+    def test_order_list_query_count_does_not_depend_on_order_count(self):
+        params = {"expand": "order_items.product"}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.order_list_url, params)
+        single_order_queries = len(context.captured_queries)
+        self.assertEqual(
+            response.data["results"][0]["order_items"][0]["product"]["name"],
+            self.product.name,
+        )
+
+        for _ in range(5):
+            order = Order.objects.create(
+                user=self.customer1_profile, address=self.address
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1)
+
+        with self.assertNumQueries(single_order_queries):
+            response = self.client.get(self.order_list_url, params)
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_order_list_totals_query_count_does_not_depend_on_order_count(self):
+        params = {"fields": "id,total"}
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.order_list_url, params)
+        single_order_queries = len(context.captured_queries)
+
+        for _ in range(5):
+            order = Order.objects.create(
+                user=self.customer1_profile, address=self.address
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=2)
+
+        with self.assertNumQueries(single_order_queries):
+            response = self.client.get(self.order_list_url, params)
+        self.assertEqual(
+            sorted(order["total"] for order in response.data["results"]),
+            [Decimal("3.98")] * 5 + [Decimal("19.90")],
+        )
+
+    def test_checkout_is_shown_in_product_stock_right_away(self):
+        cache.clear()
+        self.client.logout()
+        product_detail_url = reverse(
+            "products:product-detail", kwargs={"pk": self.product.id}
+        )
+        response = self.client.get(product_detail_url)
+        self.assertEqual(response.data["inventory"]["quantity"], 100)
+        etag = response["ETag"]
+
+        OrderCreateService().create_order(
+            self.cart.id, user=self.customer1, data={"address_id": self.address.id}
+        )
+
+        response = self.client.get(product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["inventory"]["quantity"], 90)
+
+    def test_matching_etag_returns_not_modified_order(self):
+        response = self.client.get(self.order_detail_url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(self.order_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_order_etag_changes_when_ordered_product_changes(self):
+        etag = self.client.get(self.order_detail_url)["ETag"]
+        self.product.price = "2.49"
+        self.product.save()
+
+        response = self.client.get(self.order_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_order_etag_changes_when_address_is_edited(self):
+        self.order.address = self.address
+        self.order.save()
+        etag = self.client.get(self.order_detail_url)["ETag"]
+        self.address.city = "Gdansk"
+        self.address.save()
+
+        response = self.client.get(self.order_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["address"]["city"], "Gdansk")
+
+    def test_other_user_cannot_use_etag_of_other_users_order(self):
+        etag = self.client.get(self.order_detail_url)["ETag"]
+        self.client.force_login(self.customer2)
+        response = self.client.get(self.order_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestDatabaseJSONViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username='Zażółć "gęślą"\\jaźń',
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.address = UserAddress.objects.create(
+            primary_address="address 1/1\nfloor 2",
+            country="PL",
+            city="Kraków",
+            zip_code="30-001",
+        )
+
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        category = ProductCategory.objects.create(name="Food")
+        products = [
+            Product.objects.create(
+                name=name,
+                price=price,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=100),
+                product_image=image,
+            )
+            for name, price in (
+                ("Water", "1.99"),
+                ('Tea "Earl\tGrey" \u2028 ☕', "10.00"),
+                ("Coffee", "0.10"),
+            )
+        ]
+
+        cls.cart = Cart.objects.create(user=cls.customer_profile)
+        cls.empty_cart = Cart.objects.create(user=cls.customer_profile)
+        cls.order = Order.objects.create(user=cls.customer_profile, address=cls.address)
+        cls.empty_order = Order.objects.create(user=cls.customer_profile)
+        for product, quantity in zip(products, (3, 2, 0)):
+            CartItem.objects.create(cart=cls.cart, product=product, quantity=quantity)
+            OrderItem.objects.create(
+                order=cls.order, product=product, quantity=quantity
+            )
+
+        # one date in summer and one in winter time, without microseconds
+        Order.objects.filter(pk=cls.empty_order.pk).update(
+            order_place_date=datetime(2023, 7, 1, 12, 30, tzinfo=timezone.utc),
+            payment_deadline=datetime(2023, 12, 1, tzinfo=timezone.utc),
+        )
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def _assert_same_as_serializer(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIsInstance(response, Response)
+
+        with override_settings(DATABASE_JSON_RESPONSES=False):
+            serializer_response = self.client.get(url)
+        self.assertIsInstance(serializer_response, Response)
+        self.assertEqual(response.content, serializer_response.content)
+        self.assertEqual(response["Content-Type"], serializer_response["Content-Type"])
+
+    def test_cart_document_matches_serializer_output(self):
+        for cart in (self.cart, self.empty_cart):
+            with self.subTest(cart=cart.pk):
+                self._assert_same_as_serializer(
+                    reverse("orders:cart-detail", kwargs={"pk": cart.pk})
+                )
+
+    def test_order_document_matches_serializer_output(self):
+        for order in (self.order, self.empty_order):
+            with self.subTest(order=order.pk):
+                self._assert_same_as_serializer(
+                    reverse("orders:order-detail", kwargs={"pk": order.pk})
+                )
+
+    def test_order_document_keeps_conditional_headers(self):
+        url = reverse("orders:order-detail", kwargs={"pk": self.order.pk})
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_field_selection_uses_serializer(self):
+        response = self.client.get(
+            reverse("orders:cart-detail", kwargs={"pk": self.cart.pk}),
+            {"fields": "id"},
+        )
+        self.assertIsInstance(response, Response)
+        self.assertEqual(set(response.data), {"id"})
+
+    def test_other_user_cannot_retrieve_cart_document(self):
+        other_user = User.objects.create(username="other")
+        UserProfile.objects.create(
+            user=other_user,
+            username=other_user.username,
+            role="customer",
+            email="other@mail.com",
+            phone_number="+48123123678",
+        )
+        self.client.force_login(other_user)
+        response = self.client.get(
+            reverse("orders:cart-detail", kwargs={"pk": self.cart.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestProductRecommendationViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = User.objects.create(username="customer")
+        customer_profile = UserProfile.objects.create(
+            user=customer,
+            username=customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea = [
+            Product.objects.create(
+                name=name,
+                price="1.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=100),
+                product_image=image,
+            )
+            for name in ("Water", "Tea")
+        ]
+        order = Order.objects.create(user=customer_profile)
+        OrderItem.objects.create(order=order, product=cls.water, quantity=1)
+        OrderItem.objects.create(order=order, product=cls.tea, quantity=2)
+        Order.objects.filter(pk=order.pk).update(
+            order_place_date=datetime(2023, 7, 1, tzinfo=timezone.utc)
+        )
+        ProductRecommendationService().update_recommendations()
+
+    def test_anonymous_user_can_get_product_recommendations(self):
+        response = self.client.get(
+            reverse("orders:product-recommendations", kwargs={"pk": self.water.pk})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        recommendation = response.data["results"][0]
+        self.assertEqual(recommendation["rank"], 1)
+        self.assertEqual(recommendation["order_count"], 1)
+        self.assertEqual(recommendation["product"]["id"], str(self.tea.id))
+
+    def test_recommendations_of_nonexistent_product_return_404(self):
+        response = self.client.get(
+            reverse("orders:product-recommendations", kwargs={"pk": uuid.uuid4()})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestProductAvailabilityViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = User.objects.create(username="customer")
+        customer_profile = UserProfile.objects.create(
+            user=customer,
+            username=customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea = [
+            Product.objects.create(
+                name=name,
+                price=price,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=quantity),
+                product_image=image,
+            )
+            for name, price, quantity in (("Water", "1.99", 10), ("Tea", "5.00", 3))
+        ]
+        cls.cart = Cart.objects.create(user=customer_profile)
+
+    def setUp(self):
+        cache.clear()
+
+    def _get(self, *ids):
+        return self.client.get(
+            reverse("orders:product-availability"),
+            {"ids": ",".join(str(id) for id in ids)},
+        )
+
+    def _add_to_cart(self, product, quantity):
+        CartItemCreateService().cart_item_create(
+            cart_id=self.cart.id,
+            data={"product_id": product.id, "quantity": {"quantity": quantity}},
+        )
+
+    def test_availability_of_many_products_is_one_query(self):
+        self._add_to_cart(self.water, 4)
+        missing_id = uuid.uuid4()
+
+        with self.assertNumQueries(1):
+            response = self._get(self.tea.id, missing_id, self.water.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["products"],
+            [
+                {"id": str(self.tea.id), "price": "5.00", "available_quantity": 3},
+                {"id": str(self.water.id), "price": "1.99", "available_quantity": 6},
+            ],
+        )
+        self.assertEqual(response.data["not_found"], [str(missing_id)])
+
+    def test_cached_products_dont_query_the_database(self):
+        self._get(self.water.id)
+
+        with self.assertNumQueries(1):
+            response = self._get(self.water.id, self.tea.id)
+
+        self.assertEqual(len(response.data["products"]), 2)
+        with self.assertNumQueries(0):
+            self._get(self.tea.id, self.water.id)
+
+    def test_stock_writes_invalidate_cached_products(self):
+        self._get(self.water.id, self.tea.id)
+
+        self._add_to_cart(self.water, 4)
+
+        with self.assertNumQueries(1):
+            response = self._get(self.water.id, self.tea.id)
+        self.assertEqual(response.data["products"][0]["available_quantity"], 6)
+
+    def test_released_reservations_invalidate_cached_products(self):
+        self._add_to_cart(self.water, 4)
+        self._get(self.water.id)
+
+        StockReservation.objects.update(
+            expires_at=datetime(2000, 1, 1, tzinfo=timezone.utc)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            StockReservationService().release_expired()
+
+        response = self._get(self.water.id)
+        self.assertEqual(response.data["products"][0]["available_quantity"], 10)
+
+    def test_invalid_ids_return_400(self):
+        response = self._get("not-an-id")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PRODUCT_AVAILABILITY_MAX_IDS=1)
+    def test_too_many_ids_return_400(self):
+        response = self._get(self.water.id, self.tea.id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestAnonymousCartViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(username="customer", password="pass")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        image = ContentFile(image_file.getvalue(), name=image_file.name)
+        cls.water, cls.tea = [
+            Product.objects.create(
+                name=name,
+                price=price,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=quantity),
+                product_image=image,
+            )
+            for name, price, quantity in (("Water", "1.99", 10), ("Tea", "5.00", 3))
+        ]
+        cls.anonymous_cart_url = reverse("orders:anonymous-cart")
+
+    def setUp(self):
+        cache.clear()
+        caches["carts"].clear()
+
+    def _apply(self, *operations):
+        return self.client.post(
+            self.anonymous_cart_url,
+            {
+                "operations": [
+                    {
+                        "operation": operation,
+                        "product_id": product.id,
+                        "quantity": quantity,
+                    }
+                    for operation, product, quantity in operations
+                ]
+            },
+            format="json",
+        )
+
+    def test_anonymous_user_can_fill_cart(self):
+        response = self._apply(("add", self.water, 2), ("add", self.tea, 1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(settings.ANONYMOUS_CART_COOKIE_NAME, response.cookies)
+
+        self._apply(("add", self.water, 1))
+        response = self.client.get(self.anonymous_cart_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {
+                item["product_name"]: item["quantity"]
+                for item in response.data["cart_items"]
+            },
+            {"Water": 3, "Tea": 1},
+        )
+        self.assertEqual(response.data["total"], Decimal("10.97"))
+        self.assertFalse(Cart.objects.exists())
+
+    def test_anonymous_cart_without_cookie_is_empty(self):
+        response = self.client.get(self.anonymous_cart_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"cart_items": [], "total": 0})
+
+    def test_tampered_cookie_starts_new_cart(self):
+        self._apply(("add", self.water, 2))
+        self.client.cookies[settings.ANONYMOUS_CART_COOKIE_NAME] = "forged"
+
+        response = self.client.get(self.anonymous_cart_url)
+        self.assertEqual(response.data["cart_items"], [])
+
+    def test_anonymous_cart_validates_stock(self):
+        with self.assertRaises(MaxQuantityExceededException):
+            self._apply(("add", self.tea, 4))
+
+    def test_login_merges_anonymous_cart(self):
+        self._apply(("add", self.water, 2), ("add", self.tea, 1))
+
+        # the cached cart is dropped once the merge commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("rest_framework:login"),
+                {"username": "customer", "password": "pass"},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+        cart = Cart.objects.get(user=self.customer_profile)
+        self.assertEqual(
+            dict(cart.cart_items.values_list("product_id", "quantity")),
+            {self.water.id: 2, self.tea.id: 1},
+        )
+        response = self.client.get(self.anonymous_cart_url)
+        self.assertEqual(response.data["cart_items"], [])
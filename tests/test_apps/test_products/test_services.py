@@ -1,20 +1,63 @@
+import csv
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from PIL import Image
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.utils import timezone
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError
 
 from src.apps.products.models import (
+    InventoryMovement,
+    InventoryMovementKind,
     Product,
     ProductInventory,
     ProductCategory,
+    ThumbnailStatus,
+    StoredFile,
 )
 from src.apps.products.services.product_category_service import (
     ProductCategoryCreateService,
+    ProductCategoryMoveService,
     ProductCategoryUpdateService,
 )
 from src.apps.products.services.product_service import (
     ProductCreateService,
     ProductUpdateService,
 )
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+from src.apps.products.services.product_bulk_update_service import (
+    ProductBulkUpdateService,
+)
+from src.apps.products.services.product_export_service import (
+    ProductExportService,
+)
+from src.apps.products.services.product_thumbnail_service import (
+    ProductThumbnailService,
+)
+from src.apps.products.image_cache import ResizedImageDiskCache
+from src.apps.products.services.product_image_service import (
+    ProductImageResizeService,
+)
+from src.apps.products.services.product_import_service import (
+    ProductImportService,
+)
 from src.apps.products.utils import generate_image_file
 
 User = get_user_model()
@@ -46,6 +89,128 @@ class TestCategoryService(TestCase):
         self.assertEqual(ProductCategory.objects.all().count(), 1)
 
 
+class TestCategoryTreeService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_service = ProductCategoryCreateService()
+        cls.electronics = cls.create_service.create_category({"name": "Electronics"})
+        cls.computers = cls.create_service.create_category(
+            {"name": "Computers", "parent_id": cls.electronics.id}
+        )
+        cls.laptops = cls.create_service.create_category(
+            {"name": "Laptops", "parent_id": cls.computers.id}
+        )
+        cls.home = cls.create_service.create_category({"name": "Home"})
+
+    def test_category_path_contains_its_ancestors(self):
+        self.assertEqual(
+            self.laptops.path,
+            f"{self.electronics.id.hex}/{self.computers.id.hex}/{self.laptops.id.hex}/",
+        )
+        self.assertEqual(
+            list(self.laptops.get_ancestors()), [self.electronics, self.computers]
+        )
+        self.assertEqual(
+            list(self.electronics.get_descendants()), [self.computers, self.laptops]
+        )
+
+    def test_creating_category_under_missing_parent_fails(self):
+        with self.assertRaises(ValidationError):
+            self.create_service.create_category(
+                {"name": "Phones", "parent_id": uuid.uuid4()}
+            )
+
+    def test_moving_category_moves_its_subtree(self):
+        ProductCategoryUpdateService().update_category(
+            {"name": "Computers", "parent_id": self.home.id}, self.computers
+        )
+
+        self.laptops.refresh_from_db()
+        self.assertEqual(
+            list(self.laptops.get_ancestors()), [self.home, self.computers]
+        )
+        self.assertEqual(list(self.electronics.get_descendants()), [])
+        self.assertEqual(
+            list(self.home.get_descendants()), [self.computers, self.laptops]
+        )
+
+    def test_category_can_be_moved_to_root(self):
+        computers = ProductCategoryMoveService().move_category(self.computers, None)
+
+        self.assertIsNone(computers.parent)
+        self.laptops.refresh_from_db()
+        self.assertEqual(list(self.laptops.get_ancestors()), [self.computers])
+
+    def test_category_cannot_be_moved_into_its_subtree(self):
+        for parent in (self.laptops, self.computers):
+            with self.subTest(parent=parent.name):
+                with self.assertRaises(ValidationError):
+                    ProductCategoryMoveService().move_category(self.computers, parent)
+
+        self.laptops.refresh_from_db()
+        self.assertEqual(
+            list(self.laptops.get_ancestors()), [self.electronics, self.computers]
+        )
+
+
+class TestConcurrentCategoryMove(TransactionTestCase):
+    def setUp(self):
+        create_service = ProductCategoryCreateService()
+        self.electronics = create_service.create_category({"name": "Electronics"})
+        self.computers = create_service.create_category(
+            {"name": "Computers", "parent_id": self.electronics.id}
+        )
+        self.laptops = create_service.create_category(
+            {"name": "Laptops", "parent_id": self.computers.id}
+        )
+        self.home = create_service.create_category({"name": "Home"})
+
+    def _move(self, moved, results):
+        try:
+            with transaction.atomic():
+                ProductCategoryMoveService().move_category(self.computers, self.home)
+                moved.set()
+                # the create starts while the move is still uncommitted
+                time.sleep(0.5)
+        except Exception as exception:
+            results.append(exception)
+        finally:
+            moved.set()
+            connection.close()
+
+    def _create(self, moved, results):
+        try:
+            moved.wait()
+            results.append(
+                ProductCategoryCreateService().create_category(
+                    {"name": "Gaming laptops", "parent_id": self.laptops.id}
+                )
+            )
+        except Exception as exception:
+            results.append(exception)
+        finally:
+            connection.close()
+
+    def test_category_created_during_a_move_gets_the_new_path(self):
+        moved = threading.Event()
+        results = []
+        threads = [
+            threading.Thread(target=self._move, args=(moved, results)),
+            threading.Thread(target=self._create, args=(moved, results)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 1, results)
+        gaming_laptops = ProductCategory.objects.get(pk=results[0].pk)
+        self.assertEqual(
+            list(gaming_laptops.get_ancestors()),
+            [self.home, self.computers, self.laptops],
+        )
+
+
 class TestProductService(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -92,10 +257,748 @@ class TestProductService(TestCase):
 
         self.assertEqual(Product.objects.get(id=product.id), updated_product)
         self.assertEqual(
-            Product.objects.get(id=updated_product.id).inventory.quantity,
+            Product.objects.get(id=updated_product.id).inventory.current_quantity,
             inventory_data["quantity"],
         )
         self.assertEqual(
             Product.objects.get(id=updated_product.id).price,
             self.updated_product_data["price"],
         )
+
+
+class TestInventoryLedgerService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = InventoryLedgerService()
+        image_file = generate_image_file()
+        cls.product = ProductCreateService().product_create(
+            {
+                "name": "water",
+                "price": 2.00,
+                "description": "still",
+                "product_image": ContentFile(image_file.getvalue(), name="test.png"),
+                "category_id": ProductCategory.objects.create(name="drinks").id,
+                "inventory": {"quantity": 10},
+            }
+        )
+        cls.inventory = cls.product.inventory
+
+    def _sell(self, quantity: int) -> None:
+        with transaction.atomic():
+            self.service.lock_inventories([self.product.id])
+            self.service.record(
+                [
+                    InventoryMovement(
+                        inventory=self.inventory,
+                        kind=InventoryMovementKind.SALE,
+                        quantity=-quantity,
+                    )
+                ]
+            )
+
+    def _stock(self) -> int:
+        return self.service.get_stock_quantities([self.inventory.id])[self.inventory.id]
+
+    def test_created_stock_is_recorded_without_updating_the_snapshot(self):
+        movement = InventoryMovement.objects.get(inventory=self.inventory)
+        self.assertEqual(
+            (movement.kind, movement.quantity), (InventoryMovementKind.RESTOCK, 10)
+        )
+        inventory = ProductInventory.objects.get(pk=self.inventory.pk)
+        self.assertEqual((inventory.quantity, inventory.snapshot_movement_id), (0, 0))
+        self.assertEqual(inventory.current_quantity, 10)
+
+    def test_stock_adds_movements_after_the_snapshot(self):
+        self.service.compact()
+        self._sell(3)
+        self._sell(2)
+
+        self.assertEqual(
+            ProductInventory.objects.get(pk=self.inventory.pk).quantity, 10
+        )
+        self.assertEqual(self._stock(), 5)
+
+    def test_compaction_folds_movements_into_the_snapshot(self):
+        self._sell(3)
+
+        self.assertEqual(self.service.compact(), 1)
+        self.assertEqual(self.service.compact(), 0)
+
+        inventory = ProductInventory.objects.get(pk=self.inventory.pk)
+        self.assertEqual(inventory.quantity, 7)
+        self.assertEqual(
+            inventory.snapshot_movement_id, InventoryMovement.objects.latest("id").id
+        )
+        self.assertEqual(self._stock(), 7)
+
+    def test_seller_update_records_adjustment_against_current_stock(self):
+        self._sell(3)
+
+        ProductUpdateService().product_update(
+            request_data={"inventory": {"quantity": 12}}, instance=self.product
+        )
+
+        adjustment = InventoryMovement.objects.latest("id")
+        self.assertEqual(
+            (adjustment.kind, adjustment.quantity),
+            (InventoryMovementKind.ADJUSTMENT, 5),
+        )
+        self.assertEqual(
+            ProductInventory.objects.get(pk=self.inventory.pk).current_quantity, 12
+        )
+
+    def test_update_without_quantity_keeps_pending_sales(self):
+        self._sell(3)
+
+        ProductUpdateService().product_update(
+            request_data={"price": 3.00, "inventory": {}}, instance=self.product
+        )
+
+        self.assertEqual(self._stock(), 7)
+
+
+class TestProductImportService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drinks = ProductCategory.objects.create(name="drinks")
+        cls.food = ProductCategory.objects.create(name="food")
+
+        cls.csv_data = (
+            "sku,name,price,description,category,quantity\n"
+            "D-1,orange juice,4.50,fresh,drinks,10\n"
+            "D-2,apple juice,3,,drinks,5\n"
+            "F-1,burger,12.99,beef,food,7\n"
+        ).encode("utf-8")
+
+    def test_import_service_creates_products_from_csv(self):
+        service = ProductImportService()
+        result = service.import_products(
+            service.parse_rows(BytesIO(self.csv_data), "csv")
+        )
+
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(ProductInventory.objects.count(), 3)
+
+        product = Product.objects.get(sku="D-2")
+        self.assertEqual(product.category, self.drinks)
+        self.assertEqual(product.inventory.current_quantity, 5)
+        self.assertIsNone(product.description)
+        self.assertIsNotNone(product.updated_at)
+
+    def test_import_service_creates_products_from_ndjson(self):
+        ndjson_data = (
+            b'{"sku": "D-1", "name": "water", "price": "1.20", '
+            b'"category": "drinks", "quantity": 3}\n'
+            b"\n"
+            b'{"sku": "F-1", "name": "pizza", "price": 20, '
+            b'"category": "food", "quantity": 4}\n'
+        )
+        service = ProductImportService()
+        result = service.import_products(
+            service.parse_rows(BytesIO(ndjson_data), "ndjson")
+        )
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(Product.objects.get(sku="D-1").name, "water")
+
+    def test_import_service_skips_unchanged_and_updates_changed_rows(self):
+        service = ProductImportService()
+        service.import_products(service.parse_rows(BytesIO(self.csv_data), "csv"))
+
+        changed_data = self.csv_data.replace(b"burger,12.99", b"burger,13.99")
+        service = ProductImportService()
+        # the quantities are locked, read and recorded once per chunk
+        with self.assertNumQueries(7):
+            result = service.import_products(
+                service.parse_rows(BytesIO(changed_data), "csv")
+            )
+
+        self.assertEqual((result.created, result.updated, result.skipped), (0, 1, 2))
+        product = Product.objects.get(sku="F-1")
+        self.assertEqual(str(product.price), "13.99")
+
+    def test_import_service_reports_row_errors_without_aborting(self):
+        invalid_data = (
+            "sku,name,price,description,category,quantity\n"
+            "D-1,orange juice,4.50,fresh,drinks,10\n"
+            "D-2,apple juice,not a price,,drinks,5\n"
+            "X-1,unknown,1,,unknown,5\n"
+            "D-1,duplicated,1,,drinks,5\n"
+            "F-1,burger,12.99,beef,food,7\n"
+        ).encode("utf-8")
+        service = ProductImportService(chunk_size=2)
+        result = service.import_products(
+            service.parse_rows(BytesIO(invalid_data), "csv")
+        )
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([error["row"] for error in result.errors], [2, 3, 4])
+        self.assertIn("price", result.errors[0]["errors"])
+        self.assertIn("category", result.errors[1]["errors"])
+        self.assertIn("sku", result.errors[2]["errors"])
+        self.assertEqual(
+            set(Product.objects.values_list("sku", flat=True)), {"D-1", "F-1"}
+        )
+
+    def test_import_service_reports_invalid_json_lines(self):
+        ndjson_data = b'{"sku": "D-1", "name"\n[1, 2]\n'
+        service = ProductImportService()
+        result = service.import_products(
+            service.parse_rows(BytesIO(ndjson_data), "ndjson")
+        )
+
+        self.assertEqual(result.created, 0)
+        self.assertEqual([error["row"] for error in result.errors], [1, 2])
+
+    def test_import_service_stops_at_unreadable_row(self):
+        oversized_field = b"x" * (csv.field_size_limit() + 1)
+        ndjson_row = (
+            b'{"sku": "%s", "name": "water", "price": 1, '
+            b'"category": "drinks", "quantity": 3}\n'
+        )
+        for format, data in (
+            ("csv", self.csv_data.replace(b"burger", b"burg\xffer")),
+            ("csv", self.csv_data.replace(b"beef", oversized_field)),
+            ("ndjson", ndjson_row % b"D-1" + ndjson_row % b"D-2" + b"\xff\n"),
+        ):
+            with self.subTest(format=format):
+                Product.objects.all().delete()
+                service = ProductImportService(chunk_size=1)
+                result = service.import_products(
+                    service.parse_rows(BytesIO(data), format)
+                )
+
+                self.assertEqual(result.created, 2)
+                self.assertEqual([error["row"] for error in result.errors], [3])
+                self.assertIn("non_field_errors", result.errors[0]["errors"])
+                self.assertEqual(
+                    set(Product.objects.values_list("sku", flat=True)), {"D-1", "D-2"}
+                )
+
+    def test_import_products_command_reports_unreadable_row(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as import_file:
+            import_file.write(self.csv_data.replace(b"burger", b"burg\xffer"))
+            import_file.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                "import_products", import_file.name, stdout=stdout, stderr=stderr
+            )
+
+        self.assertIn("Row 3", stderr.getvalue())
+        self.assertIn("Created 2, updated 0, skipped 0, failed 1", stdout.getvalue())
+
+    def test_product_update_resets_import_hash(self):
+        service = ProductImportService()
+        service.import_products(service.parse_rows(BytesIO(self.csv_data), "csv"))
+        product = Product.objects.get(sku="D-1")
+        ProductUpdateService().product_update(
+            instance=product, request_data={"price": 5.00, "inventory": {}}
+        )
+
+        service = ProductImportService()
+        result = service.import_products(
+            service.parse_rows(BytesIO(self.csv_data), "csv")
+        )
+        self.assertEqual((result.updated, result.skipped), (1, 2))
+        self.assertEqual(str(Product.objects.get(sku="D-1").price), "4.50")
+
+    def test_import_products_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as import_file:
+            import_file.write(self.csv_data)
+            import_file.flush()
+            stdout = StringIO()
+            call_command("import_products", import_file.name, stdout=stdout)
+
+        self.assertIn("Created 3, updated 0, skipped 0, failed 0", stdout.getvalue())
+        self.assertEqual(Product.objects.count(), 3)
+
+
+class TestProductBulkUpdateService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = ProductBulkUpdateService()
+        cls.drinks = ProductCategory.objects.create(name="drinks")
+        cls.food = ProductCategory.objects.create(name="food")
+
+        image_file = generate_image_file()
+        cls.products = [
+            Product.objects.create(
+                name=name,
+                price=price,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=quantity),
+                product_image=ContentFile(image_file.getvalue(), name="test.png"),
+            )
+            for name, price, category, quantity in (
+                ("water", Decimal("2.00"), cls.drinks, 10),
+                ("juice", Decimal("4.99"), cls.drinks, 3),
+                ("burger", Decimal("12.00"), cls.food, 5),
+            )
+        ]
+
+    def _refreshed(self, product: Product) -> Product:
+        return Product.objects.select_related("inventory").get(id=product.id)
+
+    def test_bulk_update_service_updates_listed_products(self):
+        water, juice, _ = self.products
+        missing_id = uuid.uuid4()
+        # plus resetting the import hashes, locking, reading and recording
+        # the quantities
+        with self.assertNumQueries(8):
+            result = self.service.bulk_update(
+                request_data={
+                    "items": [
+                        {"id": water.id, "price": Decimal("2.50")},
+                        {"id": juice.id, "quantity": 0},
+                        {"id": missing_id, "price": Decimal("1.00")},
+                    ]
+                }
+            )
+
+        self.assertEqual(result.updated_prices, 1)
+        self.assertEqual(result.updated_quantities, 1)
+        self.assertEqual(result.not_found, [missing_id])
+        self.assertEqual(self._refreshed(water).price, Decimal("2.50"))
+        self.assertEqual(self._refreshed(juice).inventory.current_quantity, 0)
+        self.assertGreater(self._refreshed(water).updated_at, water.updated_at)
+
+    def test_bulk_update_service_increases_category_prices_by_percent(self):
+        water, juice, burger = self.products
+        result = self.service.bulk_update(
+            request_data={
+                "operations": [
+                    {
+                        "field": "price",
+                        "operation": "increase",
+                        "value": Decimal("5"),
+                        "unit": "percent",
+                        "category_id": self.drinks.id,
+                    }
+                ]
+            }
+        )
+
+        self.assertEqual(result.operations, [2])
+        self.assertEqual(self._refreshed(water).price, Decimal("2.10"))
+        self.assertEqual(self._refreshed(juice).price, Decimal("5.24"))
+        self.assertEqual(self._refreshed(burger).price, Decimal("12.00"))
+
+    def test_bulk_update_service_resets_import_hashes(self):
+        water, juice, burger = self.products
+        Product.objects.update(import_hash="imported")
+
+        self.service.bulk_update(
+            request_data={
+                "items": [{"id": water.id, "price": Decimal("2.50")}],
+                "operations": [
+                    {
+                        "field": "quantity",
+                        "operation": "increase",
+                        "value": Decimal("1"),
+                        "unit": "absolute",
+                        "product_ids": [juice.id],
+                    }
+                ],
+            }
+        )
+
+        self.assertEqual(
+            dict(Product.objects.values_list("id", "import_hash")),
+            {water.id: None, juice.id: None, burger.id: "imported"},
+        )
+
+    def test_bulk_update_service_scopes_category_to_its_subtree(self):
+        water, juice, burger = self.products
+        still_water = ProductCategory.objects.create(name="still", parent=self.drinks)
+        Product.objects.filter(id=water.id).update(category=still_water)
+
+        result = self.service.bulk_update(
+            request_data={
+                "operations": [
+                    {
+                        "field": "price",
+                        "operation": "set",
+                        "value": Decimal("1.00"),
+                        "unit": "absolute",
+                        "category_id": self.drinks.id,
+                    }
+                ]
+            }
+        )
+
+        self.assertEqual(result.operations, [2])
+        self.assertEqual(self._refreshed(water).price, Decimal("1.00"))
+        self.assertEqual(self._refreshed(burger).price, Decimal("12.00"))
+
+    def test_bulk_update_service_applies_quantity_operations(self):
+        water, juice, burger = self.products
+        result = self.service.bulk_update(
+            request_data={
+                "operations": [
+                    {
+                        "field": "quantity",
+                        "operation": "decrease",
+                        "value": Decimal("4"),
+                        "unit": "absolute",
+                        "product_ids": [water.id, juice.id],
+                    },
+                    {
+                        "field": "quantity",
+                        "operation": "set",
+                        "value": Decimal("50"),
+                        "unit": "absolute",
+                        "category_id": self.food.id,
+                    },
+                ]
+            }
+        )
+
+        self.assertEqual(result.operations, [2, 1])
+        self.assertEqual(self._refreshed(water).inventory.current_quantity, 6)
+        self.assertEqual(self._refreshed(juice).inventory.current_quantity, 0)
+        self.assertEqual(self._refreshed(burger).inventory.current_quantity, 50)
+
+    def test_bulk_update_service_rolls_back_on_price_overflow(self):
+        water, _, burger = self.products
+        with self.assertRaises(ValidationError):
+            self.service.bulk_update(
+                request_data={
+                    "items": [{"id": water.id, "price": Decimal("3.00")}],
+                    "operations": [
+                        {
+                            "field": "price",
+                            "operation": "increase",
+                            "value": Decimal("99999"),
+                            "unit": "absolute",
+                            "product_ids": [burger.id],
+                        }
+                    ],
+                }
+            )
+
+        self.assertEqual(self._refreshed(water).price, Decimal("2.00"))
+        self.assertEqual(self._refreshed(burger).price, Decimal("12.00"))
+
+
+class TestProductExportService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = ProductExportService(chunk_size=2)
+        cls.drinks = ProductCategory.objects.create(name="drinks")
+
+        csv_data = (
+            "sku,name,price,description,category,quantity\n"
+            "D-1,orange juice,4.50,fresh,drinks,10\n"
+            "D-2,apple juice,3,,drinks,5\n"
+            "D-3,water,1.20,,drinks,0\n"
+        ).encode("utf-8")
+        import_service = ProductImportService()
+        import_service.import_products(
+            import_service.parse_rows(BytesIO(csv_data), "csv")
+        )
+
+    def test_export_service_streams_csv_that_reimports_unchanged(self):
+        csv_data = "".join(self.service.export_products("csv"))
+
+        header, *lines = csv_data.splitlines()
+        self.assertEqual(header.split(","), list(self.service.EXPORT_COLUMNS))
+        self.assertEqual(len(lines), 3)
+
+        import_service = ProductImportService()
+        result = import_service.import_products(
+            import_service.parse_rows(BytesIO(csv_data.encode("utf-8")), "csv")
+        )
+        self.assertEqual((result.created, result.skipped), (0, 3))
+
+    def test_export_service_streams_ndjson(self):
+        with self.assertNumQueries(1):
+            rows = [json.loads(line) for line in self.service.export_products("ndjson")]
+
+        self.assertEqual(len(rows), 3)
+        row = next(row for row in rows if row["sku"] == "D-1")
+        self.assertEqual(row["category"], "drinks")
+        self.assertEqual(row["quantity"], 10)
+        self.assertEqual(row["price"], "4.50")
+
+    def test_export_service_filters_by_updated_since(self):
+        updated_since = timezone.now()
+        inventory = Product.objects.get(sku="D-2").inventory
+        inventory.quantity = 2
+        inventory.save()
+
+        rows = list(self.service.get_rows(updated_since=updated_since))
+        self.assertEqual([row["sku"] for row in rows], ["D-2"])
+
+    def test_export_products_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as export_file:
+            call_command("export_products", format="ndjson", output=export_file.name)
+            lines = export_file.read().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(
+            {json.loads(line)["sku"] for line in lines}, {"D-1", "D-2", "D-3"}
+        )
+
+    def test_export_products_command_resolves_image_urls(self):
+        image_file = generate_image_file()
+        product = Product.objects.get(sku="D-1")
+        product.product_image = ContentFile(image_file.getvalue(), name=image_file.name)
+        product.save()
+
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as export_file:
+            call_command(
+                "export_products",
+                format="ndjson",
+                output=export_file.name,
+                base_url="https://shop.example.com",
+            )
+            rows = {
+                row["sku"]: row
+                for row in map(json.loads, export_file.read().splitlines())
+            }
+
+        self.assertEqual(
+            rows["D-1"]["product_image"],
+            f"https://shop.example.com{product.product_image.url}",
+        )
+        self.assertIsNone(rows["D-1"]["product_thumbnail"])
+        self.assertIsNone(rows["D-2"]["product_image"])
+
+
+class TestProductThumbnailService(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = ProductThumbnailService(widths=[50, 400])
+        cls.category = ProductCategory.objects.create(name="fastfood")
+
+    def _image(self, format: str = "PNG", color: tuple = (155, 0, 0), **kwargs):
+        file = BytesIO()
+        Image.new("RGB", size=(1000, 500), color=color).save(file, format, **kwargs)
+        return ContentFile(file.getvalue(), name=f"test.{format.lower()}")
+
+    def _create_product(self, image: ContentFile) -> Product:
+        return Product.objects.create(
+            name="burger",
+            price=10,
+            category=self.category,
+            inventory=ProductInventory.objects.create(quantity=1),
+            product_image=image,
+        )
+
+    def test_new_image_is_queued_instead_of_resized(self):
+        product = self._create_product(self._image())
+
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.PENDING)
+        self.assertEqual(len(product.image_hash), 64)
+        self.assertFalse(product.product_thumbnail)
+
+    def test_process_pending_generates_all_sizes(self):
+        product = self._create_product(self._image())
+
+        self.assertEqual(self.service.process_pending(), 1)
+        self.assertEqual(self.service.process_pending(), 0)
+
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.READY)
+        self.assertEqual(set(product.thumbnails), {"50", "200", "400"})
+        with Image.open(product.product_thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.size, (200, 100))
+        with default_storage.open(product.thumbnails["50"]) as file:
+            self.assertEqual(Image.open(file).size, (50, 25))
+
+    def test_thumbnails_strip_image_metadata(self):
+        exif = Image.Exif()
+        exif[0x010E] = "secret description"
+        product = self._create_product(self._image("JPEG", exif=exif))
+        self.service.process_pending()
+
+        product.refresh_from_db()
+        with default_storage.open(product.thumbnails["400"]) as file:
+            self.assertNotIn("exif", Image.open(file).info)
+
+    def test_only_changed_image_content_queues_thumbnails(self):
+        product = self._create_product(self._image())
+        self.service.process_pending()
+        product.refresh_from_db()
+
+        product.product_image = self._image()
+        product.save()
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.READY)
+
+        product.product_image = self._image(color=(0, 155, 0))
+        product.save()
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.PENDING)
+
+    def test_unsupported_image_is_marked_failed(self):
+        product = self._create_product(self._image("BMP"))
+        self.service.process_pending()
+
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.FAILED)
+        self.assertEqual(product.thumbnails, {})
+
+    def _broken_images(self):
+        png = self._image().read()
+        yield ContentFile(png[: len(png) // 2], name="truncated.png")
+
+        # a valid header claiming far more pixels than Pillow decodes
+        header = struct.pack(">II", 20000, 20000) + png[24:29]
+        oversized = (
+            png[:16]
+            + header
+            + struct.pack(">I", zlib.crc32(b"IHDR" + header))
+            + png[33:]
+        )
+        yield ContentFile(oversized, name="oversized.png")
+
+    def test_broken_images_are_marked_failed(self):
+        products = [self._create_product(image) for image in self._broken_images()]
+
+        with self.assertLogs(
+            "src.apps.products.services.product_thumbnail_service", "ERROR"
+        ):
+            self.assertEqual(self.service.process_pending(), 2)
+
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.thumbnail_status, ThumbnailStatus.FAILED)
+
+    def test_missing_image_file_is_marked_failed(self):
+        # a color of its own, the file isn't shared with other tests
+        product = self._create_product(self._image(color=(1, 2, 3)))
+        Product.objects.filter(pk=product.pk).update(image_hash=None)
+        default_storage.delete(product.product_image.name)
+
+        with self.assertLogs(
+            "src.apps.products.services.product_thumbnail_service", "ERROR"
+        ):
+            self.assertEqual(self.service.process_pending(), 1)
+
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnail_status, ThumbnailStatus.FAILED)
+
+
+class TestResizedImageDiskCache(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ResizedImageDiskCache(directory=directory.name, max_size=25)
+
+    def _age(self, key: str, seconds: int) -> None:
+        path = os.path.join(self.cache.directory, key)
+        mtime = os.stat(path).st_mtime - seconds
+        os.utime(path, (mtime, mtime))
+
+    def test_disk_cache_returns_stored_content(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", b"content")
+        self.assertEqual(self.cache.get("a"), b"content")
+
+    def test_disk_cache_evicts_least_recently_used_files(self):
+        self.cache.set("a", b"0" * 10)
+        self._age("a", 30)
+        self.cache.set("b", b"0" * 10)
+        self._age("b", 20)
+        # reading refreshes "a", so "b" is the least recently used now
+        self.cache.get("a")
+        self.cache.set("c", b"0" * 10)
+
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+
+class TestProductImageResizeService(TestCase):
+    def test_negotiation_prefers_explicitly_accepted_formats(self):
+        negotiate = ProductImageResizeService.negotiate_media_type
+
+        self.assertEqual(negotiate("image/webp,image/*,*/*;q=0.8"), "image/webp")
+        self.assertEqual(negotiate("image/webp;q=0.5,image/jpeg"), "image/jpeg")
+        self.assertEqual(negotiate("*/*"), "image/jpeg")
+        self.assertEqual(negotiate(""), "image/jpeg")
+
+    def test_negotiation_skips_formats_pillow_cannot_encode(self):
+        supported = ProductImageResizeService.get_supported_media_types()
+        expected = "image/avif" if "image/avif" in supported else "image/webp"
+
+        self.assertEqual(
+            ProductImageResizeService.negotiate_media_type("image/avif,image/webp"),
+            expected,
+        )
+
+
+class TestContentAddressedProductFiles(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = ProductCategory.objects.create(name="fastfood")
+
+    def _image(self, color: tuple = (155, 0, 0)) -> ContentFile:
+        file = BytesIO()
+        Image.new("RGB", size=(600, 300), color=color).save(file, "PNG")
+        return ContentFile(file.getvalue(), name="uploaded.png")
+
+    def _create_product(self, image: ContentFile) -> Product:
+        return Product.objects.create(
+            name="burger",
+            price=10,
+            category=self.category,
+            inventory=ProductInventory.objects.create(quantity=1),
+            product_image=image,
+        )
+
+    def _reference_count(self, name: str) -> int:
+        stored_file = StoredFile.objects.filter(name=name).first()
+        return stored_file.reference_count if stored_file else 0
+
+    def test_same_image_is_stored_once(self):
+        first = self._create_product(self._image())
+        second = self._create_product(self._image())
+
+        self.assertEqual(first.product_image.name, second.product_image.name)
+        self.assertIn(first.image_hash, first.product_image.name)
+        self.assertTrue(first.product_image.name.startswith("products/"))
+        self.assertEqual(self._reference_count(first.product_image.name), 2)
+
+    def test_shared_file_outlives_deleted_product(self):
+        first = self._create_product(self._image((1, 2, 3)))
+        second = self._create_product(self._image((1, 2, 3)))
+        name = first.product_image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self._reference_count(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_releases_previous_file(self):
+        product = self._create_product(self._image((4, 5, 6)))
+        previous_name = product.product_image.name
+
+        product.product_image = self._image((7, 8, 9))
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        self.assertFalse(default_storage.exists(previous_name))
+        self.assertEqual(self._reference_count(product.product_image.name), 1)
+
+    def test_products_with_same_image_share_thumbnails(self):
+        service = ProductThumbnailService()
+        first = self._create_product(self._image())
+        service.process_pending()
+        second = self._create_product(self._image())
+
+        # the second product only copies the names, nothing is resized
+        with self.assertNumQueries(10):
+            service.process_pending()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.thumbnails, second.thumbnails)
+        for name in first.thumbnails.values():
+            self.assertEqual(self._reference_count(name), 2)
@@ -1,8 +1,21 @@
+import json
+import struct
+import tempfile
 import uuid
+import zlib
+from base64 import b64decode, b64encode
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -12,6 +25,16 @@ from src.apps.products.models import (
     ProductCategory,
     ProductInventory,
 )
+from src.apps.products.services.product_category_service import (
+    ProductCategoryCreateService,
+)
+from src.apps.products.services.inventory_ledger_service import (
+    InventoryLedgerService,
+)
+from src.apps.products.services.product_service import ProductUpdateService
+from src.apps.products.services.product_thumbnail_service import (
+    ProductThumbnailService,
+)
 from src.apps.products.utils import generate_image_file
 
 User = get_user_model()
@@ -166,6 +189,21 @@ class TestProductViews(APITestCase):
         response = self.client.get(self.product_detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_product_reports_thumbnail_status(self):
+        response = self.client.get(self.product_detail_url)
+        self.assertEqual(response.data["thumbnail_status"], "pending")
+        self.assertEqual(response.data["thumbnails"], {})
+
+        ProductThumbnailService().process_pending()
+
+        response = self.client.get(self.product_detail_url)
+        self.assertEqual(response.data["thumbnail_status"], "ready")
+        self.assertEqual(
+            set(response.data["thumbnails"]),
+            {str(width) for width in ProductThumbnailService().widths},
+        )
+        self.assertTrue(response.data["thumbnails"]["200"].startswith("http://"))
+
     def test_customer_cannot_create_product(self):
         response = self.client.post(self.product_list_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -180,3 +218,1188 @@ class TestProductViews(APITestCase):
         response = self.client.delete(self.product_detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Product.objects.exists())
+
+    def test_product_without_category_has_null_category_name(self):
+        Product.objects.filter(pk=self.product.pk).update(category=None)
+
+        response = self.client.get(self.product_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["results"][0]["category_name"])
+
+    def test_negative_inventory_quantity_is_rejected(self):
+        self.client.force_login(user=self.seller)
+        response = self.client.post(
+            self.product_list_url,
+            {
+                "name": "Juice",
+                "price": 2.99,
+                "category_id": self.product_category.id,
+                "inventory": {"quantity": -5},
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("quantity", response.data["inventory"])
+
+        response = self.client.put(
+            self.product_detail_url,
+            {"product": {}, "inventory": {"quantity": -5}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("quantity", response.data["inventory"])
+        self.assertEqual(self.product.inventory.current_quantity, 100)
+
+    def test_anonymous_user_can_retrieve_product(self):
+        self.client.logout()
+        response = self.client.get(self.product_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_anonymous_user_cannot_create_product(self):
+        self.client.logout()
+        response = self.client.post(self.product_list_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestProductCursorPaginationViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        for number in range(25):
+            Product.objects.create(
+                name=f"product {number}",
+                price=f"{number % 4}.99",
+                category=cls.product_category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=cls.image,
+            )
+
+        cls.product_list_url = reverse("products:product-list")
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def _walk_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data["next"]
+        return pages
+
+    def test_user_can_walk_products_with_cursor_pagination(self):
+        pages = self._walk_pages(f"{self.product_list_url}?pagination=cursor&o=price")
+        products = [product for page in pages for product in page["results"]]
+
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn("count", pages[0])
+        self.assertEqual(len({product["id"] for product in products}), 25)
+        expected = Product.objects.order_by("price", "id").values_list("id", flat=True)
+        self.assertEqual(
+            [uuid.UUID(product["id"]) for product in products], list(expected)
+        )
+
+    def test_user_can_go_back_with_previous_cursor(self):
+        first_page = self.client.get(
+            f"{self.product_list_url}?pagination=cursor&o=-price"
+        ).data
+        second_page = self.client.get(first_page["next"]).data
+        self.assertIsNone(first_page["previous"])
+
+        response = self.client.get(second_page["previous"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], first_page["results"])
+
+    def test_user_can_go_back_through_search_results(self):
+        for search in ("q=product", "name_similar=product"):
+            first_page = self.client.get(
+                f"{self.product_list_url}?pagination=cursor&{search}"
+            ).data
+            second_page = self.client.get(first_page["next"]).data
+
+            response = self.client.get(second_page["previous"])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["results"], first_page["results"])
+
+    def test_cursor_pagination_works_with_filters(self):
+        pages = self._walk_pages(
+            f"{self.product_list_url}?pagination=cursor&price=1.99&price_lookup=exact"
+        )
+        products = [product for page in pages for product in page["results"]]
+        self.assertEqual(len(products), Product.objects.filter(price="1.99").count())
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(f"{self.product_list_url}?cursor=invalid")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        next_link = self.client.get(
+            f"{self.product_list_url}?pagination=cursor&o=price"
+        ).data["next"]
+        cursor = json.loads(b64decode(parse_qs(urlparse(next_link).query)["cursor"][0]))
+        for position in (1, None, "price", {"price": 1}, [1], ["a", "b"], [{}, []]):
+            with self.subTest(position=position):
+                encoded = b64encode(json.dumps({**cursor, "p": position}).encode())
+                response = self.client.get(
+                    self.product_list_url, {"o": "price", "cursor": encoded.decode()}
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_is_still_default(self):
+        response = self.client.get(self.product_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 25)
+
+
+class TestProductSearchViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+
+        cls.drinks = ProductCategory.objects.create(name="Drinks")
+        cls.food = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+
+        def create_product(name, description, category):
+            return Product.objects.create(
+                name=name,
+                price="2.99",
+                description=description,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=cls.image,
+            )
+
+        cls.juice = create_product("Orange juice", "fresh squeezed", cls.drinks)
+        cls.soda = create_product("Soda", "tastes like oranges", cls.drinks)
+        cls.cake = create_product("Cake", "orange flavoured sponge", cls.food)
+        cls.water = create_product("Water", "still mineral water", cls.drinks)
+
+        cls.product_list_url = reverse("products:product-list")
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def test_user_can_search_products_by_name_and_description(self):
+        response = self.client.get(self.product_list_url, {"q": "orange"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+
+        product_ids = [uuid.UUID(product["id"]) for product in response.data["results"]]
+        self.assertNotIn(self.water.id, product_ids)
+        self.assertEqual(product_ids[0], self.juice.id)
+
+    def test_search_combines_with_category_filter(self):
+        response = self.client.get(
+            self.product_list_url, {"q": "orange", "category": self.food.name}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(uuid.UUID(response.data["results"][0]["id"]), self.cake.id)
+
+    def test_search_vector_is_refreshed_when_product_changes(self):
+        self.water.name = "Sparkling lemonade"
+        self.water.save()
+
+        response = self.client.get(self.product_list_url, {"q": "lemonade"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(uuid.UUID(response.data["results"][0]["id"]), self.water.id)
+
+    def test_user_can_find_products_by_misspelled_name(self):
+        response = self.client.get(
+            self.product_list_url, {"name_similar": "orange jiuce"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(uuid.UUID(response.data["results"][0]["id"]), self.juice.id)
+
+    def test_similar_names_are_ordered_by_similarity(self):
+        Product.objects.create(
+            name="Water melon",
+            price="4.99",
+            category=self.food,
+            inventory=ProductInventory.objects.create(quantity=10),
+            product_image=self.image,
+        )
+        response = self.client.get(self.product_list_url, {"name_similar": "watter"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        product_names = [product["name"] for product in response.data["results"]]
+        self.assertEqual(product_names, ["Water", "Water melon"])
+
+
+class TestProductCategoryTreeViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+
+        cls.electronics = ProductCategory.objects.create(name="Electronics")
+        cls.computers = ProductCategory.objects.create(
+            name="Computers", parent=cls.electronics
+        )
+        cls.laptops = ProductCategory.objects.create(
+            name="Laptops", parent=cls.computers
+        )
+        cls.food = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+
+        def create_product(name, category):
+            return Product.objects.create(
+                name=name,
+                price="2.99",
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=cls.image,
+            )
+
+        cls.radio = create_product("Radio", cls.electronics)
+        cls.laptop = create_product("Laptop", cls.laptops)
+        cls.cake = create_product("Cake", cls.food)
+
+        cls.product_list_url = reverse("products:product-list")
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def _get_product_ids(self, params):
+        response = self.client.get(self.product_list_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {uuid.UUID(product["id"]) for product in response.data["results"]}
+
+    def test_category_filter_matches_products_of_subcategories(self):
+        self.assertEqual(
+            self._get_product_ids({"category": "Electronics"}),
+            {self.radio.id, self.laptop.id},
+        )
+        self.assertEqual(
+            self._get_product_ids({"category": "Computers"}), {self.laptop.id}
+        )
+        self.assertEqual(
+            self._get_product_ids({"category": ["Laptops", "Food"]}),
+            {self.laptop.id, self.cake.id},
+        )
+
+    def test_category_filter_is_a_single_product_query(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.product_list_url, {"category": "Electronics"})
+
+        product_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if 'FROM "products_product"' in query["sql"]
+        ]
+        # the count and the page
+        self.assertEqual(len(product_queries), 2)
+        self.assertIn(f"LIKE '{self.electronics.path}%'", product_queries[-1])
+
+    def test_user_can_retrieve_category_ancestors(self):
+        response = self.client.get(
+            reverse("products:category-ancestors", kwargs={"pk": self.laptops.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [category["name"] for category in response.data["results"]],
+            ["Electronics", "Computers"],
+        )
+
+    def test_user_can_retrieve_category_descendants(self):
+        response = self.client.get(
+            reverse("products:category-descendants", kwargs={"pk": self.electronics.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (category["name"], category["parent"])
+                for category in response.data["results"]
+            ],
+            [("Computers", self.electronics.id), ("Laptops", self.computers.id)],
+        )
+
+    def test_descendants_of_missing_category_are_not_found(self):
+        response = self.client.get(
+            reverse("products:category-descendants", kwargs={"pk": uuid.uuid4()})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_staff_can_move_category(self):
+        self.client.force_login(user=self.staff)
+        response = self.client.put(
+            reverse("products:category-detail", kwargs={"pk": self.computers.id}),
+            {"name": "Computers", "parent_id": str(self.food.id)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["parent"], self.food.id)
+        self.assertEqual(
+            self._get_product_ids({"category": "Food"}),
+            {self.laptop.id, self.cake.id},
+        )
+
+    def test_staff_cannot_move_category_into_its_subtree(self):
+        self.client.force_login(user=self.staff)
+        response = self.client.put(
+            reverse("products:category-detail", kwargs={"pk": self.electronics.id}),
+            {"name": "Electronics", "parent_id": str(self.laptops.id)},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("parent_id", response.data)
+
+    def test_staff_cannot_delete_category_with_subcategories(self):
+        self.client.force_login(user=self.staff)
+        response = self.client.delete(
+            reverse("products:category-detail", kwargs={"pk": self.computers.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ProductCategory.objects.filter(id=self.computers.id).exists())
+
+
+class TestProductFacetsViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drinks = ProductCategory.objects.create(name="Drinks")
+        cls.food = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        for name, price, category in [
+            ("Water", "1.99", cls.drinks),
+            ("Orange juice", "12.50", cls.drinks),
+            ("Wine", "60.00", cls.drinks),
+            ("Cake", "8.00", cls.food),
+            ("Bread", "3.20", cls.food),
+        ]:
+            Product.objects.create(
+                name=name,
+                price=price,
+                category=category,
+                inventory=ProductInventory.objects.create(quantity=10),
+                product_image=cls.image,
+            )
+
+        cls.product_facets_url = reverse("products:product-facets")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_user_can_retrieve_facets(self):
+        response = self.client.get(self.product_facets_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        categories = {
+            category["name"]: category["count"]
+            for category in response.data["categories"]
+        }
+        self.assertEqual(categories, {"Drinks": 3, "Food": 2})
+        price_buckets = response.data["price_buckets"]
+        self.assertEqual(price_buckets[0]["count"], 3)
+        self.assertEqual(price_buckets[1]["count"], 1)
+        self.assertEqual(sum(bucket["count"] for bucket in price_buckets), 5)
+
+    def test_facets_apply_product_filter_and_custom_price_buckets(self):
+        response = self.client.get(
+            self.product_facets_url,
+            {"category": self.drinks.name, "price_buckets": "0,50"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(response.data["categories"]), 1)
+        self.assertEqual(response.data["categories"][0]["count"], 3)
+        self.assertEqual(
+            [bucket["count"] for bucket in response.data["price_buckets"]], [2, 1]
+        )
+        self.assertIsNone(response.data["price_buckets"][-1]["max"])
+
+    def test_facets_reject_invalid_price_buckets(self):
+        for price_buckets in (
+            "a,b",
+            "0,Infinity",
+            "0,-inf",
+            "NaN",
+            "0,sNaN",
+            ",".join(str(bound) for bound in range(51)),
+        ):
+            with self.subTest(price_buckets=price_buckets[:20]):
+                response = self.client.get(
+                    self.product_facets_url, {"price_buckets": price_buckets}
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets_are_cached_until_products_change(self):
+        self.client.get(self.product_facets_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.product_facets_url)
+
+        Product.objects.create(
+            name="Milk",
+            price="2.50",
+            category=self.food,
+            inventory=ProductInventory.objects.create(quantity=10),
+            product_image=self.image,
+        )
+        response = self.client.get(self.product_facets_url)
+        categories = {
+            category["name"]: category["count"]
+            for category in response.data["categories"]
+        }
+        self.assertEqual(categories["Food"], 3)
+
+
+class TestProductViewsQueryCount(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        cls.product = cls._create_product(0)
+
+        cls.product_list_url = reverse("products:product-list")
+        cls.product_detail_url = reverse(
+            "products:product-detail", kwargs={"pk": cls.product.id}
+        )
+
+    @classmethod
+    def _create_product(cls, number):
+        return Product.objects.create(
+            name=f"product {number}",
+            price="9.99",
+            category=ProductCategory.objects.create(name=f"category {number}"),
+            inventory=ProductInventory.objects.create(quantity=10),
+            product_image=cls.image,
+        )
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_product_list_query_count_does_not_depend_on_page_size(self):
+        single_product_queries = self._count_queries(self.product_list_url)
+        for number in range(1, 10):
+            self._create_product(number)
+
+        response = self.client.get(self.product_list_url)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(
+            self._count_queries(self.product_list_url), single_product_queries
+        )
+
+    def test_product_detail_loads_category_and_inventory_with_product(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.product_detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        relation_queries = [
+            query
+            for query in context.captured_queries
+            if 'FROM "products_productcategory"' in query["sql"]
+            or 'FROM "products_productinventory"' in query["sql"]
+        ]
+        self.assertEqual(relation_queries, [])
+        self.assertEqual(response.data["category"]["name"], "category 0")
+        self.assertEqual(response.data["inventory"]["quantity"], 10)
+
+
+class TestProductFieldSelectionViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        cls.product = cls._create_product(0)
+
+        cls.product_list_url = reverse("products:product-list")
+        cls.product_detail_url = reverse(
+            "products:product-detail", kwargs={"pk": cls.product.id}
+        )
+
+    @classmethod
+    def _create_product(cls, number):
+        return Product.objects.create(
+            name=f"product {number}",
+            price="9.99",
+            description=f"description {number}",
+            category=ProductCategory.objects.create(name=f"category {number}"),
+            inventory=ProductInventory.objects.create(quantity=10),
+            product_image=cls.image,
+        )
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def _get_product_queries(self, url, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if 'FROM "products_product"' in query["sql"]
+        ]
+        return response, queries
+
+    def test_product_list_renders_and_loads_only_requested_fields(self):
+        response, queries = self._get_product_queries(
+            self.product_list_url, {"fields": "id,name"}
+        )
+
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+        self.assertNotIn('"products_product"."description"', queries[-1])
+        self.assertNotIn("JOIN", queries[-1])
+
+    def test_product_list_expands_category_and_inventory_in_one_query(self):
+        for number in range(1, 5):
+            self._create_product(number)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                self.product_list_url,
+                {"fields": "id,category,inventory", "expand": "category,inventory"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = {product["id"]: product for product in response.data["results"]}
+        self.assertEqual(len(results), 5)
+        product_data = results[str(self.product.id)]
+        self.assertEqual(
+            product_data["category"],
+            {"id": str(self.product.category.id), "name": "category 0", "parent": None},
+        )
+        self.assertEqual(product_data["inventory"]["quantity"], 10)
+        self.assertEqual(
+            [
+                query
+                for query in context.captured_queries
+                if 'FROM "products_productcategory"' in query["sql"]
+                or 'FROM "products_productinventory"' in query["sql"]
+            ],
+            [],
+        )
+
+    def test_product_detail_renders_only_requested_fields(self):
+        response, queries = self._get_product_queries(
+            self.product_detail_url, {"fields": "id,inventory,resized_images"}
+        )
+
+        self.assertEqual(set(response.data), {"id", "inventory", "resized_images"})
+        self.assertEqual(response.data["inventory"]["quantity"], 10)
+        self.assertTrue(response.data["resized_images"])
+        self.assertNotIn('"products_product"."name"', queries[-1])
+        self.assertNotIn('"products_productcategory"', queries[-1])
+
+    def test_product_detail_etag_depends_on_selected_fields(self):
+        response = self.client.get(self.product_detail_url)
+        etag = response["ETag"]
+
+        response = self.client.get(
+            self.product_detail_url, {"fields": "id"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id"})
+
+    def test_unknown_fields_return_bad_request(self):
+        response = self.client.get(self.product_list_url, {"fields": "id,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", response.data)
+
+        response = self.client.get(self.product_detail_url, {"expand": "name"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expand", response.data)
+
+
+class TestCatalogResponseCacheViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.admin = User.objects.create(username="admin", is_staff=True)
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        cls.product = Product.objects.create(
+            name="Water",
+            price="1.99",
+            category=cls.product_category,
+            inventory=ProductInventory.objects.create(quantity=100),
+            product_image=cls.image,
+        )
+
+        cls.product_list_url = reverse("products:product-list")
+        cls.product_detail_url = reverse(
+            "products:product-detail", kwargs={"pk": cls.product.id}
+        )
+        cls.product_category_list_url = reverse("products:category-list")
+        cls.cache_stats_url = reverse("products:catalog-cache-stats")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_product_reads_are_served_from_cache(self):
+        for url in (self.product_list_url, self.product_detail_url):
+            response = self.client.get(url, {"o": "price"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["X-Cache"], "MISS")
+
+            with self.assertNumQueries(0):
+                cached_response = self.client.get(url, {"o": "price"})
+            self.assertEqual(cached_response["X-Cache"], "HIT")
+            self.assertEqual(cached_response.json(), response.json())
+
+    def test_cached_product_detail_answers_conditional_requests(self):
+        etag = self.client.get(self.product_detail_url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_authenticated_reads_bypass_cache(self):
+        self.client.force_login(user=self.customer)
+        self.client.get(self.product_list_url)
+        response = self.client.get(self.product_list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Cache", response)
+
+    def test_product_update_invalidates_cached_responses(self):
+        self.client.get(self.product_detail_url)
+        ProductUpdateService().product_update(
+            request_data={"price": 5.49, "inventory": {"quantity": 10}},
+            instance=self.product,
+        )
+
+        response = self.client.get(self.product_detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["price"], "5.49")
+        self.assertEqual(response.data["inventory"]["quantity"], 10)
+
+    def test_stock_change_only_invalidates_responses_showing_stock(self):
+        expanded = {"expand": "inventory"}
+        for url, params in (
+            (self.product_list_url, {}),
+            (self.product_list_url, expanded),
+            (self.product_detail_url, {}),
+            (self.product_category_list_url, {}),
+        ):
+            self.client.get(url, params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryLedgerService().set_quantities({self.product.inventory_id: 7})
+
+        self.assertEqual(self.client.get(self.product_list_url)["X-Cache"], "HIT")
+        self.assertEqual(
+            self.client.get(self.product_category_list_url)["X-Cache"], "HIT"
+        )
+        response = self.client.get(self.product_list_url, expanded)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["inventory"]["quantity"], 7)
+        response = self.client.get(self.product_detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["inventory"]["quantity"], 7)
+
+    def test_category_create_invalidates_cached_category_list(self):
+        self.client.get(self.product_category_list_url)
+        ProductCategoryCreateService().create_category(request_data={"name": "Drinks"})
+
+        response = self.client.get(self.product_category_list_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["count"], 2)
+
+    def test_admin_can_retrieve_cache_stats(self):
+        self.client.get(self.product_list_url)
+        self.client.get(self.product_list_url)
+        self.client.get(self.product_list_url, {"o": "name"})
+
+        self.client.force_login(user=self.admin)
+        response = self.client.get(self.cache_stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"hits": 1, "misses": 2})
+
+    def test_customer_cannot_retrieve_cache_stats(self):
+        self.client.force_login(user=self.customer)
+        response = self.client.get(self.cache_stats_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestProductConditionalViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        file = generate_image_file()
+        cls.image = ContentFile(file.getvalue(), name=file.name)
+        cls.product = Product.objects.create(
+            name="Water",
+            price="1.99",
+            category=cls.product_category,
+            inventory=ProductInventory.objects.create(quantity=100),
+            product_image=cls.image,
+        )
+        cls.product_detail_url = reverse(
+            "products:product-detail", kwargs={"pk": cls.product.id}
+        )
+
+    def setUp(self):
+        self.client.force_login(user=self.customer)
+
+    def test_product_detail_returns_validators(self):
+        response = self.client.get(self.product_detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+    def test_matching_etag_returns_not_modified_without_loading_product(self):
+        etag = self.client.get(self.product_detail_url)["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        product_queries = [
+            query for query in context.captured_queries if "products_" in query["sql"]
+        ]
+        self.assertEqual(len(product_queries), 1)
+
+    def test_matching_last_modified_returns_not_modified(self):
+        last_modified = self.client.get(self.product_detail_url)["Last-Modified"]
+        response = self.client.get(
+            self.product_detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_when_inventory_changes(self):
+        etag = self.client.get(self.product_detail_url)["ETag"]
+        self.product.inventory.quantity = 50
+        self.product.inventory.save()
+
+        response = self.client.get(self.product_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["inventory"]["quantity"], 50)
+
+
+class TestProductImportViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.seller = User.objects.create(username="seller")
+
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.seller_profile = UserProfile.objects.create(
+            user=cls.seller,
+            username=cls.seller.username,
+            role="seller",
+            email="seller@mail.com",
+            phone_number="+48456456456",
+        )
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        cls.product_import_url = reverse("products:product-import")
+        cls.ndjson_data = (
+            b'{"sku": "F-1", "name": "burger", "price": "12.99", '
+            b'"category": "Food", "quantity": 7}\n'
+            b'{"sku": "F-2", "name": "pizza", "price": "-1", '
+            b'"category": "Food", "quantity": 7}\n'
+        )
+
+    def setUp(self):
+        self.client.force_login(user=self.seller)
+
+    def test_seller_can_import_products(self):
+        response = self.client.post(
+            self.product_import_url,
+            {"file": SimpleUploadedFile("products.ndjson", self.ndjson_data)},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+        self.assertEqual(response.data["errors"][0]["sku"], "F-2")
+        self.assertIn("price", response.data["errors"][0]["errors"])
+        self.assertEqual(Product.objects.get(sku="F-1").name, "burger")
+
+    def test_reimport_skips_unchanged_products(self):
+        for _ in range(2):
+            response = self.client.post(
+                self.product_import_url,
+                {
+                    "file": SimpleUploadedFile("products.txt", self.ndjson_data),
+                    "format": "ndjson",
+                },
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(response.data["skipped"], 1)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_import_stops_at_unreadable_row(self):
+        response = self.client.post(
+            self.product_import_url,
+            {"file": SimpleUploadedFile("products.ndjson", self.ndjson_data + b"\xff")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertIn("non_field_errors", response.data["errors"][1]["errors"])
+
+    def test_customer_cannot_import_products(self):
+        self.client.force_login(user=self.customer)
+        response = self.client.post(
+            self.product_import_url,
+            {"file": SimpleUploadedFile("products.ndjson", self.ndjson_data)},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Product.objects.exists())
+
+
+class TestProductBulkUpdateViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.seller = User.objects.create(username="seller")
+
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.seller_profile = UserProfile.objects.create(
+            user=cls.seller,
+            username=cls.seller.username,
+            role="seller",
+            email="seller@mail.com",
+            phone_number="+48456456456",
+        )
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        cls.product = Product.objects.create(
+            name="burger",
+            price=10,
+            category=cls.product_category,
+            inventory=ProductInventory.objects.create(quantity=5),
+            product_image=ContentFile(image_file.getvalue(), name=image_file.name),
+        )
+        cls.product_bulk_update_url = reverse("products:product-bulk-update")
+
+    def setUp(self):
+        self.client.force_login(user=self.seller)
+
+    def test_seller_can_bulk_update_products(self):
+        response = self.client.patch(
+            self.product_bulk_update_url,
+            {
+                "items": [{"id": str(self.product.id), "quantity": 8}],
+                "operations": [
+                    {
+                        "field": "price",
+                        "operation": "increase",
+                        "value": "10",
+                        "unit": "percent",
+                        "category_id": str(self.product_category.id),
+                    }
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data["updated_quantities"], 1)
+        self.assertEqual(response.data["operations"], [1])
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), "11.00")
+        self.assertEqual(ProductInventory.objects.get().current_quantity, 8)
+
+    def test_bulk_update_rejects_invalid_operations(self):
+        response = self.client.patch(
+            self.product_bulk_update_url,
+            {
+                "operations": [
+                    {
+                        "field": "price",
+                        "operation": "decrease",
+                        "value": "150",
+                        "unit": "percent",
+                        "category_id": str(self.product_category.id),
+                    }
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(self.product_bulk_update_url, {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_rejects_unscoped_operations(self):
+        response = self.client.patch(
+            self.product_bulk_update_url,
+            {
+                "operations": [{"field": "quantity", "operation": "set", "value": "0"}],
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ProductInventory.objects.get().current_quantity, 5)
+
+    def test_customer_cannot_bulk_update_products(self):
+        self.client.force_login(user=self.customer)
+        response = self.client.patch(
+            self.product_bulk_update_url,
+            {"items": [{"id": str(self.product.id), "price": "1.00"}]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), "10.00")
+
+
+class TestProductExportViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username="customer")
+        cls.seller = User.objects.create(username="seller")
+
+        cls.customer_profile = UserProfile.objects.create(
+            user=cls.customer,
+            username=cls.customer.username,
+            role="customer",
+            email="customer@mail.com",
+            phone_number="+48123123123",
+        )
+        cls.seller_profile = UserProfile.objects.create(
+            user=cls.seller,
+            username=cls.seller.username,
+            role="seller",
+            email="seller@mail.com",
+            phone_number="+48456456456",
+        )
+
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        cls.product = Product.objects.create(
+            name="burger",
+            price=10,
+            category=cls.product_category,
+            inventory=ProductInventory.objects.create(quantity=5),
+            product_image=ContentFile(image_file.getvalue(), name=image_file.name),
+        )
+        cls.product_export_url = reverse("products:product-export")
+
+    def setUp(self):
+        self.client.force_login(user=self.seller)
+
+    def test_seller_can_export_products_as_csv(self):
+        response = self.client.get(self.product_export_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("burger", lines[1])
+        self.assertIn("Food", lines[1])
+        self.assertIn(f"http://testserver{self.product.product_image.url}", lines[1])
+
+    def test_seller_can_export_products_as_ndjson(self):
+        response = self.client.get(
+            self.product_export_url,
+            {"file_format": "ndjson", "updated_since": "2000-01-01T00:00:00Z"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(
+            json.loads(lines[0])["product_image"],
+            f"http://testserver{self.product.product_image.url}",
+        )
+
+    def test_export_rejects_invalid_updated_since(self):
+        response = self.client.get(
+            self.product_export_url, {"updated_since": "yesterday"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_cannot_export_products(self):
+        self.client.force_login(user=self.customer)
+        response = self.client.get(self.product_export_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestProductImageViews(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product_category = ProductCategory.objects.create(name="Food")
+        image_file = generate_image_file()
+        cls.product = Product.objects.create(
+            name="burger",
+            price=10,
+            category=cls.product_category,
+            inventory=ProductInventory.objects.create(quantity=5),
+            product_image=ContentFile(image_file.getvalue(), name=image_file.name),
+        )
+        cls.product_image_url = reverse(
+            "products:product-image", kwargs={"image_hash": cls.product.image_hash}
+        )
+
+    def setUp(self):
+        cache_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_directory.cleanup)
+        settings_override = override_settings(
+            PRODUCT_IMAGE_CACHE_DIR=cache_directory.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_image_is_resized_to_negotiated_format(self):
+        response = self.client.get(
+            self.product_image_url, {"width": 200}, HTTP_ACCEPT="image/webp,*/*"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("Accept", response["Vary"])
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(self.product.image_hash, response["ETag"])
+
+        image = Image.open(BytesIO(response.content))
+        self.assertEqual((image.format, image.size), ("WEBP", (200, 200)))
+
+        response = self.client.get(self.product_image_url, {"width": 200})
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+    def test_resized_image_is_served_from_disk_cache(self):
+        self.client.get(self.product_image_url, {"width": 100})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.product_image_url, {"width": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get(self.product_image_url, {"width": 100})
+        response = self.client.get(
+            self.product_image_url,
+            {"width": 100},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_only_allowed_widths_are_served(self):
+        response = self.client.get(self.product_image_url, {"width": 123})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_image_returns_not_found(self):
+        response = self.client.get(
+            reverse("products:product-image", kwargs={"image_hash": "0" * 64}),
+            {"width": 100},
+            HTTP_ACCEPT="image/webp",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unreadable_image_returns_not_found(self):
+        png = generate_image_file().getvalue()
+        # a valid header claiming far more pixels than Pillow decodes
+        header = struct.pack(">II", 20000, 20000) + png[24:29]
+        oversized = (
+            png[:16]
+            + header
+            + struct.pack(">I", zlib.crc32(b"IHDR" + header))
+            + png[33:]
+        )
+        for name, content in (
+            ("truncated.png", png[: len(png) // 2]),
+            ("oversized.png", oversized),
+        ):
+            with self.subTest(name=name):
+                product = Product.objects.create(
+                    name=name,
+                    price=10,
+                    category=self.product_category,
+                    inventory=ProductInventory.objects.create(quantity=5),
+                    product_image=ContentFile(content, name=name),
+                )
+                response = self.client.get(
+                    reverse(
+                        "products:product-image",
+                        kwargs={"image_hash": product.image_hash},
+                    ),
+                    {"width": 100},
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_product_detail_links_resized_images(self):
+        response = self.client.get(
+            reverse("products:product-detail", kwargs={"pk": self.product.id})
+        )
+        self.assertTrue(
+            response.data["resized_images"]["200"].endswith(
+                f"{self.product_image_url}?width=200"
+            )
+        )